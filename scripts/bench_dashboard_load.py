@@ -0,0 +1,97 @@
+"""
+Webhook ack latency while the dashboard list endpoint is hammered.
+
+Seeds 200 appointments in a temp DATA_DIR, then sends webhooks into the ASGI app on a
+fixed schedule, first idle and then while 8 clients poll GET /api/appointments.
+Latency counts from the scheduled send time, so time spent waiting for a blocked event
+loop is included. Reports the p95 of each phase.
+Run: python scripts/bench_dashboard_load.py [--samples 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench_dashboard_")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["WEBHOOK_VALIDATE_SIGNATURE"] = "false"
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from src.api.main import app  # noqa: E402
+from src.core.security import verify_token  # noqa: E402
+from src.domain.models import Appointment, Patient  # noqa: E402
+from src.infrastructure.database import async_engine, create_db_and_tables, engine  # noqa: E402
+
+SEEDED_APPOINTMENTS = 200
+DASHBOARD_CLIENTS = 8
+WEBHOOK_INTERVAL_SECONDS = 0.01
+
+
+def _seed():
+    with Session(engine) as session:
+        start = datetime.now() + timedelta(days=30)
+        for i in range(SEEDED_APPOINTMENTS):
+            patient = Patient(name=f"Load {i}", phone=f"55119777{i:04d}", contact_phone=f"55119777{i:04d}")
+            session.add(patient)
+            session.flush()
+            session.add(Appointment(patient_id=patient.id, datetime=start + timedelta(hours=i), service="Clínica Geral", status="scheduled"))
+        session.commit()
+
+
+async def _webhook_latencies(client, tag: str, samples: int) -> list[float]:
+    latencies = []
+    first_send = time.perf_counter()
+    for i in range(samples):
+        scheduled = first_send + i * WEBHOOK_INTERVAL_SECONDS
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        body = json.dumps({"phone": f"5511900{i:04d}", "messageId": f"load-{tag}-{i}", "text": {"message": "oi"}})
+        response = await client.post("/webhook/zapi", content=body, headers={"Content-Type": "application/json"})
+        latencies.append(time.perf_counter() - scheduled)
+        assert response.status_code == 200
+    return latencies
+
+
+async def main(samples: int):
+    stop = asyncio.Event()
+    dashboard_requests = 0
+
+    async def hammer(client):
+        nonlocal dashboard_requests
+        while not stop.is_set():
+            response = await client.get("/api/appointments")
+            assert response.status_code == 200
+            dashboard_requests += 1
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        # Open the async pool's connections before measuring.
+        await asyncio.gather(*(client.get("/api/appointments") for _ in range(DASHBOARD_CLIENTS)))
+        idle = await _webhook_latencies(client, "idle", samples)
+        hammers = [asyncio.create_task(hammer(client)) for _ in range(DASHBOARD_CLIENTS)]
+        loaded = await _webhook_latencies(client, "loaded", samples)
+        stop.set()
+        await asyncio.gather(*hammers)
+    await async_engine.dispose()
+
+    for label, values in (("idle", idle), ("dashboard load", loaded)):
+        print(f"{label:<15} webhook p95={statistics.quantiles(values, n=20)[-1] * 1000:7.1f}ms")
+    print(f"dashboard requests served: {dashboard_requests}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhook latency under dashboard load")
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    _seed()
+    app.dependency_overrides[verify_token] = lambda: None
+    asyncio.run(main(args.samples))
@@ -0,0 +1,64 @@
+"""
+Startup time and memory per embedding backend.
+
+Each measurement runs in a fresh interpreter and reports:
+  import       time to import src.infrastructure.vector_store (the app's import path)
+  first query  time to load the backend and embed one query (what warmup pays)
+  query p50    steady-state latency of one query
+  RSS          peak resident memory of the process
+The onnx backend needs an export first (scripts/export_onnx_embeddings.py).
+Run: python scripts/bench_embedding_backends.py [--backends huggingface onnx]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = r"""
+import json, os, resource, statistics, sys, time
+sys.path.insert(0, os.environ["BENCH_ROOT"])
+started = time.perf_counter()
+from src.infrastructure import vector_store
+imported = time.perf_counter()
+vector_store._model.embed_query("qual o endereço da clínica?")
+first_query = time.perf_counter()
+latencies = []
+for i in range(50):
+    t = time.perf_counter()
+    vector_store._model.embed_query(f"aceita convênio {i}?")
+    latencies.append(time.perf_counter() - t)
+print(json.dumps({
+    "import_s": imported - started,
+    "first_query_s": first_query - imported,
+    "query_p50_ms": statistics.median(latencies) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def measure(backend: str) -> dict:
+    env = dict(os.environ, EMBEDDING_BACKEND=backend, BENCH_ROOT=ROOT, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-bench"))
+    completed = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend startup/RSS benchmark")
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx"])
+    args = parser.parse_args()
+
+    print(f"{'backend':<12} {'import':>9} {'first query':>12} {'query p50':>10} {'RSS':>9}")
+    for backend in args.backends:
+        result = measure(backend)
+        if "error" in result:
+            print(f"{backend:<12} error: {result['error']}")
+            continue
+        print(
+            f"{backend:<12} {result['import_s']:>8.2f}s {result['first_query_s']:>11.2f}s "
+            f"{result['query_p50_ms']:>8.2f}ms {result['max_rss_mb']:>7.0f}MB"
+        )
@@ -0,0 +1,109 @@
+"""
+Load benchmark for the outbound path (queue, senders, pooled Z-API client, circuit
+breaker) against the mock Z-API running as a subprocess, with configurable latency
+tails, 5xx rate, lost responses and provider rate limit.
+
+Queues --messages keyed replies spread over --phones patients, then reports the
+throughput, the enqueue-to-sent latency p50/p99, and the retry, dead-letter and
+in-doubt counts. The mock's record of what it delivered gives the duplicate count.
+Queue files go to a temp dir.
+Run: python scripts/bench_outbound_mock.py [--messages 500] [--error-rate 0.1] [--latency lognormal:0.02,0.8]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.services.zapi_mock import free_port, start_subprocess  # noqa: E402
+
+_tmp = tempfile.mkdtemp(prefix="bench_outbound_")
+os.environ["DATA_DIR"] = _tmp
+
+
+async def run(args, base_url: str):
+    import httpx
+
+    from src.application.services.outbound_queue import OutboundMessageQueue, OutboundSender, _send_once
+    from src.infrastructure.services import zapi
+
+    queue = OutboundMessageQueue(
+        os.path.join(_tmp, "bench_outbound.db"), rate_per_second=1000, burst=1000, lease_seconds=30,
+        max_attempts=6, retry_base_seconds=0.05, retry_max_seconds=1.0,
+    )
+    queued_at: dict[int, float] = {}
+    sent_after: list[float] = []
+    outcomes: dict[str, int] = {}
+
+    async def on_status(message, status, error):
+        outcomes[status] = outcomes.get(status, 0) + 1
+        if status == "sent":
+            sent_after.append(time.perf_counter() - queued_at[message.id])
+
+    sender = OutboundSender(
+        queue, _send_once, workers=args.workers, poll_interval_seconds=0.01,
+        on_status=on_status, retry_after=zapi.circuit_breaker.retry_after,
+    )
+    await zapi.start_client()
+    sender.start()
+    started = time.perf_counter()
+    for i in range(args.messages):
+        message_id = queue.enqueue(f"55119{i % args.phones:08d}", f"Resposta {i}", idempotency_key=f"bench-{i}:reply")
+        queued_at[message_id] = time.perf_counter()
+    sender.notify()
+    settled = ("sent", "failed", "in_doubt")
+    while sum(outcomes.get(s, 0) for s in settled) < args.messages and time.perf_counter() - started < args.deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    await sender.stop()
+    await zapi.close_client()
+
+    stats = queue.stats()
+    print(f"settled {sum(outcomes.get(s, 0) for s in settled)}/{args.messages} in {elapsed:.2f}s "
+          f"({outcomes.get('sent', 0) / elapsed:.0f} sent/s)")
+    if sent_after:
+        ordered = sorted(sent_after)
+        print(f"enqueue->sent p50={statistics.median(ordered) * 1000:.1f}ms "
+              f"p99={ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000:.1f}ms")
+    print(f"outcomes={outcomes} retried={stats['retried']} deferred={stats['deferred']} "
+          f"dead={stats['dead']} in_doubt={stats['in_doubt']}")
+    print(f"circuit={zapi.circuit_breaker.stats()['transitions']}")
+    async with httpx.AsyncClient() as client:
+        mock = (await client.get(f"{base_url}/_mock/received")).json()["stats"]
+    print(f"mock: received={mock['received']} delivered={mock['delivered']} "
+          f"duplicates={mock['duplicates']} statuses={mock['statuses']}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outbound queue load benchmark against the mock Z-API")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--phones", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", default="lognormal:0.02,0.8")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="mock provider sends/second")
+    parser.add_argument("--timeout", type=float, default=2.0, help="client timeout, seconds")
+    parser.add_argument("--deadline", type=float, default=120.0)
+    args = parser.parse_args()
+
+    # Retries and dead letters are the point here; keep the per-send log lines out of the report.
+    logging.basicConfig(level=logging.CRITICAL)
+    port = free_port()
+    os.environ.update({
+        "Z_API_BASE_URL": f"http://127.0.0.1:{port}",
+        "Z_API_INSTANCE_ID": "bench", "Z_API_TOKEN": "bench", "Z_API_CLIENT_TOKEN": "bench",
+        "ZAPI_TIMEOUT_SECONDS": str(args.timeout),
+    })
+    with start_subprocess(
+        port, latency=args.latency, error_rate=args.error_rate, hang_rate=args.hang_rate,
+        hang_seconds=args.timeout * 2, rate_limit_per_second=args.rate_limit, burst=10,
+        client_token="bench", seed=1,
+    ) as base_url:
+        asyncio.run(run(args, base_url))
@@ -0,0 +1,108 @@
+"""
+Knowledge-base retrieval on a golden query set: latency and recall@k for RETRIEVAL_MODE
+bm25, dense and hybrid.
+
+Seeds a throwaway clinic_knowledge collection (in a temp dir) with FAQ-style chunks, then
+runs patient-style questions, each labelled with the chunk that answers it, through every
+mode. Dense and hybrid pay for query embeddings, so the embedding cache is disabled and
+every query is embedded. Pass --min-score/--min-margin to try other hybrid thresholds.
+Run: python scripts/bench_retrieval.py [--k 2] [--rounds 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench_retrieval_")
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["EMBEDDING_CACHE_MEMORY_ENTRIES"] = "0"
+
+from langchain_core.documents import Document  # noqa: E402
+
+from src.core.config import RETRIEVAL_CONFIG  # noqa: E402
+from src.infrastructure import vector_store  # noqa: E402
+from src.infrastructure.hybrid_retriever import RETRIEVAL_MODES, HybridRetriever  # noqa: E402
+
+CHUNKS = {
+    "convenio": "## Convênios\nAtendemos os convênios Unimed, Amil, Bradesco Saúde e SulAmérica. Para outros planos o atendimento é particular com emissão de recibo para reembolso.",
+    "endereco": "## Endereço\nA clínica fica na Rua das Flores, 120, sala 45, no centro. Há estacionamento conveniado no subsolo do prédio.",
+    "horario": "## Horário de funcionamento\nFuncionamos de segunda a sexta das 8h às 19h e aos sábados das 8h às 12h. Não abrimos domingos e feriados.",
+    "valor": "## Valores\nA consulta particular custa R$ 250,00. Pagamento em dinheiro, Pix ou cartão, parcelado em até 3 vezes.",
+    "retorno": "## Retorno\nO retorno é gratuito se agendado em até 30 dias após a consulta. Para crianças o retorno infantil vale por 45 dias.",
+    "fono": "## Fonoaudiologia\nA fonoaudióloga atende crianças a partir de 2 anos, adolescentes e adultos, inclusive avaliação de voz e deglutição.",
+    "cancelamento": "## Cancelamento e remarcação\nCancelamentos e remarcações devem ser feitos com 24 horas de antecedência pelo WhatsApp. Faltas sem aviso podem gerar cobrança.",
+    "documentos": "## Documentos\nTraga documento com foto, carteirinha do plano e pedido médico, se houver. Menores de idade devem vir acompanhados do responsável.",
+    "exames": "## Exames\nResultados de exames ficam prontos em até 5 dias úteis e são enviados por e-mail ou retirados na recepção.",
+    "odontopediatria": "## Odontopediatria\nA dentista infantil atende bebês a partir do primeiro dente. A primeira consulta inclui orientação de higiene bucal para os pais.",
+    "psicologia": "## Psicologia\nAtendimento psicológico para adultos e adolescentes, presencial ou online, com sessões semanais de 50 minutos.",
+    "encaminhamento": "## Encaminhamento\nNão é necessário encaminhamento para consultas particulares. Alguns planos exigem guia ou pedido médico para especialistas.",
+}
+GOLDEN = [
+    ("Tem convênio?", "convenio"),
+    ("vocês aceitam unimed", "convenio"),
+    ("meu plano é amil, atende?", "convenio"),
+    ("qual o endereço da clínica?", "endereco"),
+    ("onde vocês ficam?", "endereco"),
+    ("tem lugar pra estacionar?", "endereco"),
+    ("abre sábado?", "horario"),
+    ("até que horas funciona?", "horario"),
+    ("quanto custa a consulta?", "valor"),
+    ("aceita pix ou cartão?", "valor"),
+    ("Qual a regra para retorno infantil?", "retorno"),
+    ("o retorno é cobrado?", "retorno"),
+    ("Fono atende adultos?", "fono"),
+    ("minha filha de 3 anos precisa de fonoaudiologia", "fono"),
+    ("preciso desmarcar minha consulta", "cancelamento"),
+    ("se eu faltar pago alguma coisa?", "cancelamento"),
+    ("o que preciso levar no dia?", "documentos"),
+    ("criança pode ir sozinha?", "documentos"),
+    ("quando fica pronto o resultado?", "exames"),
+    ("meu bebê pode ir no dentista?", "odontopediatria"),
+    ("vocês tem psicólogo online?", "psicologia"),
+    ("preciso de pedido médico pra consultar?", "encaminhamento"),
+]
+
+
+def _seed() -> dict[str, str]:
+    docs = [Document(page_content=text, metadata={"topic": topic}) for topic, text in CHUNKS.items()]
+    vector_store.add_documents_to_store(docs, "clinic_knowledge")
+    return {text: topic for topic, text in CHUNKS.items()}
+
+
+def _run(mode: str, args, topic_of: dict[str, str]):
+    config = dict(RETRIEVAL_CONFIG, mode=mode, min_score=args.min_score, min_margin=args.min_margin)
+    retriever = HybridRetriever(lambda: vector_store.get_vector_store("clinic_knowledge"), **config)
+    retriever.search("warmup", k=args.k)
+    retriever.lexical_answers = retriever.dense_searches = 0
+    latencies, found = [], 0
+    for _ in range(args.rounds):
+        for query, topic in GOLDEN:
+            started = time.perf_counter()
+            results = retriever.search(query, k=args.k)
+            latencies.append(time.perf_counter() - started)
+            found += topic in {topic_of.get(doc.page_content) for doc in results}
+    ordered = sorted(latencies)
+    recall = found / (args.rounds * len(GOLDEN))
+    p50 = statistics.median(ordered) * 1000
+    p99 = ordered[int(len(ordered) * 0.99) - 1] * 1000
+    dense_share = retriever.dense_searches / len(latencies)
+    print(f"{mode:<8} recall@{args.k}={recall:5.2f}  p50={p50:8.3f}ms  p99={p99:8.3f}ms  dense={dense_share:5.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Golden-query retrieval benchmark")
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-score", type=float, default=RETRIEVAL_CONFIG["min_score"])
+    parser.add_argument("--min-margin", type=float, default=RETRIEVAL_CONFIG["min_margin"])
+    parser.add_argument("--modes", nargs="+", default=list(RETRIEVAL_MODES), choices=RETRIEVAL_MODES)
+    args = parser.parse_args()
+
+    topic_of = _seed()
+    print(f"{len(CHUNKS)} chunks, {len(GOLDEN)} golden queries, {args.rounds} rounds")
+    for mode in args.modes:
+        _run(mode, args, topic_of)
@@ -0,0 +1,67 @@
+"""
+Per-query latency of the knowledge-base search: a fresh PersistentClient and Chroma wrapper
+per call (the old get_vector_store) vs the process-wide ChromaRegistry.
+
+Seeds a throwaway collection in a temp dir, then runs the same queries through both paths
+and reports p50/p99. Embedding time is included in both and is identical.
+Run: python scripts/bench_vector_store.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench_vector_store_")
+
+import chromadb  # noqa: E402
+from langchain_community.vectorstores import Chroma  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from src.infrastructure import vector_store  # noqa: E402
+
+QUERIES = 300
+COLLECTION = "clinic_knowledge"
+QUESTIONS = [
+    "aceita convênio?", "qual o endereço da clínica?", "quanto custa a consulta?",
+    "atende criança?", "qual o horário de funcionamento?", "precisa de encaminhamento?",
+]
+
+
+def _seed():
+    docs = [
+        Document(page_content=f"FAQ {i}: {question} Resposta padrão da clínica número {i}.")
+        for i, question in enumerate(QUESTIONS * 20)
+    ]
+    vector_store.add_documents_to_store(docs, COLLECTION)
+
+
+def _per_call_store():
+    client = chromadb.PersistentClient(path=vector_store.CHROMA_DB_PATH)
+    return Chroma(client=client, collection_name=COLLECTION, embedding_function=vector_store.query_embeddings)
+
+
+def _measure(get_store) -> list[float]:
+    latencies = []
+    for i in range(QUERIES):
+        started = time.perf_counter()
+        get_store().similarity_search(QUESTIONS[i % len(QUESTIONS)], k=2)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _report(label: str, latencies: list[float]):
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered) * 1000
+    p99 = ordered[int(len(ordered) * 0.99) - 1] * 1000
+    print(f"{label:<28} p50={p50:7.2f}ms  p99={p99:7.2f}ms")
+
+
+if __name__ == "__main__":
+    _seed()
+    _measure(lambda: vector_store.get_vector_store(COLLECTION))  # warm the embedding model
+    _report("client per call", _measure(_per_call_store))
+    _report("registry (shared client)", _measure(lambda: vector_store.get_vector_store(COLLECTION)))
+    vector_store.chroma_registry.close()
@@ -0,0 +1,155 @@
+"""
+Ack-latency benchmark for POST /webhook/zapi: FastAPI router vs the raw ASGI fast lane.
+
+Replays a corpus shaped like real Z-API traffic (text messages, status and read-receipt
+callbacks, own/group/newsletter messages), signed with HMAC, straight into the ASGI app
+(no sockets), and reports p50/p99 per path. Queue and state files go to a temp dir.
+Run: python scripts/bench_webhook_ack.py
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_tmp = tempfile.mkdtemp(prefix="bench_webhook_")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["INBOUND_QUEUE_PATH"] = os.path.join(_tmp, "inbound_queue.db")
+os.environ["WEBHOOK_VALIDATE_SIGNATURE"] = "true"
+os.environ["WEBHOOK_SIGNATURE_SECRET"] = "bench-secret"
+
+from src.api.main import app  # noqa: E402
+from src.api.routes import webhooks  # noqa: E402
+from src.api.webhook_fast_lane import ZapiWebhookFastLane  # noqa: E402
+from src.core.config import ANTISPAM_CONFIG, WEBHOOK_SIGNATURE_HEADER  # noqa: E402
+
+REQUESTS = 5_000
+SECRET = b"bench-secret"
+
+
+def _received(i: int) -> dict:
+    return {
+        "isStatusReply": False,
+        "chatLid": None,
+        "connectedPhone": "5511900000000",
+        "waitingMessage": False,
+        "isEdit": False,
+        "isGroup": False,
+        "isNewsletter": False,
+        "instanceId": "3C0000000000000000000000000000",
+        "messageId": f"3EB0{i:016X}",
+        "phone": f"55119{i % 500:08d}",
+        "fromMe": False,
+        "momment": 1760000000000 + i,
+        "status": "RECEIVED",
+        "chatName": "Paciente",
+        "senderPhoto": None,
+        "senderName": "Paciente",
+        "participantPhone": None,
+        "photo": "https://pps.whatsapp.net/v/t61.24694-24/photo.jpg",
+        "broadcast": False,
+        "type": "ReceivedCallback",
+        "text": {"message": "Olá, gostaria de agendar uma consulta para quinta às 14h"},
+    }
+
+
+def build_corpus() -> list[bytes]:
+    corpus = []
+    for i in range(REQUESTS):
+        kind = i % 10
+        payload = _received(i)
+        if kind in (6, 7):
+            payload = {
+                "instanceId": payload["instanceId"],
+                "status": "READ",
+                "ids": [payload["messageId"]],
+                "momment": payload["momment"],
+                "phone": payload["phone"],
+                "isGroup": False,
+                "type": "MessageStatusCallback",
+            }
+        elif kind == 8:
+            payload["fromMe"] = True
+        elif kind == 9:
+            payload["isGroup"] = True
+        corpus.append(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    return corpus
+
+
+async def _call(asgi_app, body: bytes):
+    signature = "sha256=" + hmac.new(SECRET, body, hashlib.sha256).hexdigest()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/webhook/zapi",
+        "raw_path": b"/webhook/zapi",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (WEBHOOK_SIGNATURE_HEADER.lower().encode(), signature.encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    sent = False
+    status = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await asgi_app(scope, receive, send)
+    return status[0]
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def bench(name: str, asgi_app, corpus: list[bytes]):
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+    samples = []
+    for body in corpus:
+        start = time.perf_counter()
+        status = await _call(asgi_app, body)
+        samples.append(time.perf_counter() - start)
+        assert status == 200, status
+    print(
+        f"{name:<12} p50={_percentile(samples, 0.50) * 1e3:6.3f}ms "
+        f"p99={_percentile(samples, 0.99) * 1e3:6.3f}ms "
+        f"queued={webhooks.inbound_queue.stats()['depth']}"
+    )
+
+
+async def main():
+    import logging
+
+    logging.disable(logging.INFO)
+    ANTISPAM_CONFIG["max_messages_per_minute"] = 10**9
+    ANTISPAM_CONFIG["cooldown_seconds"] = 0
+    corpus = build_corpus()
+    print(f"{len(corpus)} requests, {sum(map(len, corpus)) // len(corpus)} bytes avg")
+    await bench("router", app, corpus)
+    await bench("fast lane", ZapiWebhookFastLane(app), corpus)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
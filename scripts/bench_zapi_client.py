@@ -0,0 +1,125 @@
+"""
+Outbound send latency and throughput against a local HTTPS mock of Z-API: a new
+httpx.AsyncClient per send (the old send_message) vs the pooled keep-alive client.
+
+Serves the in-repo mock (src/infrastructure/services/zapi_mock.py) on 127.0.0.1 with a
+throwaway self-signed certificate (trusted through SSL_CERT_FILE), so each fresh client
+pays TCP and TLS setup as it would against api.z-api.io, minus the network round trips. Reports p50/p99 of sequential sends and
+sends/second with --concurrency sends in flight.
+Run: python scripts/bench_zapi_client.py [--sends 300] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.infrastructure.services.zapi_mock import MockZApi, free_port, serve_in_thread  # noqa: E402
+
+
+def _self_signed_cert(directory: str) -> tuple[str, str]:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1)).not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+async def _per_call_send(url: str, headers: dict, phone: str, message: str):
+    # What send_message did before: a client (pool, TCP and TLS handshake) per attempt.
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, headers=headers, json={"phone": phone, "message": message}, timeout=12)
+    assert response.status_code == 200
+
+
+async def _measure(send, sends: int, concurrency: int) -> tuple[list[float], float]:
+    latencies = []
+    for i in range(sends):
+        started = time.perf_counter()
+        await send(f"55119{i:08d}", "Lembrete da sua consulta")
+        latencies.append(time.perf_counter() - started)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            await send(f"55119{i:08d}", "Lembrete da sua consulta")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(sends)))
+    return latencies, sends / (time.perf_counter() - started)
+
+
+def _report(label: str, latencies: list[float], rate: float):
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered) * 1000
+    p99 = ordered[int(len(ordered) * 0.99) - 1] * 1000
+    print(f"{label:<18} p50={p50:7.2f}ms  p99={p99:7.2f}ms  {rate:8.0f} sends/s")
+
+
+async def main(args):
+    from src.infrastructure.services import zapi
+
+    base = f"{os.environ['Z_API_BASE_URL']}/instances/bench/token/bench/send-text"
+    headers = {"Client-Token": "bench", "Content-Type": "application/json"}
+
+    async def per_call(phone, message):
+        await _per_call_send(base, headers, phone, message)
+
+    async def pooled(phone, message):
+        result = await zapi.send_message(phone, message)
+        assert result["success"], result
+
+    _report("per-call client", *await _measure(per_call, args.sends, args.concurrency))
+    await zapi.start_client()
+    try:
+        _report("pooled client", *await _measure(pooled, args.sends, args.concurrency))
+    finally:
+        await zapi.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Z-API client pooling benchmark")
+    parser.add_argument("--sends", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    port = free_port()
+    cert_path, key_path = _self_signed_cert(tempfile.mkdtemp(prefix="bench_zapi_"))
+    os.environ.update({
+        "SSL_CERT_FILE": cert_path,
+        "Z_API_BASE_URL": f"https://127.0.0.1:{port}",
+        "Z_API_INSTANCE_ID": "bench", "Z_API_TOKEN": "bench", "Z_API_CLIENT_TOKEN": "bench",
+    })
+    with serve_in_thread(MockZApi(), port, ssl_certfile=cert_path, ssl_keyfile=key_path):
+        asyncio.run(main(args))
@@ -0,0 +1,77 @@
+"""
+Exports the embedding model to ONNX and quantizes it to int8 for EMBEDDING_BACKEND=onnx.
+
+Writes model.onnx, model_quantized.onnx and tokenizer.json to the output dir (defaults
+to EMBEDDING_CONFIG["onnx_dir"]), then checks that the int8 vectors match the
+HuggingFace backend on a few clinic questions. Needs torch, sentence-transformers and
+onnx at export time only; serving needs just onnxruntime and tokenizers.
+Run: python scripts/export_onnx_embeddings.py [--output DIR]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.config import EMBEDDING_CONFIG  # noqa: E402
+from src.infrastructure.embeddings import OnnxEmbeddings  # noqa: E402
+
+CHECK_SENTENCES = [
+    "aceita convênio?",
+    "qual o endereço da clínica?",
+    "Quero reagendar minha consulta de odontopediatria para quinta às 14h",
+    "Prefere atendimento pela manhã com a Dra. Ana",
+]
+MIN_COSINE = 0.98
+
+
+def export(output_dir: str, model_name: str):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["exemplo de frase"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    model_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in names),
+            model_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=17,
+            dynamo=False,
+        )
+    quantize_dynamic(model_path, os.path.join(output_dir, "model_quantized.onnx"), weight_type=QuantType.QInt8)
+    return st_model
+
+
+def check(output_dir: str, st_model) -> float:
+    import numpy as np
+
+    reference = st_model.encode(CHECK_SENTENCES, normalize_embeddings=True)
+    onnx_vectors = np.array(OnnxEmbeddings(output_dir).embed_documents(CHECK_SENTENCES))
+    return float(min((reference * onnx_vectors).sum(axis=1)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=EMBEDDING_CONFIG["onnx_dir"])
+    parser.add_argument("--model", default=EMBEDDING_CONFIG["model_name"])
+    args = parser.parse_args()
+
+    model = export(args.output, args.model)
+    min_cosine = check(args.output, model)
+    print(f"Exported to {args.output}; min cosine vs HuggingFace backend: {min_cosine:.4f}")
+    if min_cosine < MIN_COSINE:
+        sys.exit(f"Vectors diverge (min cosine {min_cosine:.4f} < {MIN_COSINE}); keep EMBEDDING_BACKEND=huggingface")
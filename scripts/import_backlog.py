@@ -0,0 +1,83 @@
+"""
+Import a saved backlog of Z-API webhook callbacks into the inbound job queue.
+
+Accepts a JSON array, an object with a "messages" array, or JSON Lines (one callback
+per line). Messages go through the same `ingest_batch` path as POST /webhook/zapi/batch,
+in chunks, straight into the durable queue file (INBOUND_QUEUE_PATH); the running
+server's workers pick them up. Dedup only spans the server's history when
+STATE_BACKEND is sqlite or redis.
+
+Run: python scripts/import_backlog.py backlog.jsonl [--chunk-size 500] [--no-rate-limit] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.application.services.batch_ingest import ingest_batch
+from src.application.services.inbound_queue import InboundJobQueue
+from src.application.services.state_backend import state_backend
+from src.application.services.zapi_payload import decode_batch, decode_message
+from src.core.config import ANTISPAM_CONFIG, COALESCE_CONFIG, INBOUND_QUEUE_CONFIG
+
+
+def load_messages(path: str):
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return decode_batch(raw)
+    except ValueError:
+        pass
+    try:
+        return [decode_message(raw)]
+    except ValueError:
+        return [decode_message(line) for line in raw.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="Backlog file (JSON array, {\"messages\": [...]} or JSON Lines)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--no-rate-limit", action="store_true", help="Skip the per-phone rate limit")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and count without enqueueing")
+    args = parser.parse_args()
+
+    messages = load_messages(args.path)
+    print(f"Loaded {len(messages)} callback(s) from {args.path}")
+    if args.dry_run:
+        return
+
+    queue = InboundJobQueue(
+        INBOUND_QUEUE_CONFIG["path"],
+        lease_seconds=INBOUND_QUEUE_CONFIG["lease_seconds"],
+        max_attempts=INBOUND_QUEUE_CONFIG["max_attempts"],
+        retry_base_seconds=INBOUND_QUEUE_CONFIG["retry_base_seconds"],
+        coalesce_window_seconds=COALESCE_CONFIG["window_seconds"],
+        coalesce_max_wait_seconds=COALESCE_CONFIG["max_wait_seconds"],
+        coalesce_max_messages=COALESCE_CONFIG["max_messages"],
+    )
+    max_per_phone = None if args.no_rate_limit else ANTISPAM_CONFIG["max_messages_per_minute"]
+    queued = 0
+    ignored = {}
+    chunk_size = max(1, args.chunk_size)
+    try:
+        for start in range(0, len(messages), chunk_size):
+            result = ingest_batch(
+                messages[start:start + chunk_size],
+                queue=queue,
+                backend=state_backend,
+                max_per_phone=max_per_phone,
+            )
+            queued += result["queued"]
+            for reason, count in result["ignored"].items():
+                ignored[reason] = ignored.get(reason, 0) + count
+    finally:
+        queue.close()
+        state_backend.close()
+
+    print(f"Queued {queued} message(s) into {INBOUND_QUEUE_CONFIG['path']}; ignored: {ignored or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
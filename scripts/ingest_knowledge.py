@@ -1,35 +1,46 @@
+"""
+Syncs knowledge files into the clinic_knowledge collection.
+
+Unchanged files are skipped by hash. Chunks get content-hash IDs, so for edited files only
+new or changed chunks are embedded and removed ones are deleted; an unchanged re-run
+loads neither the text splitter nor the embedding model.
+Sources are files or directories (their .md/.txt files), defaulting to data/FAQ.md.
+Chunks of files deleted from a given directory are deleted as well.
+Run: python scripts/ingest_knowledge.py [PATH ...] [--batch-size 64]
+"""
+import argparse
 import os
 import sys
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.infrastructure.vector_store import get_vector_store
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import MarkdownTextSplitter
+from src.core.config import INGEST_BATCH_SIZE  # noqa: E402
+from src.infrastructure.knowledge_ingest import find_sources, sync_sources  # noqa: E402
 
 FAQ_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "FAQ.md")
 
-def ingest_faq():
-    if not os.path.exists(FAQ_PATH):
-        print(f"File not found: {FAQ_PATH}")
-        return
-        
-    print(f"Loading {FAQ_PATH}...")
-    loader = TextLoader(FAQ_PATH, encoding="utf-8")
-    docs = loader.load()
-    
-    print("Chunking document...")
-    # Split by headers
-    splitter = MarkdownTextSplitter(chunk_size=500, chunk_overlap=50)
-    splits = splitter.split_documents(docs)
-    
-    print(f"Generated {len(splits)} chunks. Embeeding into ChromaDB...")
-    
-    # Store in "clinic_knowledge"
-    vector_store = get_vector_store("clinic_knowledge")
-    vector_store.add_documents(splits)
-    
-    print("Ingestion complete!")
+
+def ingest(paths: list[str], collection_name: str, batch_size: int):
+    started = time.perf_counter()
+    sources = find_sources(paths)
+    print(f"Syncing {len(sources)} source file(s) into {collection_name}...")
+    prune_dirs = [path for path in paths if os.path.isdir(path)]
+    result = sync_sources(sources, collection_name, batch_size=batch_size, prune_dirs=prune_dirs)
+    print(
+        f"Added {result.added}, removed {result.removed}, unchanged {result.unchanged} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
 
 if __name__ == "__main__":
-    ingest_faq()
+    parser = argparse.ArgumentParser(description="Incremental knowledge-base ingestion")
+    parser.add_argument("paths", nargs="*", default=[FAQ_PATH])
+    parser.add_argument("--collection", default="clinic_knowledge")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        ingest(args.paths, args.collection, args.batch_size)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
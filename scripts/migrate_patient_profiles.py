@@ -0,0 +1,29 @@
+"""
+One-shot migration of the patient_profiles Chroma collection into the keyed preference
+store (PREFERENCE_DB_PATH). Duplicates collapse under the store's near-duplicate rule and
+each phone keeps at most PREFERENCES_MAX_PER_PHONE preferences; the collection has no
+timestamps, so which ones survive the cap is arbitrary. Re-running is safe.
+Pass --drop to delete the collection once migrated.
+Run: python scripts/migrate_patient_profiles.py [--drop]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.infrastructure.preference_store import migrate_from_collection  # noqa: E402
+from src.infrastructure.vector_store import get_vector_store, preference_store  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate patient_profiles into the preference store")
+    parser.add_argument("--drop", action="store_true", help="delete the Chroma collection afterwards")
+    args = parser.parse_args()
+
+    store = get_vector_store("patient_profiles")
+    migrated, skipped = migrate_from_collection(store, preference_store)
+    print(f"Migrated {migrated} preferences, skipped {skipped} (duplicates or missing phone)")
+    print(f"Store now holds: {preference_store.stats()}")
+    if args.drop:
+        store.delete_collection()
+        print("Dropped the patient_profiles collection.")
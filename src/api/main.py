@@ -1,4 +1,5 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,18 +9,65 @@ import os
 
 load_dotenv()
 
-from src.infrastructure.database import create_db_and_tables
+from src.infrastructure.database import async_engine, create_db_and_tables
+from src.infrastructure.executor import run_blocking, shutdown_executor
+from src.infrastructure.services import zapi
+from src.infrastructure.vector_store import chroma_registry, preference_store, query_embeddings, warmup_embeddings
 from src.api.routes import auth, appointments, webhooks
-from src.core.config import CORS_ALLOWED_ORIGINS
+from src.application.services.message_handler import conversation_state
+from src.application.services.outbound_queue import outbound_sender
+from src.application.services.state_backend import state_backend
+from src.api.webhook_fast_lane import ZapiWebhookFastLane
+from src.core.config import (
+    CORS_ALLOWED_ORIGINS, ANTISPAM_CONFIG, CONVERSATION_STATE_CONFIG, EMBEDDING_CONFIG, WEBHOOK_FAST_LANE,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PostClinics")
 
+async def _warm_embeddings():
+    # Runs beside startup; an agent run that needs the model first waits on the same load.
+    try:
+        await run_blocking(warmup_embeddings)
+    except Exception as e:
+        logger.error(f"Embedding warmup failed: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     logger.info("Database tables verified.")
+    snapshot_path = CONVERSATION_STATE_CONFIG["snapshot_path"]
+    if snapshot_path:
+        conversation_state.restore(snapshot_path, state_backend)
+    background_tasks = [
+        asyncio.create_task(state_backend.run_eviction_loop(ANTISPAM_CONFIG["state_sweep_seconds"])),
+        asyncio.create_task(
+            conversation_state.run_sweep_loop(
+                CONVERSATION_STATE_CONFIG["sweep_seconds"], snapshot_path, state_backend
+            )
+        ),
+    ]
+    if EMBEDDING_CONFIG["warmup"]:
+        background_tasks.append(asyncio.create_task(_warm_embeddings()))
+    await zapi.start_client()
+    outbound_sender.start()
+    webhooks.inbound_workers.start()
     yield
+    await webhooks.inbound_workers.stop()
+    await outbound_sender.stop()
+    await zapi.close_client()
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    if snapshot_path:
+        conversation_state.snapshot(snapshot_path, state_backend)
+    shutdown_executor()
+    chroma_registry.close()
+    query_embeddings.cache.close()
+    preference_store.close()
+    await async_engine.dispose()
+    state_backend.close()
 
 app = FastAPI(title="POST Clinics MVP", lifespan=lifespan)
 
@@ -31,6 +79,10 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type", "ngrok-skip-browser-warning"],
 )
 
+if WEBHOOK_FAST_LANE:
+    # Added last so it wraps everything else and answers the webhook before the router.
+    app.add_middleware(ZapiWebhookFastLane)
+
 app.include_router(auth.router)
 app.include_router(appointments.router)
 app.include_router(webhooks.router)
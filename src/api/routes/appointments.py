@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi.responses import JSONResponse
+from sqlmodel import select
 from datetime import datetime
 from typing import Optional
 
 from src.core.security import verify_token
-from src.infrastructure.database import engine
+from src.infrastructure.database import async_session_factory
 from src.domain.models import Appointment, Patient
 from src.domain.schemas import AppointmentCreate, AppointmentUpdate
 from src.application.services.appointment_status import (
@@ -17,6 +18,12 @@ from src.application.services.patient_identity import (
 from src.application.services.service_catalog import canonicalize_service_name
 from src.application.services import appointment_manager
 
+DASHBOARD_COLUMNS = (
+    Appointment.id, Appointment.datetime, Appointment.service, Appointment.professional,
+    Appointment.status, Appointment.created_at,
+)
+PARTITION_ROWS = 50
+
 router = APIRouter(prefix="/api/appointments", tags=["Appointments"], dependencies=[Depends(verify_token)])
 
 @router.get("")
@@ -25,32 +32,39 @@ async def get_appointments(include_cancelled: bool = False):
     Fetch all scheduled appointments for the dashboard.
     Returns appointment data with patient information.
     """
-    with Session(engine) as session:
-        statement = select(Appointment, Patient).join(Patient)
+    async with async_session_factory() as session:
+        # Plain appointment columns instead of ORM entities: the rows are only read, and
+        # skipping identity-map bookkeeping keeps the time spent on the event loop small.
+        statement = select(*DASHBOARD_COLUMNS, Patient).join(Patient)
         if not include_cancelled:
             statement = statement.where(Appointment.status != "cancelled")
-        results = session.exec(statement).all()
-        
+        # Rows arrive in partitions; each fetch awaits the driver, so a long list is
+        # built in short slices and webhook acks interleave with it.
+        result = await session.stream(statement)
+
         appointments = []
-        for appointment, patient in results:
-            status_meta = get_status_metadata(appointment.status)
-            appointments.append({
-                "id": appointment.id,
-                "patient_name": patient.name,
-                "patient_phone": get_contact_phone(patient),
-                "responsible_name": patient.responsible_name,
-                "datetime": appointment.datetime.isoformat(),
-                "service": canonicalize_service_name(appointment.service),
-                "professional": appointment.professional,
-                "status": status_meta["status"],
-                "status_label": status_meta["label"],
-                "status_color": status_meta["color"],
-                "status_description": status_meta["description"],
-                "calendar_description": build_status_legend_description(status_meta["status"]),
-                "created_at": appointment.created_at.isoformat()
-            })
-        
-        return {"appointments": appointments}
+        async for partition in result.partitions(PARTITION_ROWS):
+            for row in partition:
+                patient = row.Patient
+                status_meta = get_status_metadata(row.status)
+                appointments.append({
+                    "id": row.id,
+                    "patient_name": patient.name,
+                    "patient_phone": get_contact_phone(patient),
+                    "responsible_name": patient.responsible_name,
+                    "datetime": row.datetime.isoformat(),
+                    "service": canonicalize_service_name(row.service),
+                    "professional": row.professional,
+                    "status": status_meta["status"],
+                    "status_label": status_meta["label"],
+                    "status_color": status_meta["color"],
+                    "status_description": status_meta["description"],
+                    "calendar_description": build_status_legend_description(status_meta["status"]),
+                    "created_at": row.created_at.isoformat()
+                })
+
+        # Already JSON-native: skip jsonable_encoder, which walks every field on the event loop.
+        return JSONResponse({"appointments": appointments})
 
 @router.post("")
 async def create_appointment(data: AppointmentCreate, force: bool = False):
@@ -62,9 +76,9 @@ async def create_appointment(data: AppointmentCreate, force: bool = False):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format")
 
-    with Session(engine) as session:
+    async with async_session_factory() as session:
         try:
-            appt = appointment_manager.create_appointment(
+            appt = await appointment_manager.create_appointment_async(
                 session,
                 patient_name=data.patient_name,
                 patient_phone=data.patient_phone,
@@ -89,9 +103,9 @@ async def update_appointment(appointment_id: int, data: AppointmentUpdate, force
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format")
 
-    with Session(engine) as session:
+    async with async_session_factory() as session:
         try:
-            appt = appointment_manager.update_appointment(
+            appt = await appointment_manager.update_appointment_async(
                 session,
                 appointment_id=appointment_id,
                 dt=dt,
@@ -114,13 +128,13 @@ async def delete_appointment(appointment_id: int):
     """
     Delete an appointment (hard delete).
     """
-    with Session(engine) as session:
-        appt = session.get(Appointment, appointment_id)
+    async with async_session_factory() as session:
+        appt = await session.get(Appointment, appointment_id)
         if not appt:
             raise HTTPException(status_code=404, detail="Appointment not found")
             
-        session.delete(appt)
-        session.commit()
+        await session.delete(appt)
+        await session.commit()
         
         return {"status": "success"}
 
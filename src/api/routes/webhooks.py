@@ -1,106 +1,106 @@
-import json
 import logging
-from collections import defaultdict
-import time as _time
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Request, HTTPException, Depends
 
-from src.core.config import ANTISPAM_CONFIG
-from src.core.security import verify_webhook_signature
-from src.application.services.message_handler import process_webhook_payload
+from src.core.config import (
+    ANTISPAM_CONFIG, COALESCE_CONFIG, INBOUND_QUEUE_CONFIG, WEBHOOK_BATCH_MAX_BYTES, WEBHOOK_BATCH_MAX_MESSAGES,
+)
+from src.core.security import verify_webhook_signature, verify_token
+from src.domain.schemas import OutboundReconcile
+from src.application.services.rate_limiter import RATE_LIMITED, COOLDOWN
+from src.application.services.state_backend import state_backend
+from src.application.services.inbound_queue import InboundJobQueue, InboundWorkerPool
+from src.application.services.outbound_queue import SENT, outbound_queue, outbound_sender, update_notification_log
+from src.application.services.batch_ingest import ingest_batch
+from src.application.services.zapi_payload import decode_batch, decode_message, has_text
+from src.infrastructure import executor
+from src.infrastructure.services import zapi
+from src.infrastructure.vector_store import get_retriever, preference_store, profile_cache, query_embeddings
+from src.application.services.context_injection import rag_stats
+from src.application.services.message_handler import agent_admission, conversation_state, process_webhook_payload
 
 logger = logging.getLogger("PostClinics.Webhook")
 router = APIRouter(prefix="/webhook", tags=["Webhooks"])
 
-# State for rate limiting and dedup
-_seen_messages = {}
-_phone_timestamps = defaultdict(list)
+inbound_queue = InboundJobQueue(
+    INBOUND_QUEUE_CONFIG["path"],
+    lease_seconds=INBOUND_QUEUE_CONFIG["lease_seconds"],
+    max_attempts=INBOUND_QUEUE_CONFIG["max_attempts"],
+    retry_base_seconds=INBOUND_QUEUE_CONFIG["retry_base_seconds"],
+    coalesce_window_seconds=COALESCE_CONFIG["window_seconds"],
+    coalesce_max_wait_seconds=COALESCE_CONFIG["max_wait_seconds"],
+    coalesce_max_messages=COALESCE_CONFIG["max_messages"],
+)
+inbound_workers = InboundWorkerPool(
+    inbound_queue,
+    process_webhook_payload,
+    workers=INBOUND_QUEUE_CONFIG["workers"],
+    poll_interval_seconds=INBOUND_QUEUE_CONFIG["poll_interval_seconds"],
+)
+
+
+def ingest_webhook(headers, raw_body: bytes) -> dict:
+    """
+    Verifies, filters and enqueues one Z-API callback; shared by the router and the ASGI fast lane.
+    Text-less callbacks (status, read receipts) are dropped on a byte check before the body
+    is decoded.
+    """
+    verify_webhook_signature(headers, raw_body)
+
+    if not has_text(raw_body):
+        return {"status": "ignored", "reason": "missing_data"}
+
+    try:
+        message = decode_message(raw_body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    phone = message.phone
+    message_id = message.message_id
+    logger.info(
+        "[WPP:RAW] msgId=%s fromMe=%s isGroup=%s phoneSuffix=%s",
+        message_id,
+        message.from_me,
+        message.is_group,
+        (phone[-4:] if phone else "none"),
+    )
+
+    if not phone or not message.text:
+        logger.debug("Ignored payload (missing phone/text): msgId=%s", message_id)
+        return {"status": "ignored", "reason": "missing_data"}
+
+    if message.filtered_source:
+        return {"status": "ignored", "reason": "filtered_source"}
+
+    # --- ANTI-SPAM: Message Deduplication ---
+    if state_backend.is_duplicate_message(message_id):
+        logger.info(f"[ANTISPAM] Duplicate message ignored: {message_id}")
+        return {"status": "ignored", "reason": "duplicate_message"}
+
+    # --- ANTI-SPAM: Rate Limiting per Phone ---
+    throttle_reason = state_backend.check_rate_limit(phone)
+    if throttle_reason == RATE_LIMITED:
+        logger.warning(f"[ANTISPAM] Rate limit exceeded for {phone}")
+        return {"status": "ignored", "reason": "rate_limited"}
+    if throttle_reason == COOLDOWN:
+        logger.info(f"[ANTISPAM] Cooldown active for {phone}")
+        return {"status": "ignored", "reason": "cooldown"}
+
+    # --- ENQUEUE PROCESS MESSAGE (durable; workers merge the phone's burst) ---
+    inbound_queue.enqueue(phone, message_id, message.text)
+    inbound_workers.notify()
+    return {"status": "queued"}
 
 
 @router.post("/zapi")
-async def receiver(request: Request, background_tasks: BackgroundTasks):
+async def receiver(request: Request):
     """
     Endpoint request from Z-API.
     Accepts arbitrary JSON and manually extracts fields to be robust against structure variations.
     Includes anti-spam protection: rate limiting per phone and message deduplication.
     """
-    global _seen_messages, _phone_timestamps
-    
     try:
         raw_body = await request.body()
-        verify_webhook_signature(request.headers, raw_body)
-
-        try:
-            payload = json.loads(raw_body.decode("utf-8"))
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON payload")
-        
-        phone = payload.get("phone")
-        
-        # Extract text content
-        text_content = ""
-        text_data = payload.get("text")
-        
-        if isinstance(text_data, dict):
-            text_content = text_data.get("message", "")
-        elif isinstance(text_data, str):
-            text_content = text_data
-            
-        message_id = payload.get("messageId", "unknown")
-        logger.info(
-            "[WPP:RAW] msgId=%s fromMe=%s isGroup=%s phoneSuffix=%s",
-            message_id,
-            payload.get("fromMe", False),
-            payload.get("isGroup", False),
-            (str(phone)[-4:] if phone else "none"),
-        )
-            
-        if not phone or not text_content:
-            logger.warning(f"Ignored payload (missing phone/text): {payload}")
-            return {"status": "ignored", "reason": "missing_data"}
-
-        if payload.get("fromMe", False) or payload.get("isGroup", False) or payload.get("isNewsletter", False):
-             return {"status": "ignored", "reason": "filtered_source"}
-
-        now = _time.time()
-        
-        # --- ANTI-SPAM: Message Deduplication ---
-        dedup_window = ANTISPAM_CONFIG["dedup_window_seconds"]
-        _seen_messages = {
-            k: v for k, v in _seen_messages.items()
-            if now - v < dedup_window
-        }
-        
-        if message_id in _seen_messages:
-            logger.info(f"[ANTISPAM] Duplicate message ignored: {message_id}")
-            return {"status": "ignored", "reason": "duplicate_message"}
-        
-        _seen_messages[message_id] = now
-        
-        # --- ANTI-SPAM: Rate Limiting per Phone ---
-        max_per_min = ANTISPAM_CONFIG["max_messages_per_minute"]
-        cooldown = ANTISPAM_CONFIG["cooldown_seconds"]
-        
-        _phone_timestamps[phone] = [
-            ts for ts in _phone_timestamps[phone]
-            if now - ts < 60
-        ]
-        
-        timestamps = _phone_timestamps[phone]
-        
-        if len(timestamps) >= max_per_min:
-            logger.warning(f"[ANTISPAM] Rate limit exceeded for {phone}: {len(timestamps)} msgs/min")
-            return {"status": "ignored", "reason": "rate_limited"}
-        
-        if timestamps and (now - timestamps[-1]) < cooldown:
-            logger.info(f"[ANTISPAM] Cooldown active for {phone}: {now - timestamps[-1]:.1f}s < {cooldown}s")
-            return {"status": "ignored", "reason": "cooldown"}
-        
-        _phone_timestamps[phone].append(now)
-
-        # --- ENQUEUE PROCESS MESSAGE ---
-        background_tasks.add_task(process_webhook_payload, phone, message_id, text_content)
-        return {"status": "queued"}
-
+        return ingest_webhook(request.headers, raw_body)
     except HTTPException:
         raise
     except Exception as e:
@@ -108,3 +108,93 @@ async def receiver(request: Request, background_tasks: BackgroundTasks):
         error_trace = traceback.format_exc()
         logger.error(f"CRITICAL Error processing webhook: {e}\n{error_trace}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _read_body_capped(request: Request, max_bytes: int) -> bytes:
+    # Checked up front from Content-Length, and again while streaming for chunked bodies.
+    too_large = HTTPException(status_code=413, detail=f"Body exceeds {max_bytes} bytes")
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+
+@router.post("/zapi/batch")
+async def batch_receiver(request: Request):
+    """
+    Bulk redelivery endpoint: a JSON array of Z-API callbacks (or `{"messages": [...]}`)
+    under one signature. Dedup, rate limiting and enqueueing happen once for the whole batch.
+    """
+    raw_body = await _read_body_capped(request, WEBHOOK_BATCH_MAX_BYTES)
+    verify_webhook_signature(request.headers, raw_body)
+    try:
+        messages = decode_batch(raw_body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(messages) > WEBHOOK_BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {WEBHOOK_BATCH_MAX_MESSAGES} messages")
+
+    result = ingest_batch(
+        messages,
+        queue=inbound_queue,
+        backend=state_backend,
+        max_per_phone=ANTISPAM_CONFIG["max_messages_per_minute"],
+    )
+    inbound_workers.notify()
+    return result
+
+
+@router.get("/metrics", dependencies=[Depends(verify_token)])
+async def webhook_metrics():
+    """Runtime counters for the webhook pipeline and its caches and queues."""
+
+    def _collect_store_stats():
+        # SQLite/Redis reads and locks shared with pool threads: kept off the event loop.
+        return {
+            "state": state_backend.stats(),
+            "queue": inbound_queue.stats(),
+            "outbound": outbound_queue.stats(),
+            "preferences": preference_store.stats(),
+            "embedding_cache": query_embeddings.stats(),
+            "retrieval": get_retriever().stats(),
+        }
+
+    stores = await executor.run_blocking(_collect_store_stats)
+    return {
+        "state": stores["state"],
+        "conversations": conversation_state.stats(),
+        "queue": stores["queue"],
+        "outbound": stores["outbound"],
+        "zapi_circuit": zapi.circuit_breaker.stats(),
+        "admission": agent_admission.stats(),
+        "blocking_pool": executor.stats(),
+        "profiles": profile_cache.stats(),
+        "preferences": stores["preferences"],
+        "rag": rag_stats(),
+        "embedding_cache": stores["embedding_cache"],
+        "retrieval": stores["retrieval"],
+    }
+
+
+@router.get("/outbound/in-doubt", dependencies=[Depends(verify_token)])
+async def outbound_in_doubt(limit: int = 100):
+    """Keyed sends that may or may not have reached the patient (crash mid-send, lost response), held for reconciliation."""
+    return {"in_doubt": await executor.run_blocking(outbound_queue.in_doubt, limit)}
+
+
+@router.post("/outbound/reconcile", dependencies=[Depends(verify_token)])
+async def outbound_reconcile(data: OutboundReconcile):
+    """Settles an in-doubt send: `delivered` marks it sent, otherwise it is queued again."""
+    message = await executor.run_blocking(outbound_queue.reconcile, data.idempotency_key, data.delivered)
+    if message is None:
+        raise HTTPException(status_code=404, detail="No in-doubt message with this idempotency key")
+    if data.delivered:
+        await update_notification_log(message, SENT, None)
+        return {"status": "sent"}
+    outbound_sender.notify()
+    return {"status": "requeued"}
@@ -0,0 +1,57 @@
+import json
+import logging
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+
+from src.api.routes.webhooks import ingest_webhook
+
+logger = logging.getLogger("PostClinics.Webhook")
+
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+
+
+class ZapiWebhookFastLane:
+    """
+    Raw ASGI handler for `POST /webhook/zapi`, mounted ahead of the FastAPI router.
+
+    Reads the body straight off `receive` and runs the same `ingest_webhook` as the
+    router, skipping request/response model handling, dependency resolution and the
+    middleware stack. Every other request is passed through to `app` untouched.
+    """
+
+    def __init__(self, app, path: str = "/webhook/zapi"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        try:
+            status_code, result = 200, ingest_webhook(Headers(scope=scope), body)
+        except HTTPException as e:
+            status_code, result = e.status_code, {"detail": e.detail}
+        except Exception as e:
+            logger.exception(f"CRITICAL Error processing webhook: {e}")
+            status_code, result = 500, {"detail": str(e)}
+
+        payload = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": _JSON_HEADERS + [(b"content-length", str(len(payload)).encode())],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
@@ -3,9 +3,9 @@ from agents import Agent, Runner, ModelSettings
 
 from src.application.tools import check_availability, schedule_appointment, confirm_appointment, cancel_appointment, reschedule_appointment, get_available_services, find_patient_appointments, search_knowledge_base, request_human_attendant
 from src.core.config import CLINIC_CONFIG
-from src.application.services.context_injection import inject_context_into_prompt
+from src.application.services.context_injection import RagRunContext
 
-def get_agent_instructions(config, ctx=None):
+def get_agent_instructions(config, dynamic_context: str = ""):
     services_list = []
     for s in config["services"]:
         note = f" ({s['note']})" if "note" in s else ""
@@ -20,10 +20,6 @@ def get_agent_instructions(config, ctx=None):
     current_date = now.strftime("%Y-%m-%d (%A)")
     tomorrow_date = (now + timedelta(days=1)).strftime("%Y-%m-%d")
     
-    dynamic_context = ""
-    if ctx and hasattr(ctx, "messages"):
-        dynamic_context = inject_context_into_prompt(ctx.messages)
-    
     return f"""Você é {config['assistant_name']}, recepcionista virtual da {config['name']}.
 Hoje é {current_date}. Amanhã é {tomorrow_date}.
 
@@ -167,9 +163,15 @@ try:
 except ImportError:
     model = OPENAI_MODEL
 
+async def _build_instructions(ctx, agent):
+    # Called before every model turn; RagRunContext memoizes the knowledge-base context per run.
+    run_context = getattr(ctx, "context", None)
+    dynamic_context = await run_context.injected_context() if isinstance(run_context, RagRunContext) else ""
+    return get_agent_instructions(CLINIC_CONFIG, dynamic_context)
+
 agent = Agent(
     name="PostClinicsReceptionist",
-    instructions=lambda ctx, agent: get_agent_instructions(CLINIC_CONFIG, ctx),
+    instructions=_build_instructions,
     model=model,
     model_settings=ModelSettings(temperature=0.3),
     tools=[check_availability, schedule_appointment, confirm_appointment, cancel_appointment, reschedule_appointment, get_available_services, find_patient_appointments, search_knowledge_base, request_human_attendant],
@@ -81,7 +81,8 @@ async def run_learning_loop():
             learning = await summarize_learning(history_str)
             if learning and learning != "NULL" and "NULL" not in learning:
                 print(f"Extracted learning for {phone}: {learning}")
-                add_patient_preference(phone, learning)
+                if not add_patient_preference(phone, learning):
+                    print(f"Already known for {phone}, skipped.")
                 
     except Exception as e:
         print(f"Error in learning loop: {e}")
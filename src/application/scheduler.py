@@ -1,4 +1,3 @@
-import time
 import asyncio
 import logging
 import os
@@ -12,7 +11,9 @@ BR_TZ = ZoneInfo("America/Sao_Paulo")
 from sqlmodel import Session, select
 from src.infrastructure.database import engine, create_db_and_tables
 from src.domain.models import Appointment, Patient, NotificationLog
-from src.infrastructure.services.zapi import send_message
+from src.infrastructure.services import zapi
+from src.infrastructure.executor import run_blocking
+from src.application.services.outbound_queue import FAILED, outbound_queue, outbound_sender, send_message
 from src.core.config import CLINIC_CONFIG
 from src.application.services.patient_identity import get_contact_phone
 from src.application.services.appointment_status import normalize_status
@@ -53,6 +54,25 @@ def get_reminder_message_3h(patient_name: str, appt_datetime: datetime, service:
         f"Estamos aguardando você."
     )
 
+def reminder_key(appointment: Appointment, notification_type: str) -> str:
+    # The slot is part of the key: a rescheduled appointment gets its reminders again.
+    return f"{appointment.id}:{appointment.datetime:%Y%m%d%H%M}:{notification_type}"
+
+async def _queue_reminder(session: Session, appointment: Appointment, notification_type: str, phone: str, message: str) -> dict:
+    # A restart between queueing and setting notified_* finds the key already queued or
+    # sent and only sets the flag.
+    key = reminder_key(appointment, notification_type)
+    previous = await run_blocking(outbound_queue.key_status, key)
+    if previous not in (None, FAILED):
+        logger.info(f"Reminder {key} already {previous}; not sending again")
+        return {"success": True, "status_code": 202, "error_message": None, "queued": False, "duplicate": True}
+    # The log is committed first so the outbound senders (in this process or the app)
+    # can move it to sent/retrying/failed as delivery progresses.
+    log = NotificationLog(appointment_id=appointment.id, notification_type=notification_type, status="queued")
+    session.add(log)
+    session.commit()
+    return await send_message(phone, message, notification_log_id=log.id, idempotency_key=key)
+
 async def check_and_send_reminders():
     # Use localized time for logic
     now_aware = datetime.now(BR_TZ)
@@ -89,14 +109,7 @@ async def check_and_send_reminders():
                     patient_phone = get_contact_phone(patient)
                     logger.info(f"Attempting 24h reminder for {patient.name} ({patient_phone}) - Appt {appointment.id}")
                     
-                    res = await send_message(patient_phone, message)
-                    log = NotificationLog(
-                        appointment_id=appointment.id,
-                        notification_type="24h",
-                        status="sent" if res["success"] else "failed",
-                        error_message=res["error_message"]
-                    )
-                    session.add(log)
+                    res = await _queue_reminder(session, appointment, "24h", patient_phone, message)
                     if res["success"]:
                         if normalize_status(appointment.status) == "confirmed":
                             # Move to pending after sending confirmation request.
@@ -112,21 +125,31 @@ async def check_and_send_reminders():
                 patient_phone = get_contact_phone(patient)
                 logger.info(f"Attempting 3h reminder for {patient.name} ({patient_phone}) - Appt {appointment.id}")
                 
-                res = await send_message(patient_phone, message)
-                log = NotificationLog(
-                    appointment_id=appointment.id,
-                    notification_type="3h",
-                    status="sent" if res["success"] else "failed",
-                    error_message=res["error_message"]
-                )
-                session.add(log)
+                res = await _queue_reminder(session, appointment, "3h", patient_phone, message)
                 if res["success"]:
                     appointment.notified_3h = True
                     session.add(appointment)
                     sent_count += 1
                 session.commit()
     
-    logger.info(f"Check complete. {sent_count} reminder(s) sent successfully.")
+    logger.info(f"Check complete. {sent_count} reminder(s) queued.")
+
+async def _scheduler_loop():
+    # One loop for the process, so the pooled Z-API client keeps its connections between
+    # checks and the outbound senders deliver reminders while the next check waits.
+    await zapi.start_client()
+    outbound_sender.start()
+    try:
+        while True:
+            try:
+                await check_and_send_reminders()
+            except Exception as e:
+                logger.error(f"Error during reminder check: {e}")
+
+            await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+    finally:
+        await outbound_sender.stop()
+        await zapi.close_client()
 
 def run_scheduler():
     logger.info(f"🚀 Scheduler started. Checking every {CHECK_INTERVAL_SECONDS}s.")
@@ -134,13 +157,10 @@ def run_scheduler():
     
     create_db_and_tables()
     
-    while True:
-        try:
-            asyncio.run(check_and_send_reminders())
-        except Exception as e:
-            logger.error(f"Error during reminder check: {e}")
-        
-        time.sleep(CHECK_INTERVAL_SECONDS)
+    try:
+        asyncio.run(_scheduler_loop())
+    except KeyboardInterrupt:
+        logger.info("Scheduler stopped.")
 
 if __name__ == "__main__":
     run_scheduler()
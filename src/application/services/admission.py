@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("PostClinics.Admission")
+
+
+class AgentOverloaded(Exception):
+    """Raised when an agent run is shed instead of queued."""
+
+
+class AdmissionController:
+    """
+    Bounds how many agent (LLM) calls run at once across all conversations.
+
+    Calls beyond `max_concurrency` wait in per-phone queues that are served
+    round-robin, so one busy conversation cannot starve the others. When
+    `max_waiting` calls are already queued, or a call waits longer than
+    `wait_timeout_seconds`, it is rejected with AgentOverloaded so the caller can
+    reply right away instead of piling up calls that would end in 429s.
+    """
+
+    def __init__(self, max_concurrency: int, max_waiting: int, wait_timeout_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self._in_flight = 0
+        self._waiting = 0
+        self._waiters: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def acquire(self, phone: str):
+        if self._in_flight < self.max_concurrency and not self._waiting:
+            self._in_flight += 1
+            self.admitted += 1
+            return
+
+        if self._waiting >= self.max_waiting:
+            self.shed_queue_full += 1
+            logger.warning("[ADMISSION] Shedding phone=%s in_flight=%s waiting=%s", phone, self._in_flight, self._waiting)
+            raise AgentOverloaded("Agent queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(phone, deque()).append(waiter)
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.wait_timeout_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over while we were giving up; pass it on.
+                self.release()
+            else:
+                waiter.cancel()
+                self._discard_waiter(phone, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed_timeout += 1
+                logger.warning("[ADMISSION] Timed out waiting for an agent slot phone=%s", phone)
+                raise AgentOverloaded("Timed out waiting for an agent slot") from e
+            raise
+        self.admitted += 1
+
+    def release(self):
+        self._in_flight -= 1
+        while self._waiters:
+            phone, queue = next(iter(self._waiters.items()))
+            waiter = queue.popleft()
+            self._waiting -= 1
+            if queue:
+                self._waiters.move_to_end(phone)
+            else:
+                del self._waiters[phone]
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+            return
+
+    def _discard_waiter(self, phone: str, waiter: asyncio.Future):
+        queue = self._waiters.get(phone)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._waiting -= 1
+        if not queue:
+            del self._waiters[phone]
+
+    @asynccontextmanager
+    async def admit(self, phone: str):
+        await self.acquire(phone)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "waiting_phones": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": self.shed_queue_full + self.shed_timeout,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Tuple
 
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from src.domain.models import Appointment, Patient
 from src.core.config import CLINIC_CONFIG
 from src.application.services.patient_identity import resolve_patient_for_contact
@@ -193,3 +194,16 @@ def cancel_appointment(session: Session, appointment_id: int) -> Appointment:
     session.commit()
     session.refresh(appt)
     return appt
+
+
+# --- Async variants ---
+# Same logic, run through AsyncSession.run_sync: statements go through the async
+# driver, so callers on the event loop never wait on a blocking connection.
+
+async def create_appointment_async(session: AsyncSession, **kwargs) -> Appointment:
+    """Async variant of `create_appointment`."""
+    return await session.run_sync(lambda sync_session: create_appointment(sync_session, **kwargs))
+
+async def update_appointment_async(session: AsyncSession, appointment_id: int, **kwargs) -> Appointment:
+    """Async variant of `update_appointment`."""
+    return await session.run_sync(lambda sync_session: update_appointment(sync_session, appointment_id, **kwargs))
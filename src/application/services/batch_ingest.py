@@ -0,0 +1,90 @@
+import logging
+from collections import Counter
+
+from src.application.services.inbound_queue import InboundJobQueue
+from src.application.services.rate_limiter import RATE_LIMITED
+from src.application.services.state_backend import StateBackend
+from src.application.services.zapi_payload import InboundMessage
+
+logger = logging.getLogger("PostClinics.BatchIngest")
+
+
+def ingest_batch(
+    messages: list[InboundMessage],
+    *,
+    queue: InboundJobQueue,
+    backend: StateBackend,
+    max_per_phone: int | None,
+) -> dict:
+    """
+    Filters, dedups and rate-limits a batch of redelivered callbacks in one pass and
+    enqueues the survivors in a single transaction, grouped by phone in arrival order.
+
+    Redeliveries arrive back to back, so the per-message cooldown would drop all but
+    one message per phone. Instead each phone spends one rate-limit token per batch
+    (its messages are merged into one agent run by the queue anyway) and keeps at most
+    `max_per_phone` messages; only RATE_LIMITED phones are dropped.
+    """
+    ignored = Counter()
+    by_phone: dict[str, list[InboundMessage]] = {}
+    for message in messages:
+        if message.filtered_source:
+            ignored["filtered_source"] += 1
+        elif not message.phone or not message.text:
+            ignored["missing_data"] += 1
+        else:
+            by_phone.setdefault(message.phone, []).append(message)
+
+    fresh, duplicates, truncated = _claim_fresh(backend, by_phone, max_per_phone)
+    if duplicates:
+        ignored["duplicate_message"] += duplicates
+    if truncated:
+        ignored["rate_limited"] += truncated
+
+    jobs = []
+    for phone, phone_messages in fresh.items():
+        if not phone_messages:
+            continue
+        if max_per_phone is not None and backend.check_rate_limit(phone) == RATE_LIMITED:
+            ignored["rate_limited"] += len(phone_messages)
+            continue
+        jobs.extend((phone, m.message_id, m.text) for m in phone_messages)
+
+    queued = queue.enqueue_many(jobs)
+    phones = len({phone for phone, _, _ in jobs})
+    logger.info("[BATCH] received=%s queued=%s phones=%s ignored=%s", len(messages), queued, phones, dict(ignored))
+    return {
+        "status": "queued",
+        "received": len(messages),
+        "queued": queued,
+        "phones": phones,
+        "ignored": dict(ignored),
+    }
+
+
+def _claim_fresh(
+    backend: StateBackend, by_phone: dict[str, list[InboundMessage]], limit: int | None
+) -> tuple[dict[str, list[InboundMessage]], int, int]:
+    """
+    Claims message ids with the dedup store until each phone has `limit` fresh messages
+    or runs out. Messages past the cap are never claimed, so a later redelivery of them
+    is not mistaken for a duplicate. Returns the fresh messages by phone, the duplicate
+    count and the count left unclaimed over the cap.
+    """
+    fresh: dict[str, list[InboundMessage]] = {phone: [] for phone in by_phone}
+    pending = {phone: list(phone_messages) for phone, phone_messages in by_phone.items()}
+    duplicates = 0
+    while True:
+        claim = []
+        for phone, phone_messages in pending.items():
+            wanted = len(phone_messages) if limit is None else max(0, limit - len(fresh[phone]))
+            claim.extend(phone_messages[:wanted])
+            del phone_messages[:wanted]
+        if not claim:
+            break
+        for message, duplicate in zip(claim, backend.are_duplicate_messages([m.message_id for m in claim])):
+            if duplicate:
+                duplicates += 1
+            else:
+                fresh[message.phone].append(message)
+    return fresh, duplicates, sum(len(phone_messages) for phone_messages in pending.values())
@@ -1,4 +1,5 @@
 import logging
+from src.infrastructure.executor import run_blocking
 from src.infrastructure.vector_store import search_store
 
 logger = logging.getLogger(__name__)
@@ -50,8 +51,51 @@ def inject_context_into_prompt(messages: list) -> str:
         
     content = getattr(last_user_msg, 'content', '')
     if isinstance(content, str):
-        dynamic_context = get_dynamic_context_for_query(content)
-        if dynamic_context:
-            return f"\n\n--- INJECTED DYNAMIC CONTEXT (PRIORITY OVER GENERAL KNOWLEDGE) ---\n{dynamic_context}\n--- END INJECTED CONTEXT ---\n"
+        return format_injected_context(get_dynamic_context_for_query(content))
     
     return ""
+
+def format_injected_context(dynamic_context: str) -> str:
+    if not dynamic_context:
+        return ""
+    return f"\n\n--- INJECTED DYNAMIC CONTEXT (PRIORITY OVER GENERAL KNOWLEDGE) ---\n{dynamic_context}\n--- END INJECTED CONTEXT ---\n"
+
+
+_totals = {"runs": 0, "skipped_runs": 0, "searches": 0, "avoided_searches": 0}
+
+
+class RagRunContext:
+    """
+    Run context for one agent run (`Runner.run(context=...)`). The agent's instructions
+    are rebuilt on every model turn; the knowledge-base search behind them runs at most
+    once per run, and not at all when `skip` is set (the message was already recognized
+    as an intent or a date/time selection).
+    """
+
+    __slots__ = ("query", "skip", "searches", "avoided_searches", "_injected")
+
+    def __init__(self, query: str, skip: bool = False):
+        self.query = query
+        self.skip = skip
+        self.searches = 0
+        self.avoided_searches = 0
+        self._injected: str | None = None
+
+    async def injected_context(self) -> str:
+        if self.skip or self._injected is not None:
+            self.avoided_searches += 1
+            return self._injected or ""
+        self.searches += 1
+        self._injected = format_injected_context(await run_blocking(get_dynamic_context_for_query, self.query))
+        return self._injected
+
+    def record(self):
+        """Adds this run's counters to the process totals."""
+        _totals["runs"] += 1
+        _totals["skipped_runs"] += int(self.skip)
+        _totals["searches"] += self.searches
+        _totals["avoided_searches"] += self.avoided_searches
+
+
+def rag_stats() -> dict:
+    return dict(_totals)
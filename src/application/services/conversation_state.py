@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time as _time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("PostClinics.ConversationState")
+
+
+class _Conversation:
+    __slots__ = ("lock", "holders", "out_of_scope_attempts", "last_seen")
+
+    def __init__(self, now: float):
+        self.lock = asyncio.Lock()
+        self.holders = 0
+        self.out_of_scope_attempts = 0
+        self.last_seen = now
+
+
+class ConversationState:
+    """
+    Per-phone, process-local conversation state: the lock that serializes a phone's
+    agent runs and the out-of-scope counter used for handoff.
+
+    Records sit in an OrderedDict in least-recently-used order. Phones idle for
+    `idle_seconds` are swept, and the oldest records are dropped once `max_entries`
+    is exceeded; a record whose lock is held or awaited is never dropped. Handoff and
+    session start live in the state backend with their own TTLs. `snapshot`/`restore`
+    carry the counters, plus the backend's keys when it is in-memory, across restarts.
+    """
+
+    def __init__(self, idle_seconds: float, max_entries: int):
+        self.idle_seconds = idle_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, _Conversation] = OrderedDict()
+        self.evicted = 0
+
+    def _touch(self, phone: str, now: float | None = None) -> _Conversation:
+        now = _time.monotonic() if now is None else now
+        entry = self._entries.get(phone)
+        if entry is None:
+            entry = _Conversation(now)
+            self._entries[phone] = entry
+            if len(self._entries) > self.max_entries:
+                self._evict(now, over_capacity=True)
+        else:
+            entry.last_seen = now
+            self._entries.move_to_end(phone)
+        return entry
+
+    @asynccontextmanager
+    async def hold(self, phone: str):
+        """Serializes work for `phone`; the record cannot be evicted while held or awaited."""
+        entry = self._touch(phone)
+        entry.holders += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.holders -= 1
+            entry.last_seen = _time.monotonic()
+
+    def out_of_scope_attempts(self, phone: str) -> int:
+        entry = self._entries.get(phone)
+        return entry.out_of_scope_attempts if entry is not None else 0
+
+    def record_out_of_scope(self, phone: str) -> int:
+        entry = self._touch(phone)
+        entry.out_of_scope_attempts += 1
+        return entry.out_of_scope_attempts
+
+    def reset_out_of_scope(self, phone: str):
+        entry = self._entries.get(phone)
+        if entry is not None:
+            entry.out_of_scope_attempts = 0
+
+    def _evict(self, now: float, over_capacity: bool = False) -> int:
+        removed = 0
+        busy = []
+        while self._entries:
+            phone, entry = next(iter(self._entries.items()))
+            idle = now - entry.last_seen >= self.idle_seconds
+            if not idle and not (over_capacity and len(self._entries) > self.max_entries):
+                break
+            del self._entries[phone]
+            if entry.holders:
+                busy.append((phone, entry))
+            else:
+                removed += 1
+        # Records in use go back at the most-recent end.
+        for phone, entry in busy:
+            self._entries[phone] = entry
+        self.evicted += removed
+        return removed
+
+    def evict_idle(self, now: float | None = None) -> int:
+        return self._evict(_time.monotonic() if now is None else now)
+
+    async def run_sweep_loop(self, interval_seconds: float, snapshot_path: str | None = None, backend=None):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed = self.evict_idle()
+                if removed:
+                    logger.debug("[STATE] Released %s idle conversation(s)", removed)
+                if snapshot_path:
+                    self.snapshot(snapshot_path, backend)
+            except Exception as e:
+                logger.error(f"Conversation state sweep failed: {e}")
+
+    def snapshot(self, path: str, backend=None):
+        """Writes counters (and an in-memory backend's keys) to a SQLite file, replacing its contents."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        values = backend.export_values() if hasattr(backend, "export_values") else []
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            with conn:
+                conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS conversation (phone TEXT PRIMARY KEY, out_of_scope_attempts INTEGER NOT NULL);
+                    CREATE TABLE IF NOT EXISTS state_value (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL);
+                    DELETE FROM conversation;
+                    DELETE FROM state_value;
+                    """
+                )
+                conn.executemany(
+                    "INSERT INTO conversation (phone, out_of_scope_attempts) VALUES (?, ?)",
+                    [(phone, e.out_of_scope_attempts) for phone, e in self._entries.items() if e.out_of_scope_attempts],
+                )
+                conn.executemany("INSERT INTO state_value (key, value, expires_at) VALUES (?, ?, ?)", values)
+        finally:
+            conn.close()
+
+    def restore(self, path: str, backend=None) -> int:
+        """Loads a snapshot written by `snapshot`. Returns the number of records restored."""
+        if not os.path.exists(path):
+            return 0
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conversations = conn.execute("SELECT phone, out_of_scope_attempts FROM conversation").fetchall()
+            values = conn.execute("SELECT key, value, expires_at FROM state_value").fetchall()
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+
+        now = _time.monotonic()
+        for phone, attempts in conversations:
+            self._touch(phone, now).out_of_scope_attempts = attempts
+        if hasattr(backend, "import_values"):
+            backend.import_values(values)
+        logger.info("[STATE] Restored %s conversation(s) and %s state key(s)", len(conversations), len(values))
+        return len(conversations) + len(values)
+
+    def clear(self):
+        self._entries.clear()
+        self.evicted = 0
+
+    def stats(self) -> dict:
+        return {
+            "tracked_phones": len(self._entries),
+            "held": sum(1 for e in self._entries.values() if e.holders),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,72 @@
+import time as _time
+from collections import deque
+
+
+class MessageDeduplicator:
+    """
+    Remembers recently seen message IDs for a fixed time window.
+
+    IDs are kept in a set for O(1) lookup and in a deque ordered by expiry, so
+    expired entries are always at the head and eviction never scans the whole store.
+    `max_entries` is a hard cap: when full, the oldest ID is dropped first.
+    """
+
+    def __init__(self, window_seconds: float, max_entries: int):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._seen: set[str] = set()
+        self._expiry: deque[tuple[float, str]] = deque()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._seen
+
+    def _evict_expired(self, now: float):
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            _, message_id = expiry.popleft()
+            self._seen.discard(message_id)
+            self.evictions += 1
+
+    def _evict_oldest(self):
+        _, message_id = self._expiry.popleft()
+        self._seen.discard(message_id)
+        self.evictions += 1
+
+    def check_and_add(self, message_id: str, now: float | None = None) -> bool:
+        """Returns True if `message_id` was already seen inside the window, otherwise records it."""
+        now = _time.monotonic() if now is None else now
+        self._evict_expired(now)
+
+        if message_id in self._seen:
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        while len(self._seen) >= self.max_entries:
+            self._evict_oldest()
+        self._seen.add(message_id)
+        self._expiry.append((now + self.window_seconds, message_id))
+        return False
+
+    def clear(self):
+        self._seen.clear()
+        self._expiry.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._seen),
+            "max_entries": self.max_entries,
+            "window_seconds": self.window_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
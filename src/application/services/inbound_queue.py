@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time as _time
+from collections.abc import Awaitable, Callable
+
+from src.infrastructure.executor import run_blocking
+
+logger = logging.getLogger("PostClinics.InboundQueue")
+
+PENDING = "pending"
+LEASED = "leased"
+DEAD = "dead"
+
+
+def merge_texts(texts: list[str]) -> str:
+    """Joins consecutive messages into one agent input, one message per line."""
+    return "\n".join(t.strip() for t in texts if t and t.strip())
+
+
+class LeasedBatch:
+    __slots__ = ("phone", "job_ids", "message_ids", "texts", "attempts")
+
+    def __init__(self, phone: str):
+        self.phone = phone
+        self.job_ids: list[int] = []
+        self.message_ids: list[str] = []
+        self.texts: list[str] = []
+        self.attempts = 0
+
+    @property
+    def message_id(self) -> str:
+        """
+        The batch's first message id. Jobs are leased oldest first, so it stays the same
+        when an expired or retried batch is leased again with more messages merged in,
+        and the reply keyed on it is still sent once.
+        """
+        return self.message_ids[0]
+
+    @property
+    def text(self) -> str:
+        return merge_texts(self.texts)
+
+
+class InboundJobQueue:
+    """
+    Durable queue of inbound WhatsApp messages on a WAL-mode SQLite file.
+
+    `enqueue` is a single indexed INSERT, so the webhook ack stays cheap. Workers
+    lease every ready job of one phone at a time, which keeps per-phone ordering and
+    merges bursts: a phone only becomes ready once it has been quiet for
+    `coalesce_window_seconds` (or its oldest job waited `coalesce_max_wait_seconds`),
+    and never while an earlier job of the same phone is leased or backing off.
+    Leases that are not acked before `lease_seconds` (crashed worker, redeploy)
+    are handed out again.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        coalesce_window_seconds: float,
+        coalesce_max_wait_seconds: float,
+        coalesce_max_messages: int,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.coalesce_max_wait_seconds = coalesce_max_wait_seconds
+        self.coalesce_max_messages = coalesce_max_messages
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.lease_expirations = 0
+        self.messages_merged = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS inbound_job (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                lease_expires_at REAL,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_inbound_job_status ON inbound_job (status, available_at);
+            CREATE INDEX IF NOT EXISTS ix_inbound_job_phone ON inbound_job (phone, id);
+            """
+        )
+
+    def enqueue(self, phone: str, message_id: str, text: str) -> int:
+        now = _time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO inbound_job (phone, message_id, text, created_at, available_at) VALUES (?, ?, ?, ?, ?)",
+                (phone, message_id, text, now, now),
+            )
+        self.enqueued += 1
+        return cursor.lastrowid
+
+    def enqueue_many(self, jobs: list[tuple[str, str, str]]) -> int:
+        """Enqueues `(phone, message_id, text)` rows in one transaction, in the given order."""
+        if not jobs:
+            return 0
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO inbound_job (phone, message_id, text, created_at, available_at) VALUES (?, ?, ?, ?, ?)",
+                    [(phone, message_id, text, now, now) for phone, message_id, text in jobs],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.enqueued += len(jobs)
+        return len(jobs)
+
+    def reclaim_expired_leases(self) -> int:
+        now = _time.time()
+        with self._lock:
+            reclaimed = self._conn.execute(
+                "UPDATE inbound_job SET status = ?, lease_expires_at = NULL WHERE status = ? AND lease_expires_at <= ?",
+                (PENDING, LEASED, now),
+            ).rowcount
+        if reclaimed:
+            self.lease_expirations += reclaimed
+            logger.warning("[QUEUE] Reclaimed %s job(s) with expired leases", reclaimed)
+        return reclaimed
+
+    def lease(self) -> LeasedBatch | None:
+        """Leases the ready jobs of the phone that has waited the longest, or returns None."""
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """
+                    SELECT j.phone FROM inbound_job j
+                    WHERE j.status = 'pending' AND j.available_at <= :now
+                      AND NOT EXISTS (
+                          SELECT 1 FROM inbound_job o
+                          WHERE o.phone = j.phone AND o.id < j.id AND o.status IN ('pending', 'leased')
+                      )
+                      AND (
+                          j.created_at <= :now - :max_wait
+                          OR (SELECT max(n.created_at) FROM inbound_job n
+                              WHERE n.phone = j.phone AND n.status = 'pending') <= :now - :window
+                      )
+                    ORDER BY j.id
+                    LIMIT 1
+                    """,
+                    {
+                        "now": now,
+                        "window": self.coalesce_window_seconds,
+                        "max_wait": self.coalesce_max_wait_seconds,
+                    },
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                batch = LeasedBatch(row[0])
+                rows = self._conn.execute(
+                    """
+                    SELECT id, message_id, text, attempts FROM inbound_job
+                    WHERE phone = ? AND status = 'pending' AND available_at <= ?
+                    ORDER BY id LIMIT ?
+                    """,
+                    (batch.phone, now, max(1, self.coalesce_max_messages)),
+                ).fetchall()
+                for job_id, message_id, text, attempts in rows:
+                    batch.job_ids.append(job_id)
+                    batch.message_ids.append(message_id)
+                    batch.texts.append(text)
+                    batch.attempts = max(batch.attempts, attempts + 1)
+
+                self._conn.executemany(
+                    "UPDATE inbound_job SET status = ?, attempts = attempts + 1, lease_expires_at = ? WHERE id = ?",
+                    [(LEASED, now + self.lease_seconds, job_id) for job_id in batch.job_ids],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.messages_merged += len(batch.job_ids) - 1
+        return batch
+
+    def ack(self, batch: LeasedBatch):
+        with self._lock:
+            self._conn.executemany("DELETE FROM inbound_job WHERE id = ?", [(job_id,) for job_id in batch.job_ids])
+        self.completed += len(batch.job_ids)
+
+    def nack(self, batch: LeasedBatch, error: str):
+        """Schedules a retry with exponential backoff, or dead-letters after `max_attempts`."""
+        if batch.attempts >= self.max_attempts:
+            status, available_at = DEAD, _time.time()
+            self.dead_lettered += len(batch.job_ids)
+            logger.error("[QUEUE] Dead-lettered phone=%s jobs=%s: %s", batch.phone, batch.job_ids, error)
+        else:
+            delay = min(300.0, self.retry_base_seconds * (2 ** (batch.attempts - 1)))
+            status, available_at = PENDING, _time.time() + delay
+            self.retried += len(batch.job_ids)
+            logger.warning("[QUEUE] Retrying phone=%s jobs=%s in %.1fs: %s", batch.phone, batch.job_ids, delay, error)
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE inbound_job SET status = ?, available_at = ?, lease_expires_at = NULL, last_error = ? WHERE id = ?",
+                [(status, available_at, error[:500], job_id) for job_id in batch.job_ids],
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM inbound_job")
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.lease_expirations = 0
+        self.messages_merged = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        now = _time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, count(*) FROM inbound_job GROUP BY status").fetchall())
+            oldest_pending, = self._conn.execute(
+                "SELECT min(created_at) FROM inbound_job WHERE status = 'pending'"
+            ).fetchone()
+            expired_leases, = self._conn.execute(
+                "SELECT count(*) FROM inbound_job WHERE status = 'leased' AND lease_expires_at <= ?", (now,)
+            ).fetchone()
+        return {
+            "depth": counts.get(PENDING, 0),
+            "leased": counts.get(LEASED, 0),
+            "dead": counts.get(DEAD, 0),
+            "oldest_pending_age_seconds": round(now - oldest_pending, 3) if oldest_pending else 0.0,
+            "expired_leases": expired_leases,
+            "lease_expirations": self.lease_expirations,
+            "enqueued": self.enqueued,
+            "completed": self.completed,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "messages_merged": self.messages_merged,
+        }
+
+
+class InboundWorkerPool:
+    """
+    Async workers that drain an InboundJobQueue into `handler(phone, message_id, text, final_attempt=...)`.
+
+    A handler that raises gets its batch nacked (retried with backoff, then dead-lettered);
+    `final_attempt` tells it this is the last try, so it can reply with a fallback instead.
+    """
+
+    def __init__(
+        self,
+        queue: InboundJobQueue,
+        handler: Callable[..., Awaitable[None]],
+        *,
+        workers: int,
+        poll_interval_seconds: float,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval_seconds = poll_interval_seconds
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+
+    def notify(self):
+        """Wakes idle workers after an enqueue (jobs may still wait out the coalescing window)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run_worker(i)) for i in range(self.workers)]
+        logger.info("[QUEUE] Started %s inbound worker(s)", self.workers)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _wait_for_work(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run_worker(self, worker_id: int):
+        while True:
+            try:
+                await run_blocking(self.queue.reclaim_expired_leases)
+                batch = await run_blocking(self.queue.lease)
+            except Exception as e:
+                logger.error(f"[QUEUE] Worker {worker_id} failed to lease: {e}")
+                batch = None
+
+            if batch is None:
+                await self._wait_for_work()
+                continue
+
+            try:
+                await self.handler(
+                    batch.phone,
+                    batch.message_id,
+                    batch.text,
+                    final_attempt=batch.attempts >= self.queue.max_attempts,
+                )
+            except asyncio.CancelledError:
+                # Shutdown mid-job: leave the lease to expire so another worker picks it up.
+                raise
+            except Exception as e:
+                await run_blocking(self.queue.nack, batch, str(e))
+            else:
+                await run_blocking(self.queue.ack, batch)
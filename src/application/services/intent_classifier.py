@@ -0,0 +1,194 @@
+import re
+
+# --- LEXICON ---
+# Every keyword the router reacts to, by tag. Accent variants are spelled out so one
+# compiled alternation can map each match straight back to its tags.
+# Tags are bit flags so a message's tags combine with a plain integer OR.
+CONFIRMAR = 1 << 0
+REAGENDAR = 1 << 1
+CANCELAR = 1 << 2
+FALAR_ATENDENTE = 1 << 3
+HUMAN = 1 << 4
+URGENCY = 1 << 5
+FINANCIAL = 1 << 6
+COMPLAINT = 1 << 7
+SCOPE = 1 << 8
+GREETING = 1 << 9
+
+LEXICON_TERMS = {
+    CONFIRMAR: ["sim", "confirmo", "confirmar", "confirmado", "confirmei", "confirma", "ok", "✅"],
+    REAGENDAR: ["reagendar", "remarcar", "mudar", "trocar", "reagenda", "transferir", "adiar", "🔄"],
+    CANCELAR: ["cancelar", "cancela", "desmarcar", "cancelo", "desmarco", "nao vou", "não vou", "❌", "x"],
+    FALAR_ATENDENTE: [
+        "atendente", "humano", "pessoa", "chata", "ruim", "falar com alguem", "valor da consulta", "preço",
+    ],
+    HUMAN: ["atendente", "humano", "pessoa", "recepcionista"],
+    URGENCY: ["urgência", "urgencia", "urgente", "emergência", "emergencia", "dor forte", "sangramento"],
+    FINANCIAL: [
+        "valor", "preco", "preço", "financeiro", "pagamento", "cobranca", "cobrança", "orcamento", "orçamento",
+    ],
+    COMPLAINT: [
+        "reclamacao", "reclamação", "reclamacão", "reclamaçao", "reclamar", "insatisfeit", "ruim",
+        "péssimo", "horrivel", "horrível",
+    ],
+    SCOPE: [
+        "agendar", "agendamento", "marcar", "consulta", "horario", "horário", "servico", "serviço",
+        "reagendar", "cancelar", "confirmar", "desmarcar",
+    ],
+    # Only counts at the very start of the message.
+    GREETING: ["oi", "ola", "olá", "bom dia", "boa tarde", "boa noite"],
+}
+
+# Checked in this order; the first tag present wins.
+INTENT_PRIORITY = (
+    (CONFIRMAR, "confirmar"),
+    (REAGENDAR, "reagendar"),
+    (CANCELAR, "cancelar"),
+    (FALAR_ATENDENTE, "falar_atendente"),
+)
+INTENT_MASK = CONFIRMAR | REAGENDAR | CANCELAR | FALAR_ATENDENTE
+HANDOFF_REASONS = (
+    (HUMAN, "Pedido explícito de atendente."),
+    (URGENCY, "Mensagem com indício de urgência."),
+    (FINANCIAL, "Dúvida financeira ou de preço."),
+    (COMPLAINT, "Reclamação/insatisfação."),
+)
+INTENT_PHRASES = {
+    "confirmar": "Quero confirmar minha consulta",
+    "reagendar": "Quero reagendar minha consulta",
+    "cancelar": "Quero cancelar minha consulta",
+    "falar_atendente": "Quero falar com um atendente",
+}
+
+_SYMBOL_TERMS = {"✅", "🔄", "❌", "x"}
+_WORD_TERMS = sorted({term for terms in LEXICON_TERMS.values() for term in terms if term not in _SYMBOL_TERMS})
+
+
+def _trie_pattern(terms) -> str:
+    """
+    Alternation factored by common prefix ("confirm(?:a(?:r|do)?|o|ei)"), so each position
+    walks one branch instead of retrying every term. Optional tails are greedy, so the
+    longest term wins ("valor da consulta" over "valor").
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+# A lone "x" (next to no letter) means cancel, so "2x" counts but "xampu" does not.
+LEXICON_PATTERN = re.compile(
+    r"\b" + _trie_pattern(_WORD_TERMS) + r"\b|✅|🔄|❌|(?<![a-zA-Z])x(?![a-zA-Z])"
+)
+
+DATE_SELECTION_PATTERN = re.compile(r"^(dia\s*)?\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\s*$", re.IGNORECASE)
+TIME_SELECTION_PATTERN = re.compile(r"^(a[sà]s?\s*)?\d{1,2}(:|h)\d{2}\s*$", re.IGNORECASE)
+
+
+def is_date_or_time_selection(text: str) -> bool:
+    """True for bare replies like "dia 12/03" or "14:30"."""
+    normalized = (text or "").strip().lower()
+    return bool(DATE_SELECTION_PATTERN.match(normalized) or TIME_SELECTION_PATTERN.match(normalized))
+
+
+def _build_lexicon() -> dict[str, int]:
+    tags_by_term: dict[str, int] = {}
+    for tag, terms in LEXICON_TERMS.items():
+        for term in terms:
+            tags_by_term[term] = tags_by_term.get(term, 0) | tag
+    # A multiword match hides the keywords inside it ("valor da consulta" also means
+    # "valor" and "consulta"), so it carries their tags too.
+    for term in [t for t in tags_by_term if " " in t]:
+        for inner in _WORD_TERMS:
+            if inner != term and re.search(r"\b" + re.escape(inner) + r"\b", term):
+                tags_by_term[term] |= tags_by_term[inner] & ~GREETING
+    return tags_by_term
+
+
+LEXICON = _build_lexicon()
+_LEXICON_NOT_AT_START = {term: tags & ~GREETING for term, tags in LEXICON.items()}
+
+
+class Classification:
+    """Routing decision for one inbound message: intent, agent input, handoff reason and scope."""
+
+    __slots__ = ("intent", "text", "handoff_reason", "in_scope")
+
+    def __init__(self, intent: str | None, text: str, handoff_reason: str | None, in_scope: bool):
+        self.intent = intent
+        self.text = text
+        self.handoff_reason = handoff_reason
+        self.in_scope = in_scope
+
+
+def scan_tags(normalized: str) -> int:
+    """Tag flags of every keyword in an already stripped and lowercased text, in one regex pass."""
+    terms = LEXICON_PATTERN.findall(normalized)
+    if not terms:
+        return 0
+    tags = 0
+    for term in terms:
+        tags |= _LEXICON_NOT_AT_START[term]
+    # Greetings only count at the start; findall drops positions, so re-check the first term.
+    first = terms[0]
+    if LEXICON[first] & GREETING and normalized.startswith(first) and LEXICON_PATTERN.match(normalized):
+        tags |= GREETING
+    return tags
+
+
+def _decide(text: str, normalized: str, tags: int) -> Classification:
+    handoff_reason = None
+    if tags & (HUMAN | URGENCY | FINANCIAL | COMPLAINT):
+        handoff_reason = next(reason for tag, reason in HANDOFF_REASONS if tags & tag)
+    in_scope = bool(
+        tags & (GREETING | SCOPE)
+        or DATE_SELECTION_PATTERN.match(normalized)
+        or TIME_SELECTION_PATTERN.match(normalized)
+    )
+    return Classification(None, text, handoff_reason, in_scope)
+
+
+def _phrase_classification(intent: str) -> Classification:
+    phrase = INTENT_PHRASES[intent]
+    normalized = phrase.lower()
+    decision = _decide(phrase, normalized, scan_tags(normalized))
+    decision.intent = intent
+    return decision
+
+
+_PHRASE_CLASSIFICATIONS = {intent: _phrase_classification(intent) for _, intent in INTENT_PRIORITY}
+
+
+def classify_routing(text: str) -> Classification:
+    """Handoff reason and scope of `text` as is, without intent mapping."""
+    normalized = (text or "").strip().lower()
+    return _decide(text, normalized, scan_tags(normalized))
+
+
+def classify(text: str) -> Classification:
+    """
+    Maps short replies to an explicit intent phrase, then decides handoff and scope on the
+    resulting agent input. Same decisions as running the intent, handoff and scope
+    patterns one after another, from a single scan of the message.
+    """
+    normalized = (text or "").strip().lower()
+    # Emoji variation selectors and joiners are dropped for intent matching only.
+    intent_text = normalized.replace("\ufe0f", "").replace("\u200d", "")
+    tags = scan_tags(intent_text)
+    if tags & INTENT_MASK:
+        intent = next(intent for tag, intent in INTENT_PRIORITY if tags & tag)
+        return _PHRASE_CLASSIFICATIONS[intent]
+    if intent_text != normalized:
+        tags = scan_tags(normalized)
+    return _decide(text, normalized, tags)
@@ -2,59 +2,46 @@ import re
 import json
 import os
 import logging
-import asyncio
+import uuid
 from collections import defaultdict
 import time as _time
 
+import openai
 from agents import Runner, SQLiteSession
 from sqlmodel import Session, select
 
-from src.core.config import DATA_DIR
+from src.core.config import AGENT_ADMISSION_CONFIG, CONVERSATION_STATE_CONFIG, DATA_DIR, RAG_INJECTION_ENABLED
 from src.application.tools import (
     _check_availability, _schedule_appointment, _confirm_appointment,
     _cancel_appointment, _reschedule_appointment, _get_available_services,
     _find_patient_appointments
 )
+from src.application.services.admission import AdmissionController, AgentOverloaded
+from src.application.services.conversation_state import ConversationState
+from src.application.services.context_injection import RagRunContext
+from src.application.services.intent_classifier import classify, classify_routing, is_date_or_time_selection
 from src.application.services.patient_identity import find_patients_by_contact
 from src.application.services.service_catalog import canonicalize_service_name
+from src.application.services.state_backend import state_backend
 from src.domain.models import Appointment, Patient
 from src.infrastructure.database import engine
+from src.infrastructure.executor import run_blocking
 from src.infrastructure.vector_store import search_store
 from src.application.agent import agent
-from src.infrastructure.services.zapi import send_message
+from src.application.services.outbound_queue import send_message
 
 logger = logging.getLogger("PostClinics.MessageHandler")
 
 # --- INTENT PRE-PROCESSING ---
-# Regex patterns for matching intents even within longer sentences
-INTENT_PATTERNS = {
-    "confirmar": r'\b(sim|confirmo|confirmar|confirmado|confirmei|confirma|ok)\b|✅',
-    "reagendar": r'\b(reagendar|remarcar|mudar|trocar|reagenda|transferir|adiar)\b|🔄',
-    "cancelar": r'\b(cancelar|cancela|desmarcar|cancelo|desmarco|nao vou|não vou)\b|❌|(?<![a-zA-Z])x(?![a-zA-Z])',
-    "falar_atendente": r'\b(atendente|humano|pessoa|chata|ruim|falar com alguem|valor da consulta|preço)\b'
-}
-
-INTENT_PHRASES = {
-    "confirmar": "Quero confirmar minha consulta",
-    "reagendar": "Quero reagendar minha consulta",
-    "cancelar": "Quero cancelar minha consulta",
-    "falar_atendente": "Quero falar com um atendente",
-}
+# Intent, handoff and scope keywords live in intent_classifier, which decides all three
+# from a single regex scan of the message.
 
 def preprocess_intent(text: str) -> str:
     """Convert short emoji/text responses into explicit intent phrases for the agent."""
-    normalized = text.strip().lower()
-    # Remove variation selectors and zero-width joiners from emojis
-    normalized = normalized.replace("\ufe0f", "").replace("\u200d", "")
-    
-    # Check if the text matches any intent pattern
-    for intent, pattern in INTENT_PATTERNS.items():
-        if re.search(pattern, normalized):
-            phrase = INTENT_PHRASES[intent]
-            logger.info(f"[INTENT] Mapped '{text}' -> '{phrase}'")
-            return phrase
-            
-    return text
+    decision = classify(text)
+    if decision.intent is not None:
+        logger.info(f"[INTENT] Mapped '{text}' -> '{decision.text}'")
+    return decision.text
 
 # Map of tool names to their undecorated implementations
 TOOL_MAP = {
@@ -72,22 +59,11 @@ TOOL_MAP = {
     ),
 }
 
-_phone_locks = {}
-_phone_out_of_scope_attempts = defaultdict(int)
-_phone_is_handoff = {}
-_last_message_at = {}
-_session_starts = {}
-
-SCOPE_PATTERN = re.compile(
-    r"\b(agendar|agendamento|marcar|consulta|hor[aá]rio|servi[cç]o|reagendar|cancelar|confirmar|desmarcar)\b"
+conversation_state = ConversationState(
+    idle_seconds=CONVERSATION_STATE_CONFIG["idle_seconds"],
+    max_entries=CONVERSATION_STATE_CONFIG["max_entries"],
 )
-DATE_SELECTION_PATTERN = re.compile(r"^(dia\s*)?\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\s*$", re.IGNORECASE)
-TIME_SELECTION_PATTERN = re.compile(r"^(a[sà]s?\s*)?\d{1,2}(:|h)\d{2}\s*$", re.IGNORECASE)
-GREETING_PATTERN = re.compile(r"^(oi|ol[áa]|bom dia|boa tarde|boa noite)\b")
-HUMAN_REQUEST_PATTERN = re.compile(r"\b(atendente|humano|pessoa|recepcionista)\b")
-FINANCIAL_PATTERN = re.compile(r"\b(valor|pre[cç]o|financeiro|pagamento|cobran[cç]a|or[cç]amento)\b")
-COMPLAINT_PATTERN = re.compile(r"\b(reclama[cç][aã]o|reclamar|insatisfeit|ruim|péssimo|horr[ií]vel)\b")
-URGENCY_PATTERN = re.compile(r"\b(urg[êe]ncia|urgente|emerg[êe]ncia|dor forte|sangramento)\b")
+agent_admission = AdmissionController(**AGENT_ADMISSION_CONFIG)
 
 HANDOFF_REPLY = (
     "Encaminhei você para um atendente humano. "
@@ -107,6 +83,16 @@ SMALL_TALK_PATTERN = re.compile(
     r"^(oi+|ol[áa]+|bom dia|boa tarde|boa noite|obrigad[oa]+|valeu+|perfeito+|beleza+|tudo bem\??)$",
     re.IGNORECASE
 )
+TRAILING_PUNCTUATION_PATTERN = re.compile(r"[.!?]+$")
+# Internal markup the model sometimes leaks into replies, stripped in one pass.
+REPLY_CLEANUP_PATTERN = re.compile(
+    r"<thought>.*?</thought>"
+    r"|\[TOOL_CALL\]|\[SYSTEM\]|\[FUNCTION\]"
+    r"|Telefone do paciente:\s*\S+"
+    r"|<function=.*?>.*?</function>",
+    re.DOTALL,
+)
+SYSTEM_NOTE_PATTERN = re.compile(r"^\(SYSTEM:.*?\)$", re.DOTALL)
 
 MAX_PROFILE_CHARS = 600
 MAX_TEXT_CHARS = 1200
@@ -114,6 +100,7 @@ MAX_TOOL_OUTPUT_CHARS = 800
 MAX_INLINE_TOOL_CALLS = int(os.environ.get("MAX_INLINE_TOOL_CALLS", "3"))
 MAX_REPEATED_INLINE_SAME_CALL = int(os.environ.get("MAX_REPEATED_INLINE_SAME_CALL", "2"))
 HANDOFF_TTL_SECONDS = int(os.environ.get("HANDOFF_TTL_SECONDS", "900"))
+SESSION_TIMEOUT_SECONDS = 1800  # 30 minutes
 
 
 def _truncate_text(value: str, limit: int) -> str:
@@ -135,23 +122,46 @@ def _is_request_too_large_error(exc: Exception) -> bool:
     return "error code: 413" in text or "request too large" in text
 
 
+def _is_transient_error(exc: Exception) -> bool:
+    """Provider hiccups a later attempt of the same job can get past."""
+    if isinstance(exc, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return _is_rate_limit_error(exc)
+
+
 def _activate_handoff(phone: str):
-    _phone_is_handoff[phone] = True
+    state_backend.set(f"handoff:{phone}", "1", ttl_seconds=HANDOFF_TTL_SECONDS)
 
 
 def _has_active_handoff(phone: str) -> bool:
-    return _phone_is_handoff.get(phone, False)
+    return state_backend.get(f"handoff:{phone}") is not None
 
 
 def _clear_handoff(phone: str):
-    _phone_is_handoff.pop(phone, None)
+    state_backend.delete(f"handoff:{phone}")
 
 
-async def _safe_send_message(phone: str, text: str):
+def _touch_session(phone: str, now: float) -> tuple[int, bool]:
+    """
+    Returns (session_start, is_new). The session key slides its TTL on every message,
+    so it disappears after SESSION_TIMEOUT_SECONDS of silence.
+    """
+    key = f"session:{phone}"
+    session_start = state_backend.get(key)
+    is_new = session_start is None
+    if is_new:
+        session_start = str(int(now))
+    state_backend.set(key, session_start, ttl_seconds=SESSION_TIMEOUT_SECONDS)
+    return int(session_start), is_new
+
+
+async def _safe_send_message(phone: str, text: str, idempotency_key: str):
+    # The key is required: only keyed sends are held, rather than resent, when their
+    # outcome is unknown.
     try:
-        return await send_message(phone, text)
+        return await send_message(phone, text, idempotency_key=idempotency_key)
     except Exception as send_exc:
-        logger.error("Failed to send fallback message to %s: %s", phone, send_exc)
+        logger.error("Failed to queue message to %s: %s", phone, send_exc)
         return {"success": False, "status_code": 500, "error_message": str(send_exc)}
 
 
@@ -179,14 +189,16 @@ def _load_active_appointments_for_contact(phone: str) -> list[tuple[Appointment,
         return rows
 
 
-async def _try_fast_path(phone: str, text_content: str) -> bool:
+async def _try_fast_path(phone: str, text_content: str, reply_key: str) -> bool:
     normalized = (text_content or "").strip().lower()
-    normalized = re.sub(r"[.!?]+$", "", normalized).strip()
+    normalized = TRAILING_PUNCTUATION_PATTERN.sub("", normalized).strip()
 
     if normalized == "quero confirmar minha consulta":
-        rows = _load_active_appointments_for_contact(phone)
+        rows = await run_blocking(_load_active_appointments_for_contact, phone)
         if not rows:
-            await _safe_send_message(phone, "Não encontrei consulta ativa para este contato. Deseja agendar uma nova?")
+            await _safe_send_message(
+                phone, "Não encontrei consulta ativa para este contato. Deseja agendar uma nova?", reply_key
+            )
             return True
         if len(rows) > 1:
             options = "\n".join([f"- {_format_appointment_summary(appt, patient)}" for appt, patient in rows[:5]])
@@ -194,12 +206,13 @@ async def _try_fast_path(phone: str, text_content: str) -> bool:
                 phone,
                 "Encontrei mais de uma consulta vinculada ao seu contato. "
                 "Me diga qual deseja confirmar (data/horário):\n" + options,
+                reply_key,
             )
             return True
 
         appt, _patient = rows[0]
-        _confirm_appointment(appt.id)
-        await _safe_send_message(phone, "Sua presença foi confirmada. Aguardamos você.")
+        await run_blocking(_confirm_appointment, appt.id)
+        await _safe_send_message(phone, "Sua presença foi confirmada. Aguardamos você.", reply_key)
         return True
 
     if SMALL_TALK_PATTERN.match(normalized):
@@ -208,6 +221,7 @@ async def _try_fast_path(phone: str, text_content: str) -> bool:
             "Olá. Sou Cora da Espaço Interativo Reabilitare. "
             "Posso auxiliar com agendamentos, reagendamentos ou cancelamentos de consultas. "
             "Para outros assuntos, digite 'Falar com atendente'.",
+            reply_key,
         )
         return True
 
@@ -221,9 +235,13 @@ async def _run_agent_with_recovery(
     base_session: SQLiteSession,
     agent_input: str,
     max_turns: int = 8,
+    run_context: RagRunContext | None = None,
 ):
     try:
-        return await Runner.run(agent, input=agent_input, session=base_session, max_turns=max_turns)
+        async with agent_admission.admit(phone):
+            return await Runner.run(
+                agent, input=agent_input, session=base_session, max_turns=max_turns, context=run_context
+            )
     except Exception as exc:
         if _is_request_too_large_error(exc):
             logger.warning("[WPP] Oversized context for phone=%s. Retrying with reduced context.", phone)
@@ -232,102 +250,104 @@ async def _run_agent_with_recovery(
                 session_id=f"zapi:{phone}:recovery:{int(_time.time())}",
             )
             reduced_input = _truncate_text(agent_input, MAX_TEXT_CHARS)
-            return await Runner.run(agent, input=reduced_input, session=fallback_session, max_turns=6)
+            async with agent_admission.admit(phone):
+                return await Runner.run(
+                    agent, input=reduced_input, session=fallback_session, max_turns=6, context=run_context
+                )
         raise
 
 
+def clean_agent_reply(reply_text: str) -> str:
+    reply_text = REPLY_CLEANUP_PATTERN.sub("", reply_text)
+    # A reply that is nothing but a "(SYSTEM: ...)" note is dropped entirely.
+    if reply_text.startswith("(SYSTEM:"):
+        reply_text = SYSTEM_NOTE_PATTERN.sub("", reply_text)
+    return reply_text.strip()
+
+
 def detect_handoff_reason(text: str) -> str | None:
-    normalized = (text or "").strip().lower()
-    if HUMAN_REQUEST_PATTERN.search(normalized):
-        return "Pedido explícito de atendente."
-    if URGENCY_PATTERN.search(normalized):
-        return "Mensagem com indício de urgência."
-    if FINANCIAL_PATTERN.search(normalized):
-        return "Dúvida financeira ou de preço."
-    if COMPLAINT_PATTERN.search(normalized):
-        return "Reclamação/insatisfação."
-    return None
+    return classify_routing(text).handoff_reason
 
 
 def is_in_supported_scope(text: str) -> bool:
-    normalized = (text or "").strip().lower()
-    if GREETING_PATTERN.search(normalized):
-        return True
-    if DATE_SELECTION_PATTERN.match(normalized) or TIME_SELECTION_PATTERN.match(normalized):
-        return True
-    return bool(SCOPE_PATTERN.search(normalized))
+    return classify_routing(text).in_scope
 
-def get_phone_lock(phone: str) -> asyncio.Lock:
-    if phone not in _phone_locks:
-        _phone_locks[phone] = asyncio.Lock()
-    return _phone_locks[phone]
+def get_phone_lock(phone: str):
+    """Async context manager serializing work for `phone`."""
+    return conversation_state.hold(phone)
 
-async def process_webhook_payload(phone: str, message_id: str, text_content: str):
+async def process_webhook_payload(phone: str, message_id: str, text_content: str, *, final_attempt: bool = True):
     """
     Background worker that runs the LLM logic sequentially per-phone to prevent overlapping agent sessions.
+
+    Transient agent errors are re-raised unless `final_attempt` is set, so the inbound
+    queue retries the job with backoff; the last attempt replies with a fallback instead.
     """
-    lock = get_phone_lock(phone)
-    async with lock:
+    # Each inbound batch gets at most one reply, even if its jobs are redelivered; the
+    # queue passes the batch's first message id. Callbacks without an id still get a
+    # key of their own.
+    if message_id and message_id != "unknown":
+        reply_key = f"{message_id}:reply"
+    else:
+        reply_key = f"{phone}:{uuid.uuid4().hex}:reply"
+    async with get_phone_lock(phone):
         try:
             # --- SESSION TIMEOUT & REACTIVATION ---
-            now = _time.time()
-            last_msg = _last_message_at.get(phone, 0)
-            SESSION_TIMEOUT_SECONDS = 1800  # 30 minutes
-            
-            if phone not in _session_starts or (now - last_msg > SESSION_TIMEOUT_SECONDS):
-                _session_starts[phone] = int(now)
+            session_start, is_new_session = _touch_session(phone, _time.time())
+            if is_new_session:
                 _clear_handoff(phone)
-                _phone_out_of_scope_attempts[phone] = 0
+                conversation_state.reset_out_of_scope(phone)
                 logger.info(f"[SESSION_START] phone={phone} new session started/reactivated after timeout")
-                
-            _last_message_at[phone] = now
 
             # --- PROCESS MESSAGE ---
-            session_id = f"zapi:{phone}:{_session_starts[phone]}"
+            session_id = f"zapi:{phone}:{session_start}"
             conversation_db = os.path.join(DATA_DIR, "conversations.db")
             session = SQLiteSession(db_path=conversation_db, session_id=session_id)
             
             # Inject patient profile from Long-Term Memory
             try:
                 from src.infrastructure.vector_store import get_patient_profile
-                prefs = _truncate_text(get_patient_profile(phone), MAX_PROFILE_CHARS)
+                prefs = _truncate_text(await run_blocking(get_patient_profile, phone), MAX_PROFILE_CHARS)
             except Exception as e:
                 prefs = ""
                 logger.error(f"Failed to fetch profile: {e}")
                 
-            # Pre-process short messages/emojis into explicit intent phrases
-            text_content = preprocess_intent(_truncate_text(text_content, MAX_TEXT_CHARS))
+            # One pass: map short messages/emojis to intent phrases, then handoff and scope
+            decision = classify(_truncate_text(text_content, MAX_TEXT_CHARS))
+            if decision.intent is not None:
+                logger.info(f"[INTENT] Mapped '{text_content[:80]}' -> '{decision.text}'")
+            text_content = decision.text
 
             if _has_active_handoff(phone):
-                # Persistent handoff - do not automatically clear based on supported scope anymore
-                await _safe_send_message(phone, HANDOFF_REPLY)
+                # Sticky handoff: not cleared by supported scope, only by HANDOFF_TTL_SECONDS or a new session
+                await _safe_send_message(phone, HANDOFF_REPLY, reply_key)
                 return
 
-            handoff_reason = detect_handoff_reason(text_content)
+            handoff_reason = decision.handoff_reason
             if handoff_reason:
                 logger.info(f"[HANDOFF] phone={phone} reason={handoff_reason}")
                 _activate_handoff(phone)
-                await _safe_send_message(phone, HANDOFF_REPLY)
-                _phone_out_of_scope_attempts[phone] = 0
+                await _safe_send_message(phone, HANDOFF_REPLY, reply_key)
+                conversation_state.reset_out_of_scope(phone)
                 return
 
-            if is_in_supported_scope(text_content):
-                _phone_out_of_scope_attempts[phone] = 0
+            if decision.in_scope:
+                conversation_state.reset_out_of_scope(phone)
             else:
-                _phone_out_of_scope_attempts[phone] += 1
+                out_of_scope_attempts = conversation_state.record_out_of_scope(phone)
                 logger.info(
                     "[SCOPE] phone=%s out_of_scope_attempt=%s text=%s",
                     phone,
-                    _phone_out_of_scope_attempts[phone],
+                    out_of_scope_attempts,
                     text_content[:120],
                 )
-                if _phone_out_of_scope_attempts[phone] >= 2:
+                if out_of_scope_attempts >= 2:
                     _activate_handoff(phone)
-                    await _safe_send_message(phone, HANDOFF_REPLY)
-                    _phone_out_of_scope_attempts[phone] = 0
+                    await _safe_send_message(phone, HANDOFF_REPLY, reply_key)
+                    conversation_state.reset_out_of_scope(phone)
                     return
 
-            if await _try_fast_path(phone, text_content):
+            if await _try_fast_path(phone, text_content, reply_key):
                 logger.info("[FAST_PATH] phone=%s text=%s", phone, text_content[:80])
                 return
             
@@ -335,101 +355,118 @@ async def process_webhook_payload(phone: str, message_id: str, text_content: str
             agent_input = f"Telefone do paciente: {phone}\n{prefs}\n{text_content}"
             
             logger.info(f"[WPP:IN] phone={phone} msgId={message_id} text={text_content}")
-            
-            result = await _run_agent_with_recovery(
-                phone=phone,
-                conversation_db=conversation_db,
-                base_session=session,
-                agent_input=agent_input,
-                max_turns=8,
+
+            # Knowledge-base context is searched once per message and reused on every model
+            # turn; recognized intents and bare date/time replies skip the search.
+            rag_context = RagRunContext(
+                text_content,
+                skip=(
+                    not RAG_INJECTION_ENABLED
+                    or decision.intent is not None
+                    or is_date_or_time_selection(text_content)
+                ),
             )
-            logger.info(f"Agent response: {result}")
+            try:
+                result = await _run_agent_with_recovery(
+                    phone=phone,
+                    conversation_db=conversation_db,
+                    base_session=session,
+                    agent_input=agent_input,
+                    max_turns=8,
+                    run_context=rag_context,
+                )
+                logger.info(f"Agent response: {result}")
             
-            # --- GROQ/LLAMA WORKAROUND ---
-            final_text = result.final_output
-            if not isinstance(final_text, str):
-                final_text = str(final_text)
+                # --- GROQ/LLAMA WORKAROUND ---
+                final_text = result.final_output
+                if not isinstance(final_text, str):
+                    final_text = str(final_text)
             
-            tool_pattern = r'<function=(\w+)>(.*?)</function>'
+                tool_pattern = r'<function=(\w+)>(.*?)</function>'
             
-            for attempt in range(3):
-                matches = list(re.finditer(tool_pattern, final_text, re.DOTALL))
-                if not matches:
-                    break
-                if len(matches) > MAX_INLINE_TOOL_CALLS:
-                    logger.warning(
-                        "[INLINE_TOOL_GUARD] phone=%s too_many_calls=%s",
-                        phone,
-                        len(matches),
-                    )
-                    _activate_handoff(phone)
-                    await _safe_send_message(phone, GENERIC_ERROR_REPLY)
-                    return
-                    
-                tool_results = []
-                seen_inline_calls = defaultdict(int)
-                for match in matches:
-                    func_name = match.group(1)
-                    args_str = match.group(2).strip()
-                    call_key = f"{func_name}:{args_str}"
-                    seen_inline_calls[call_key] += 1
-                    if seen_inline_calls[call_key] > MAX_REPEATED_INLINE_SAME_CALL:
+                for attempt in range(3):
+                    matches = list(re.finditer(tool_pattern, final_text, re.DOTALL))
+                    if not matches:
+                        break
+                    if len(matches) > MAX_INLINE_TOOL_CALLS:
                         logger.warning(
-                            "[INLINE_TOOL_GUARD] phone=%s skipped_repeated_call=%s",
+                            "[INLINE_TOOL_GUARD] phone=%s too_many_calls=%s",
                             phone,
-                            call_key[:120],
+                            len(matches),
                         )
-                        continue
-                    logger.info(f"Detected tool call #{attempt+1}: {func_name}({args_str})")
+                        _activate_handoff(phone)
+                        await _safe_send_message(phone, GENERIC_ERROR_REPLY, reply_key)
+                        return
                     
-                    if func_name in TOOL_MAP:
-                        try:
-                            kwargs = json.loads(args_str) if args_str else {}
-                            tool_output = TOOL_MAP[func_name](**kwargs)
-                        except json.JSONDecodeError:
-                            tool_output = f"Error: Invalid JSON arguments: {args_str}"
-                        except Exception as e:
-                            tool_output = f"Error executing {func_name}: {e}"
-                    else:
-                        tool_output = f"Tool '{func_name}' not available."
+                    tool_results = []
+                    seen_inline_calls = defaultdict(int)
+                    for match in matches:
+                        func_name = match.group(1)
+                        args_str = match.group(2).strip()
+                        call_key = f"{func_name}:{args_str}"
+                        seen_inline_calls[call_key] += 1
+                        if seen_inline_calls[call_key] > MAX_REPEATED_INLINE_SAME_CALL:
+                            logger.warning(
+                                "[INLINE_TOOL_GUARD] phone=%s skipped_repeated_call=%s",
+                                phone,
+                                call_key[:120],
+                            )
+                            continue
+                        logger.info(f"Detected tool call #{attempt+1}: {func_name}({args_str})")
+                    
+                        if func_name in TOOL_MAP:
+                            try:
+                                kwargs = json.loads(args_str) if args_str else {}
+                                tool_output = await run_blocking(TOOL_MAP[func_name], **kwargs)
+                            except json.JSONDecodeError:
+                                tool_output = f"Error: Invalid JSON arguments: {args_str}"
+                            except Exception as e:
+                                tool_output = f"Error executing {func_name}: {e}"
+                        else:
+                            tool_output = f"Tool '{func_name}' not available."
                         
-                    logger.info(f"Tool Output: {tool_output}")
-                    tool_results.append(
-                        f"Tool '{func_name}' returned: {_truncate_text(str(tool_output), MAX_TOOL_OUTPUT_CHARS)}"
-                    )
-                if not tool_results:
-                    break
+                        logger.info(f"Tool Output: {tool_output}")
+                        tool_results.append(
+                            f"Tool '{func_name}' returned: {_truncate_text(str(tool_output), MAX_TOOL_OUTPUT_CHARS)}"
+                        )
+                    if not tool_results:
+                        break
                 
-                results_summary = _truncate_text("\n".join(tool_results), MAX_TEXT_CHARS)
-                next_input = f"(SYSTEM: {results_summary}\nBased on these results, respond to the user in Portuguese.)"
-                inline_session = SQLiteSession(
-                    db_path=conversation_db,
-                    session_id=f"{session_id}:inline:{attempt}:{int(_time.time())}",
-                )
+                    results_summary = _truncate_text("\n".join(tool_results), MAX_TEXT_CHARS)
+                    next_input = f"(SYSTEM: {results_summary}\nBased on these results, respond to the user in Portuguese.)"
+                    inline_session = SQLiteSession(
+                        db_path=conversation_db,
+                        session_id=f"{session_id}:inline:{attempt}:{int(_time.time())}",
+                    )
                 
-                result = await _run_agent_with_recovery(
-                    phone=phone,
-                    conversation_db=conversation_db,
-                    base_session=inline_session,
-                    agent_input=next_input,
-                    max_turns=6,
+                    result = await _run_agent_with_recovery(
+                        phone=phone,
+                        conversation_db=conversation_db,
+                        base_session=inline_session,
+                        agent_input=next_input,
+                        max_turns=6,
+                        run_context=rag_context,
+                    )
+                    final_text = result.final_output
+                    if not isinstance(final_text, str):
+                        final_text = str(final_text)
+                    logger.info(f"Agent follow-up response (attempt {attempt+1}): {final_text}")
+            finally:
+                rag_context.record()
+                logger.info(
+                    "[RAG] phone=%s skipped=%s searches=%s avoided=%s",
+                    phone,
+                    rag_context.skip,
+                    rag_context.searches,
+                    rag_context.avoided_searches,
                 )
-                final_text = result.final_output
-                if not isinstance(final_text, str):
-                    final_text = str(final_text)
-                logger.info(f"Agent follow-up response (attempt {attempt+1}): {final_text}")
             
             # --- RESPONSE CLEANUP ---
             reply_text = final_text
             if not isinstance(reply_text, str):
                 reply_text = str(reply_text)
                 
-            reply_text = re.sub(r'<thought>.*?</thought>', '', reply_text, flags=re.DOTALL)
-            reply_text = re.sub(r'\[TOOL_CALL\]|\[SYSTEM\]|\[FUNCTION\]', '', reply_text)
-            reply_text = re.sub(r'Telefone do paciente:\s*\S+', '', reply_text)
-            reply_text = re.sub(r'<function=.*?>.*?</function>', '', reply_text, flags=re.DOTALL)
-            reply_text = re.sub(r'^\(SYSTEM:.*?\)$', '', reply_text, flags=re.DOTALL)
-            reply_text = reply_text.strip()
+            reply_text = clean_agent_reply(reply_text)
             if "<function=" in reply_text:
                 reply_text = "Desculpe, tive uma instabilidade para processar esta solicitação. Vou encaminhar para um atendente."
                 _activate_handoff(phone)
@@ -439,13 +476,20 @@ async def process_webhook_payload(phone: str, message_id: str, text_content: str
             if "atendente humano" in reply_text.lower() or "encaminhada para um atendente" in reply_text.lower():
                 _activate_handoff(phone)
                 
-            send_success = await _safe_send_message(phone, reply_text)
+            send_success = await _safe_send_message(phone, reply_text, reply_key)
             logger.info(f"[WPP:OUT] phone={phone} success={send_success} reply={reply_text[:100]}...")
             
+        except AgentOverloaded as e:
+            logger.warning(f"[WPP] Agent overloaded for phone={phone}: {e}. Shedding with handoff reply.")
+            _activate_handoff(phone)
+            await _safe_send_message(phone, RATE_LIMIT_REPLY, reply_key)
         except Exception as e:
+            if not final_attempt and _is_transient_error(e):
+                logger.warning(f"[WPP] Transient agent error for phone={phone}, leaving the job to be retried: {e}")
+                raise
             import traceback
             error_trace = traceback.format_exc()
             logger.error(f"CRITICAL Error in background task for {phone}: {e}\n{error_trace}")
             fallback = RATE_LIMIT_REPLY if (_is_rate_limit_error(e) or _is_request_too_large_error(e)) else GENERIC_ERROR_REPLY
             _activate_handoff(phone)
-            await _safe_send_message(phone, fallback)
+            await _safe_send_message(phone, fallback, reply_key)
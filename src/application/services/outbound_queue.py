@@ -0,0 +1,697 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time as _time
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+
+from sqlmodel import Session
+
+from src.core.config import OUTBOUND_QUEUE_CONFIG
+from src.domain.models import NotificationLog
+from src.infrastructure.database import engine
+from src.infrastructure.executor import run_blocking
+from src.infrastructure.services import zapi
+
+logger = logging.getLogger("PostClinics.OutboundQueue")
+
+PENDING = "pending"
+SENDING = "sending"
+# A keyed message whose send started but never got an answer (crash mid-send, read
+# timeout): it may have reached the patient, so it waits for `reconcile` instead.
+IN_DOUBT = "in_doubt"
+
+# Outcomes reported to `on_status`, mirrored into NotificationLog.status.
+SENT = "sent"
+RETRYING = "retrying"
+FAILED = "failed"
+
+
+class OutboundMessage:
+    __slots__ = ("id", "phone", "text", "notification_log_id", "attempts", "idempotency_key")
+
+    def __init__(
+        self,
+        id: int,
+        phone: str,
+        text: str,
+        notification_log_id: int | None,
+        attempts: int,
+        idempotency_key: str | None = None,
+    ):
+        self.id = id
+        self.phone = phone
+        self.text = text
+        self.notification_log_id = notification_log_id
+        self.attempts = attempts
+        self.idempotency_key = idempotency_key
+
+
+class OutboundMessageQueue:
+    """
+    Durable queue of outbound WhatsApp messages on a WAL-mode SQLite file.
+
+    A phone's messages go out strictly in order: a message is only leased once every
+    earlier message of the same phone has been sent or dead-lettered. Each lease takes a
+    token from a send budget stored in the same file (`rate_per_second`, up to `burst`),
+    so every process draining the queue shares one provider rate limit. Failed sends
+    back off exponentially with jitter; after `max_attempts`, or on a permanent error,
+    the message moves to the `outbound_dead_letter` table.
+
+    Messages may carry a deterministic idempotency key (`<appointment>:24h`,
+    `<message_id>:reply`), recorded in `outbound_key` before the first send. Enqueueing
+    a key that is already queued, in flight or sent is suppressed. A keyed send that
+    may or may not have gone out is never retried on its own: it is held as IN_DOUBT,
+    listed by `in_doubt()` and settled with `reconcile()`. Settled keys are kept for
+    `key_retention_seconds`; keys still in doubt are kept until settled.
+
+    An in-doubt message does not hold back the phone's later messages, so a patient
+    keeps getting replies while it waits for an operator. Ordering is deliberately
+    given up for it: a send requeued by `reconcile()` goes out after the replies that
+    overtook it, though still ahead of the phone's messages that are queued.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        rate_per_second: float,
+        burst: int,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        key_retention_seconds: float = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.key_retention_seconds = key_retention_seconds
+        self.enqueued = 0
+        self.sent = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.rate_limited = 0
+        self.deferred = 0
+        self.suppressed = 0
+        self.held_in_doubt = 0
+        self.lease_expirations = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbound_message (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone TEXT NOT NULL,
+                text TEXT NOT NULL,
+                notification_log_id INTEGER,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                lease_expires_at REAL,
+                last_error TEXT,
+                idempotency_key TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_outbound_message_status ON outbound_message (status, available_at);
+            CREATE INDEX IF NOT EXISTS ix_outbound_message_phone ON outbound_message (phone, id);
+            CREATE TABLE IF NOT EXISTS outbound_dead_letter (
+                id INTEGER PRIMARY KEY,
+                phone TEXT NOT NULL,
+                text TEXT NOT NULL,
+                notification_log_id INTEGER,
+                attempts INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                dead_at REAL NOT NULL,
+                last_error TEXT,
+                idempotency_key TEXT
+            );
+            CREATE TABLE IF NOT EXISTS send_budget (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS outbound_key (
+                idempotency_key TEXT PRIMARY KEY,
+                message_id INTEGER NOT NULL,
+                phone TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_outbound_key_message ON outbound_key (message_id);
+            """
+        )
+        # Queue files written before idempotency keys existed.
+        for table in ("outbound_message", "outbound_dead_letter"):
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if "idempotency_key" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN idempotency_key TEXT")
+
+    def enqueue(
+        self, phone: str, text: str, notification_log_id: int | None = None, idempotency_key: str | None = None
+    ) -> int | None:
+        """Returns the new message id, or None when `idempotency_key` was already queued or sent."""
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key is not None:
+                    row = self._conn.execute(
+                        "SELECT status FROM outbound_key WHERE idempotency_key = ?", (idempotency_key,)
+                    ).fetchone()
+                    # Only a dead-lettered key may be sent again.
+                    if row is not None and row[0] != FAILED:
+                        self._conn.execute("COMMIT")
+                        self.suppressed += 1
+                        logger.info("[OUTBOUND] Suppressed duplicate key=%s (%s)", idempotency_key, row[0])
+                        return None
+                cursor = self._conn.execute(
+                    "INSERT INTO outbound_message (phone, text, notification_log_id, created_at, available_at, idempotency_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (phone, text, notification_log_id, now, now, idempotency_key),
+                )
+                if idempotency_key is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO outbound_key (idempotency_key, message_id, phone, status, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (idempotency_key, cursor.lastrowid, phone, PENDING, now),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.enqueued += 1
+        return cursor.lastrowid
+
+    def _mark_key(self, message_id: int, status: str, now: float):
+        # Caller holds the lock; a no-op for unkeyed messages.
+        self._conn.execute(
+            "UPDATE outbound_key SET status = ?, updated_at = ? WHERE message_id = ?", (status, now, message_id)
+        )
+
+    def key_status(self, idempotency_key: str) -> str | None:
+        """PENDING, SENDING, IN_DOUBT, SENT or FAILED for a known key; None otherwise."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM outbound_key WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def reclaim_expired_leases(self) -> int:
+        """
+        Requeues messages whose sender died mid-send. Keyed ones may already have been
+        delivered, so they are held as IN_DOUBT rather than sent again.
+        """
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE outbound_key SET status = ?, updated_at = ? WHERE message_id IN ("
+                    "SELECT id FROM outbound_message WHERE status = ? AND lease_expires_at <= ? "
+                    "AND idempotency_key IS NOT NULL)",
+                    (IN_DOUBT, now, SENDING, now),
+                )
+                held = self._conn.execute(
+                    "UPDATE outbound_message SET status = ?, lease_expires_at = NULL "
+                    "WHERE status = ? AND lease_expires_at <= ? AND idempotency_key IS NOT NULL",
+                    (IN_DOUBT, SENDING, now),
+                ).rowcount
+                requeued = self._conn.execute(
+                    "UPDATE outbound_message SET status = ?, lease_expires_at = NULL WHERE status = ? AND lease_expires_at <= ?",
+                    (PENDING, SENDING, now),
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        reclaimed = held + requeued
+        if reclaimed:
+            self.lease_expirations += reclaimed
+            self.held_in_doubt += held
+            logger.warning(
+                "[OUTBOUND] Reclaimed %s message(s) with expired leases (%s held in doubt)", reclaimed, held
+            )
+        return reclaimed
+
+    def _take_token(self, now: float) -> float:
+        """Spends one send token; returns 0, or the seconds until one is available."""
+        row = self._conn.execute("SELECT tokens, updated_at FROM send_budget WHERE id = 1").fetchone()
+        tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate_per_second)
+        if tokens < 1:
+            return (1 - tokens) / self.rate_per_second
+        self._conn.execute(
+            "INSERT INTO send_budget (id, tokens, updated_at) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+            (tokens - 1, now),
+        )
+        return 0.0
+
+    def lease(self) -> tuple[OutboundMessage | None, float]:
+        """
+        Leases the oldest message that is first in line for its phone. Returns
+        (message, 0), (None, seconds until the send budget refills) or (None, 0) when
+        nothing is ready.
+        """
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # An in-doubt message does not hold back the phone's later messages.
+                row = self._conn.execute(
+                    """
+                    SELECT m.id, m.phone, m.text, m.notification_log_id, m.attempts, m.idempotency_key
+                    FROM outbound_message m
+                    WHERE m.status = 'pending' AND m.available_at <= ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM outbound_message o
+                          WHERE o.phone = m.phone AND o.id < m.id AND o.status != 'in_doubt'
+                      )
+                    ORDER BY m.id
+                    LIMIT 1
+                    """,
+                    (now,),
+                ).fetchone()
+                wait = self._take_token(now) if row is not None else 0.0
+                if row is None or wait:
+                    self._conn.execute("COMMIT")
+                    if wait:
+                        self.rate_limited += 1
+                    return None, wait
+                self._conn.execute(
+                    "UPDATE outbound_message SET status = ?, attempts = attempts + 1, lease_expires_at = ? WHERE id = ?",
+                    (SENDING, now + self.lease_seconds, row[0]),
+                )
+                self._mark_key(row[0], SENDING, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        message_id, phone, text, notification_log_id, attempts, idempotency_key = row
+        return OutboundMessage(message_id, phone, text, notification_log_id, attempts + 1, idempotency_key), 0.0
+
+    def ack(self, message: OutboundMessage):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM outbound_message WHERE id = ?", (message.id,))
+                self._mark_key(message.id, SENT, _time.time())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.sent += 1
+
+    def nack(self, message: OutboundMessage, error: str, permanent: bool = False) -> str:
+        """Backs off with jitter and returns RETRYING, or dead-letters and returns FAILED."""
+        now = _time.time()
+        error = (error or "")[:500]
+        if permanent or message.attempts >= self.max_attempts:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.execute(
+                        """
+                        INSERT OR REPLACE INTO outbound_dead_letter
+                            (id, phone, text, notification_log_id, attempts, created_at, dead_at, last_error, idempotency_key)
+                        SELECT id, phone, text, notification_log_id, ?, created_at, ?, ?, idempotency_key
+                        FROM outbound_message WHERE id = ?
+                        """,
+                        (message.attempts, now, error, message.id),
+                    )
+                    self._conn.execute("DELETE FROM outbound_message WHERE id = ?", (message.id,))
+                    self._mark_key(message.id, FAILED, now)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            self.dead_lettered += 1
+            logger.error("[OUTBOUND] Dead-lettered message=%s phone=%s: %s", message.id, message.phone, error)
+            return FAILED
+
+        ceiling = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** (message.attempts - 1)))
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE outbound_message SET status = ?, available_at = ?, lease_expires_at = NULL, last_error = ? "
+                    "WHERE id = ?",
+                    (PENDING, now + delay, error, message.id),
+                )
+                self._mark_key(message.id, PENDING, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.retried += 1
+        logger.warning("[OUTBOUND] Retrying message=%s phone=%s in %.1fs: %s", message.id, message.phone, delay, error)
+        return RETRYING
+
+    def defer(self, message: OutboundMessage, delay: float, reason: str):
+        """Puts a leased message back for `delay` seconds without spending one of its attempts."""
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE outbound_message SET status = ?, attempts = attempts - 1, available_at = ?, "
+                    "lease_expires_at = NULL, last_error = ? WHERE id = ?",
+                    (PENDING, now + delay, reason[:500], message.id),
+                )
+                self._mark_key(message.id, PENDING, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.deferred += 1
+
+    def hold(self, message: OutboundMessage, error: str):
+        """Parks a keyed message whose send may have gone out until it is reconciled."""
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE outbound_message SET status = ?, lease_expires_at = NULL, last_error = ? WHERE id = ?",
+                    (IN_DOUBT, (error or "")[:500], message.id),
+                )
+                self._mark_key(message.id, IN_DOUBT, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.held_in_doubt += 1
+        logger.warning(
+            "[OUTBOUND] Holding message=%s key=%s in doubt: %s", message.id, message.idempotency_key, error
+        )
+
+    def in_doubt(self, limit: int = 100) -> list[dict]:
+        """Keyed messages that may or may not have reached the patient, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.id, m.idempotency_key, m.phone, m.text, m.notification_log_id, m.attempts, "
+                "k.updated_at, m.last_error FROM outbound_message m "
+                "JOIN outbound_key k ON k.idempotency_key = m.idempotency_key "
+                "WHERE m.status = ? ORDER BY k.updated_at LIMIT ?",
+                (IN_DOUBT, limit),
+            ).fetchall()
+        keys = ("id", "idempotency_key", "phone", "text", "notification_log_id", "attempts", "since", "last_error")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def reconcile(self, idempotency_key: str, delivered: bool) -> OutboundMessage | None:
+        """
+        Settles an in-doubt send: `delivered` marks it sent, otherwise it is queued
+        again at once with its attempts reset, keeping its place ahead of the phone's
+        queued messages (not of those already sent). Returns the message, or None if
+        the key is not in doubt.
+        """
+        now = _time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, phone, text, notification_log_id, attempts FROM outbound_message "
+                    "WHERE idempotency_key = ? AND status = ?",
+                    (idempotency_key, IN_DOUBT),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                if delivered:
+                    self._conn.execute("DELETE FROM outbound_message WHERE id = ?", (row[0],))
+                else:
+                    # A fresh start: the held send is not counted against the retry budget.
+                    self._conn.execute(
+                        "UPDATE outbound_message SET status = ?, available_at = ?, attempts = 0 WHERE id = ?",
+                        (PENDING, now, row[0]),
+                    )
+                    row = (*row[:4], 0)
+                self._mark_key(row[0], SENT if delivered else PENDING, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info("[OUTBOUND] Reconciled key=%s delivered=%s", idempotency_key, delivered)
+        return OutboundMessage(*row, idempotency_key=idempotency_key)
+
+    def prune_keys(self) -> int:
+        """
+        Forgets sent and dead-lettered keys older than `key_retention_seconds`. A key
+        whose message is still in the queue (pending, sending or in doubt) is kept
+        however old it is, so a held send cannot be enqueued a second time.
+        """
+        cutoff = _time.time() - self.key_retention_seconds
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM outbound_key WHERE status IN (?, ?) AND updated_at < ? "
+                "AND message_id NOT IN (SELECT id FROM outbound_message)",
+                (SENT, FAILED, cutoff),
+            ).rowcount
+
+    def dead_letters(self, limit: int = 100) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, phone, text, notification_log_id, attempts, dead_at, last_error "
+                "FROM outbound_dead_letter ORDER BY dead_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        keys = ("id", "phone", "text", "notification_log_id", "attempts", "dead_at", "last_error")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.executescript(
+                "DELETE FROM outbound_message; DELETE FROM outbound_dead_letter; DELETE FROM send_budget; "
+                "DELETE FROM outbound_key;"
+            )
+        self.enqueued = 0
+        self.sent = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.rate_limited = 0
+        self.deferred = 0
+        self.suppressed = 0
+        self.held_in_doubt = 0
+        self.lease_expirations = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        now = _time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, count(*) FROM outbound_message GROUP BY status").fetchall())
+            oldest_pending, = self._conn.execute(
+                "SELECT min(created_at) FROM outbound_message WHERE status = 'pending'"
+            ).fetchone()
+            dead, = self._conn.execute("SELECT count(*) FROM outbound_dead_letter").fetchone()
+        return {
+            "depth": counts.get(PENDING, 0),
+            "sending": counts.get(SENDING, 0),
+            "in_doubt": counts.get(IN_DOUBT, 0),
+            "dead": dead,
+            "oldest_pending_age_seconds": round(now - oldest_pending, 3) if oldest_pending else 0.0,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "rate_limited": self.rate_limited,
+            "deferred": self.deferred,
+            "suppressed": self.suppressed,
+            "held_in_doubt": self.held_in_doubt,
+            "lease_expirations": self.lease_expirations,
+        }
+
+
+def is_permanent_failure(result: dict) -> bool:
+    # 4xx (invalid phone, bad request) and missing credentials (status 0) won't succeed on
+    # retry; a 429 is the provider's rate limit and will.
+    status = result.get("status_code") or 0
+    return status == 0 or (400 <= status < 500 and status != 429)
+
+
+class OutboundSender:
+    """
+    Async workers that drain an OutboundMessageQueue through `send(phone, text)` (a
+    single Z-API attempt returning {success, status_code, error_message}) and report
+    each outcome to `on_status(message, status, error)`. While `retry_after()` is
+    positive (the Z-API circuit is open) nothing is leased; a send rejected by an open
+    circuit is parked until then without spending an attempt. A keyed send whose result
+    is `in_doubt` (the request went out, no answer came back) is held, not retried.
+    """
+
+    def __init__(
+        self,
+        queue: OutboundMessageQueue,
+        send: Callable[[str, str], Awaitable[dict]],
+        *,
+        workers: int,
+        poll_interval_seconds: float,
+        on_status: Callable[[OutboundMessage, str, str | None], Awaitable[None]] | None = None,
+        retry_after: Callable[[], float] | None = None,
+    ):
+        self.queue = queue
+        self.send = send
+        self.workers = workers
+        self.poll_interval_seconds = poll_interval_seconds
+        self.on_status = on_status
+        self.retry_after = retry_after
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._housekeep())]
+        self._tasks += [asyncio.create_task(self._run_worker(i)) for i in range(self.workers)]
+        logger.info("[OUTBOUND] Started %s sender(s)", self.workers)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def _wait_for_work(self, timeout: float):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _housekeep(self):
+        try:
+            await run_blocking(self.queue.reclaim_expired_leases)
+            await run_blocking(self.queue.prune_keys)
+        except Exception as e:
+            logger.error(f"[OUTBOUND] Startup housekeeping failed: {e}")
+
+    async def _deliver(self, message: OutboundMessage) -> tuple[str, str | None]:
+        try:
+            result = await self.send(message.phone, message.text)
+        except asyncio.CancelledError:
+            # Shutdown mid-send: once the lease expires a keyed message is held in doubt
+            # for reconciliation, and an unkeyed one goes out again.
+            raise
+        except Exception as e:
+            error = f"Send raised: {e!r}"
+            if message.idempotency_key is not None:
+                # It may have failed after the request went out.
+                await run_blocking(self.queue.hold, message, error)
+                return IN_DOUBT, error
+            return await run_blocking(self.queue.nack, message, error), error
+        if result.get("success"):
+            await run_blocking(self.queue.ack, message)
+            return SENT, None
+        if result.get("circuit_open"):
+            delay = self.retry_after() if self.retry_after is not None else 0.0
+            await run_blocking(self.queue.defer, message, max(delay, self.poll_interval_seconds), result.get("error_message") or "")
+            return None, None
+        error = result.get("error_message") or f"status {result.get('status_code')}"
+        if result.get("in_doubt") and message.idempotency_key is not None:
+            await run_blocking(self.queue.hold, message, error)
+            return IN_DOUBT, error
+        return await run_blocking(self.queue.nack, message, error, permanent=is_permanent_failure(result)), error
+
+    async def _run_worker(self, worker_id: int):
+        while True:
+            paused = self.retry_after() if self.retry_after is not None else 0.0
+            if paused:
+                await self._wait_for_work(min(paused, self.poll_interval_seconds))
+                continue
+            try:
+                await run_blocking(self.queue.reclaim_expired_leases)
+                message, wait = await run_blocking(self.queue.lease)
+            except Exception as e:
+                logger.error(f"[OUTBOUND] Sender {worker_id} failed to lease: {e}")
+                message, wait = None, 0.0
+
+            if message is None:
+                await self._wait_for_work(min(wait, self.poll_interval_seconds) if wait else self.poll_interval_seconds)
+                continue
+
+            status, error = await self._deliver(message)
+            if status is not None and self.on_status is not None:
+                try:
+                    await self.on_status(message, status, error)
+                except Exception as e:
+                    logger.error(f"[OUTBOUND] Status hook failed for message={message.id}: {e}")
+
+
+def _record_notification_status(log_id: int, status: str, attempts: int, error: str | None):
+    with Session(engine) as session:
+        log = session.get(NotificationLog, log_id)
+        if log is None:
+            return
+        log.status = status
+        log.attempt_count = attempts
+        log.error_message = error
+        if status == SENT:
+            log.sent_at = datetime.now()
+        session.add(log)
+        session.commit()
+
+
+async def update_notification_log(message: OutboundMessage, status: str, error: str | None):
+    if message.notification_log_id is None:
+        return
+    if status == FAILED:
+        error = f"Dead-lettered after {message.attempts} attempt(s): {error}"
+    await run_blocking(_record_notification_status, message.notification_log_id, status, message.attempts, error)
+
+
+async def _send_once(phone: str, text: str) -> dict:
+    # Retries are the queue's job, off the conversation's hot path.
+    return await zapi.send_message(phone, text, max_retries=1)
+
+
+outbound_queue = OutboundMessageQueue(
+    OUTBOUND_QUEUE_CONFIG["path"],
+    rate_per_second=OUTBOUND_QUEUE_CONFIG["rate_per_second"],
+    burst=OUTBOUND_QUEUE_CONFIG["burst"],
+    lease_seconds=OUTBOUND_QUEUE_CONFIG["lease_seconds"],
+    max_attempts=OUTBOUND_QUEUE_CONFIG["max_attempts"],
+    retry_base_seconds=OUTBOUND_QUEUE_CONFIG["retry_base_seconds"],
+    retry_max_seconds=OUTBOUND_QUEUE_CONFIG["retry_max_seconds"],
+    key_retention_seconds=OUTBOUND_QUEUE_CONFIG["key_retention_seconds"],
+)
+outbound_sender = OutboundSender(
+    outbound_queue,
+    _send_once,
+    workers=OUTBOUND_QUEUE_CONFIG["workers"],
+    poll_interval_seconds=OUTBOUND_QUEUE_CONFIG["poll_interval_seconds"],
+    on_status=update_notification_log,
+    retry_after=zapi.circuit_breaker.retry_after,
+)
+
+
+async def send_message(
+    phone: str, text: str, notification_log_id: int | None = None, idempotency_key: str | None = None
+) -> dict:
+    """
+    Queues `text` for `phone` and returns at once; the senders deliver it. Same result
+    shape as zapi.send_message, with `queued` set, or `duplicate` when
+    `idempotency_key` was already queued or sent.
+    """
+    message_id = await run_blocking(outbound_queue.enqueue, phone, text, notification_log_id, idempotency_key)
+    if message_id is None:
+        return {"success": True, "status_code": 202, "error_message": None, "queued": False, "duplicate": True}
+    outbound_sender.notify()
+    return {"success": True, "status_code": 202, "error_message": None, "queued": True, "outbound_id": message_id}
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time as _time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+logger = logging.getLogger("PostClinics.RateLimiter")
+
+RATE_LIMITED = "rate_limited"
+COOLDOWN = "cooldown"
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at", "last_accepted_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.last_accepted_at = None
+
+
+class PhoneRateLimiter:
+    """
+    Token-bucket limiter per phone covering `max_messages_per_minute` and `cooldown_seconds`.
+
+    Each phone holds one fixed-size bucket. The bucket refills completely within 60s,
+    so a phone idle for longer than that (and longer than the cooldown) is
+    indistinguishable from a new one and is dropped by `evict_idle`.
+    Limits are read from `config` on every call, so runtime changes apply immediately.
+    """
+
+    def __init__(self, config: Mapping):
+        self.config = config
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+        self.allowed = 0
+        self.throttled_rate_limit = 0
+        self.throttled_cooldown = 0
+        self.evicted = 0
+
+    def _limits(self) -> tuple[int, float]:
+        return self.config["max_messages_per_minute"], self.config["cooldown_seconds"]
+
+    def idle_seconds(self) -> float:
+        _, cooldown = self._limits()
+        return max(60.0, float(cooldown))
+
+    def check(self, phone: str, now: float | None = None) -> str | None:
+        """Consumes a token for `phone`. Returns None when allowed, otherwise the throttle reason."""
+        now = _time.monotonic() if now is None else now
+        capacity, cooldown = self._limits()
+
+        bucket = self._buckets.get(phone)
+        if bucket is None:
+            bucket = _Bucket(float(capacity), now)
+            self._buckets[phone] = bucket
+        else:
+            elapsed = max(0.0, now - bucket.updated_at)
+            bucket.tokens = min(float(capacity), bucket.tokens + elapsed * capacity / 60.0)
+            bucket.updated_at = now
+            self._buckets.move_to_end(phone)
+
+        if bucket.tokens < 1.0:
+            self.throttled_rate_limit += 1
+            return RATE_LIMITED
+
+        if bucket.last_accepted_at is not None and (now - bucket.last_accepted_at) < cooldown:
+            self.throttled_cooldown += 1
+            return COOLDOWN
+
+        bucket.tokens -= 1.0
+        bucket.last_accepted_at = now
+        self.allowed += 1
+        return None
+
+    def evict_idle(self, now: float | None = None) -> int:
+        """Drops buckets untouched for longer than `idle_seconds()`. Oldest buckets sit at the front."""
+        now = _time.monotonic() if now is None else now
+        idle_seconds = self.idle_seconds()
+        removed = 0
+        while self._buckets:
+            phone, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated_at < idle_seconds:
+                break
+            del self._buckets[phone]
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    async def run_eviction_loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed = self.evict_idle()
+                if removed:
+                    logger.debug("[ANTISPAM] Evicted %s idle phone bucket(s)", removed)
+            except Exception as e:
+                logger.error(f"Rate limiter eviction failed: {e}")
+
+    def clear(self):
+        self._buckets.clear()
+        self.allowed = 0
+        self.throttled_rate_limit = 0
+        self.throttled_cooldown = 0
+        self.evicted = 0
+
+    def stats(self) -> dict:
+        return {
+            "tracked_phones": len(self._buckets),
+            "allowed": self.allowed,
+            "throttled": self.throttled_rate_limit + self.throttled_cooldown,
+            "throttled_rate_limit": self.throttled_rate_limit,
+            "throttled_cooldown": self.throttled_cooldown,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,477 @@
+import abc
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time as _time
+from collections.abc import Mapping
+
+from src.core.config import ANTISPAM_CONFIG, DATA_DIR, STATE_BACKEND, STATE_BACKEND_URL
+from src.application.services.deduplication import MessageDeduplicator
+from src.application.services.rate_limiter import PhoneRateLimiter, RATE_LIMITED, COOLDOWN
+
+logger = logging.getLogger("PostClinics.StateBackend")
+
+
+class StateBackend(abc.ABC):
+    """
+    Storage for the webhook's anti-spam and conversation state.
+
+    Every operation is atomic for its key, so several uvicorn workers sharing one
+    backend agree on duplicates, rate limits, handoffs and sessions.
+    """
+
+    name = "base"
+
+    def __init__(self, config: Mapping):
+        self.config = config
+        self.duplicate_hits = 0
+        self.duplicate_misses = 0
+        self.throttled_rate_limit = 0
+        self.throttled_cooldown = 0
+        self.allowed = 0
+
+    @abc.abstractmethod
+    def is_duplicate_message(self, message_id: str) -> bool:
+        """Records `message_id` and returns True if it was already recorded inside the dedup window."""
+
+    def are_duplicate_messages(self, message_ids: list[str]) -> list[bool]:
+        """Batch form of `is_duplicate_message`; repeats inside the batch count as duplicates."""
+        return [self.is_duplicate_message(message_id) for message_id in message_ids]
+
+    @abc.abstractmethod
+    def check_rate_limit(self, phone: str) -> str | None:
+        """Consumes one message for `phone`. Returns None when allowed, otherwise the throttle reason."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> str | None:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str, ttl_seconds: float | None = None):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        ...
+
+    def evict_expired(self) -> int:
+        return 0
+
+    def clear(self):
+        self.duplicate_hits = 0
+        self.duplicate_misses = 0
+        self.throttled_rate_limit = 0
+        self.throttled_cooldown = 0
+        self.allowed = 0
+
+    def close(self):
+        pass
+
+    def _count_dedup(self, duplicate: bool) -> bool:
+        if duplicate:
+            self.duplicate_hits += 1
+        else:
+            self.duplicate_misses += 1
+        return duplicate
+
+    def _count_throttle(self, reason: str | None) -> str | None:
+        if reason == RATE_LIMITED:
+            self.throttled_rate_limit += 1
+        elif reason == COOLDOWN:
+            self.throttled_cooldown += 1
+        else:
+            self.allowed += 1
+        return reason
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "dedup": {"hits": self.duplicate_hits, "misses": self.duplicate_misses},
+            "rate_limit": {
+                "allowed": self.allowed,
+                "throttled": self.throttled_rate_limit + self.throttled_cooldown,
+                "throttled_rate_limit": self.throttled_rate_limit,
+                "throttled_cooldown": self.throttled_cooldown,
+            },
+        }
+
+    async def run_eviction_loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed = self.evict_expired()
+                if removed:
+                    logger.debug("[STATE] Evicted %s expired entries from %s backend", removed, self.name)
+            except Exception as e:
+                logger.error(f"State backend eviction failed: {e}")
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local backend. Only correct with a single worker."""
+
+    name = "memory"
+
+    def __init__(self, config: Mapping):
+        super().__init__(config)
+        self.dedup = MessageDeduplicator(
+            window_seconds=config["dedup_window_seconds"],
+            max_entries=config["dedup_max_entries"],
+        )
+        self.rate_limiter = PhoneRateLimiter(config)
+        self._values: dict[str, tuple[str, float | None]] = {}
+
+    def is_duplicate_message(self, message_id: str) -> bool:
+        return self.dedup.check_and_add(message_id)
+
+    def check_rate_limit(self, phone: str) -> str | None:
+        return self.rate_limiter.check(phone)
+
+    def get(self, key: str) -> str | None:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= _time.time():
+            del self._values[key]
+            return None
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: float | None = None):
+        expires_at = _time.time() + ttl_seconds if ttl_seconds is not None else None
+        self._values[key] = (value, expires_at)
+
+    def delete(self, key: str):
+        self._values.pop(key, None)
+
+    def export_values(self) -> list[tuple[str, str, float | None]]:
+        """Live keys as (key, value, expires_at) rows, for snapshots across restarts."""
+        now = _time.time()
+        return [
+            (key, value, expires_at)
+            for key, (value, expires_at) in self._values.items()
+            if expires_at is None or expires_at > now
+        ]
+
+    def import_values(self, rows: list[tuple[str, str, float | None]]):
+        now = _time.time()
+        for key, value, expires_at in rows:
+            if expires_at is None or expires_at > now:
+                self._values[key] = (value, expires_at)
+
+    def evict_expired(self) -> int:
+        now = _time.time()
+        expired = [k for k, (_, expires_at) in self._values.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._values[key]
+        return len(expired) + self.rate_limiter.evict_idle()
+
+    def clear(self):
+        super().clear()
+        self.dedup.clear()
+        self.rate_limiter.clear()
+        self._values.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "dedup": self.dedup.stats(),
+            "rate_limit": self.rate_limiter.stats(),
+            "keys": len(self._values),
+        }
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Backend on a SQLite file in WAL mode, shared by every worker on the host.
+    Dedup is a single conditional upsert; rate-limit buckets are updated inside
+    BEGIN IMMEDIATE so concurrent workers serialize on the write lock.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, config: Mapping, path: str):
+        super().__init__(config)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seen_message (
+                message_id TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_seen_message_expires_at ON seen_message (expires_at);
+            CREATE TABLE IF NOT EXISTS rate_bucket (
+                phone TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_accepted_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_rate_bucket_updated_at ON rate_bucket (updated_at);
+            CREATE TABLE IF NOT EXISTS state_value (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            );
+            """
+        )
+
+    def is_duplicate_message(self, message_id: str) -> bool:
+        now = _time.time()
+        expires_at = now + self.config["dedup_window_seconds"]
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO seen_message (message_id, expires_at) VALUES (?, ?)
+                ON CONFLICT(message_id) DO UPDATE SET expires_at = excluded.expires_at
+                WHERE seen_message.expires_at <= ?
+                """,
+                (message_id, expires_at, now),
+            )
+        return self._count_dedup(cursor.rowcount == 0)
+
+    def are_duplicate_messages(self, message_ids: list[str]) -> list[bool]:
+        now = _time.time()
+        expires_at = now + self.config["dedup_window_seconds"]
+        results = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for message_id in message_ids:
+                    cursor = self._conn.execute(
+                        """
+                        INSERT INTO seen_message (message_id, expires_at) VALUES (?, ?)
+                        ON CONFLICT(message_id) DO UPDATE SET expires_at = excluded.expires_at
+                        WHERE seen_message.expires_at <= ?
+                        """,
+                        (message_id, expires_at, now),
+                    )
+                    results.append(cursor.rowcount == 0)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [self._count_dedup(duplicate) for duplicate in results]
+
+    def check_rate_limit(self, phone: str) -> str | None:
+        now = _time.time()
+        capacity = self.config["max_messages_per_minute"]
+        cooldown = self.config["cooldown_seconds"]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated_at, last_accepted_at FROM rate_bucket WHERE phone = ?",
+                    (phone,),
+                ).fetchone()
+                if row is None:
+                    tokens, last_accepted_at = float(capacity), None
+                else:
+                    tokens, updated_at, last_accepted_at = row
+                    elapsed = max(0.0, now - updated_at)
+                    tokens = min(float(capacity), tokens + elapsed * capacity / 60.0)
+
+                if tokens < 1.0:
+                    reason = RATE_LIMITED
+                elif last_accepted_at is not None and (now - last_accepted_at) < cooldown:
+                    reason = COOLDOWN
+                else:
+                    reason = None
+                    tokens -= 1.0
+                    last_accepted_at = now
+
+                self._conn.execute(
+                    """
+                    INSERT INTO rate_bucket (phone, tokens, updated_at, last_accepted_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(phone) DO UPDATE SET
+                        tokens = excluded.tokens,
+                        updated_at = excluded.updated_at,
+                        last_accepted_at = excluded.last_accepted_at
+                    """,
+                    (phone, tokens, now, last_accepted_at),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._count_throttle(reason)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state_value WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, _time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl_seconds: float | None = None):
+        expires_at = _time.time() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO state_value (key, value, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+                """,
+                (key, value, expires_at),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM state_value WHERE key = ?", (key,))
+
+    def evict_expired(self) -> int:
+        now = _time.time()
+        idle_before = now - max(60.0, float(self.config["cooldown_seconds"]))
+        removed = 0
+        with self._lock:
+            removed += self._conn.execute("DELETE FROM seen_message WHERE expires_at <= ?", (now,)).rowcount
+            removed += self._conn.execute(
+                """
+                DELETE FROM seen_message WHERE message_id IN (
+                    SELECT message_id FROM seen_message ORDER BY expires_at
+                    LIMIT max(0, (SELECT count(*) FROM seen_message) - ?)
+                )
+                """,
+                (self.config["dedup_max_entries"],),
+            ).rowcount
+            removed += self._conn.execute("DELETE FROM rate_bucket WHERE updated_at <= ?", (idle_before,)).rowcount
+            removed += self._conn.execute(
+                "DELETE FROM state_value WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).rowcount
+        return removed
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._conn.execute("DELETE FROM seen_message")
+            self._conn.execute("DELETE FROM rate_bucket")
+            self._conn.execute("DELETE FROM state_value")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats["dedup"]["tracked"] = self._conn.execute("SELECT count(*) FROM seen_message").fetchone()[0]
+            stats["rate_limit"]["tracked_phones"] = self._conn.execute("SELECT count(*) FROM rate_bucket").fetchone()[0]
+            stats["keys"] = self._conn.execute("SELECT count(*) FROM state_value").fetchone()[0]
+        return stats
+
+
+_REDIS_RATE_LIMIT_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local cooldown = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at', 'last_accepted_at')
+local tokens = tonumber(bucket[1])
+local last_accepted_at = tonumber(bucket[3])
+if tokens == nil then
+    tokens = capacity
+else
+    local elapsed = math.max(0, now - tonumber(bucket[2]))
+    tokens = math.min(capacity, tokens + elapsed * capacity / 60.0)
+end
+local reason = ''
+if tokens < 1 then
+    reason = 'rate_limited'
+elseif last_accepted_at ~= nil and (now - last_accepted_at) < cooldown then
+    reason = 'cooldown'
+else
+    tokens = tokens - 1
+    last_accepted_at = now
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+if last_accepted_at ~= nil then
+    redis.call('HSET', KEYS[1], 'last_accepted_at', last_accepted_at)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return reason
+"""
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Backend for any server speaking the Redis protocol (Redis, Valkey, KeyDB...).
+    Requires the optional `redis` package unless a client (decoding responses) is
+    passed in. Keys expire server-side, so no sweep is needed.
+    """
+
+    name = "redis"
+
+    def __init__(self, config: Mapping, url: str | None = None, prefix: str = "postclinics:", client=None):
+        super().__init__(config)
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("STATE_BACKEND=redis requires the 'redis' package (pip install redis).") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._client = client
+        self._rate_limit_script = self._client.register_script(_REDIS_RATE_LIMIT_SCRIPT)
+
+    def is_duplicate_message(self, message_id: str) -> bool:
+        claimed = self._client.set(
+            f"{self.prefix}msg:{message_id}", "1", nx=True, ex=int(self.config["dedup_window_seconds"])
+        )
+        return self._count_dedup(not claimed)
+
+    def are_duplicate_messages(self, message_ids: list[str]) -> list[bool]:
+        ttl = int(self.config["dedup_window_seconds"])
+        pipeline = self._client.pipeline(transaction=False)
+        for message_id in message_ids:
+            pipeline.set(f"{self.prefix}msg:{message_id}", "1", nx=True, ex=ttl)
+        return [self._count_dedup(not claimed) for claimed in pipeline.execute()]
+
+    def check_rate_limit(self, phone: str) -> str | None:
+        ttl = int(max(60.0, float(self.config["cooldown_seconds"])))
+        reason = self._rate_limit_script(
+            keys=[f"{self.prefix}rate:{phone}"],
+            args=[self.config["max_messages_per_minute"], self.config["cooldown_seconds"], _time.time(), ttl],
+        )
+        return self._count_throttle(reason or None)
+
+    def get(self, key: str) -> str | None:
+        return self._client.get(f"{self.prefix}kv:{key}")
+
+    def set(self, key: str, value: str, ttl_seconds: float | None = None):
+        if ttl_seconds is not None and ttl_seconds <= 0:
+            # Already expired, as in the other backends.
+            self._client.delete(f"{self.prefix}kv:{key}")
+            return
+        px = int(ttl_seconds * 1000) if ttl_seconds is not None else None
+        self._client.set(f"{self.prefix}kv:{key}", value, px=px)
+
+    def delete(self, key: str):
+        self._client.delete(f"{self.prefix}kv:{key}")
+
+    def clear(self):
+        super().clear()
+        for key in self._client.scan_iter(match=f"{self.prefix}*"):
+            self._client.delete(key)
+
+    def close(self):
+        self._client.close()
+
+
+def create_state_backend(kind: str = STATE_BACKEND, config: Mapping = ANTISPAM_CONFIG) -> StateBackend:
+    kind = (kind or "memory").strip().lower()
+    if kind == "memory":
+        return InMemoryStateBackend(config)
+    if kind == "sqlite":
+        path = STATE_BACKEND_URL or os.path.join(DATA_DIR, "runtime_state.db")
+        return SQLiteStateBackend(config, path)
+    if kind == "redis":
+        return RedisStateBackend(config, STATE_BACKEND_URL or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown STATE_BACKEND '{kind}'. Use memory, sqlite or redis.")
+
+
+state_backend = create_state_backend()
@@ -0,0 +1,144 @@
+import json
+
+try:
+    import msgspec
+except ImportError:  # optional: falls back to json.loads
+    msgspec = None
+
+TEXT_KEY = b'"text"'
+
+
+class InboundMessage:
+    """The few fields of a Z-API `ReceivedCallback` that the webhook acts on."""
+
+    __slots__ = ("phone", "message_id", "text", "from_me", "is_group", "is_newsletter")
+
+    def __init__(
+        self,
+        phone: str | None,
+        message_id: str,
+        text: str,
+        from_me: bool = False,
+        is_group: bool = False,
+        is_newsletter: bool = False,
+    ):
+        self.phone = phone
+        self.message_id = message_id
+        self.text = text
+        self.from_me = from_me
+        self.is_group = is_group
+        self.is_newsletter = is_newsletter
+
+    @property
+    def filtered_source(self) -> bool:
+        return self.from_me or self.is_group or self.is_newsletter
+
+
+def has_text(raw_body: bytes) -> bool:
+    """
+    Status, read-receipt and presence callbacks carry no `text` key and can skip decoding.
+    A nested `text` key only costs a decode; own, group and newsletter messages are told
+    apart by their decoded top-level flags, since quoted or reacted-to messages nest
+    their own `fromMe`.
+    """
+    return TEXT_KEY in raw_body
+
+
+def message_from_payload(payload: dict) -> InboundMessage:
+    text_data = payload.get("text")
+    if isinstance(text_data, dict):
+        text = text_data.get("message", "") or ""
+    elif isinstance(text_data, str):
+        text = text_data
+    else:
+        text = ""
+    phone = payload.get("phone")
+    return InboundMessage(
+        phone=str(phone) if phone else None,
+        message_id=payload.get("messageId", "unknown"),
+        text=text,
+        from_me=bool(payload.get("fromMe", False)),
+        is_group=bool(payload.get("isGroup", False)),
+        is_newsletter=bool(payload.get("isNewsletter", False)),
+    )
+
+
+def _load_json(raw_body: bytes):
+    try:
+        return json.loads(raw_body.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid JSON payload") from e
+
+
+def _decode_json(raw_body: bytes) -> InboundMessage:
+    payload = _load_json(raw_body)
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid JSON payload")
+    return message_from_payload(payload)
+
+
+def _decode_batch_json(raw_body: bytes) -> list[InboundMessage]:
+    payload = _load_json(raw_body)
+    if isinstance(payload, dict):
+        payload = payload.get("messages")
+    if not isinstance(payload, list):
+        raise ValueError("Batch payload must be a JSON array or an object with a 'messages' array")
+    return [message_from_payload(item) if isinstance(item, dict) else InboundMessage(None, "unknown", "") for item in payload]
+
+
+if msgspec is not None:
+
+    class _ZapiText(msgspec.Struct):
+        message: str = ""
+
+    class _ZapiPayload(msgspec.Struct):
+        phone: str | int | None = None
+        messageId: str = "unknown"
+        text: _ZapiText | str | None = None
+        fromMe: bool = False
+        isGroup: bool = False
+        isNewsletter: bool = False
+
+    _decoder = msgspec.json.Decoder(_ZapiPayload)
+    _batch_decoder = msgspec.json.Decoder(list[_ZapiPayload])
+
+    def _from_struct(payload: _ZapiPayload) -> InboundMessage:
+        text = payload.text
+        if isinstance(text, _ZapiText):
+            text = text.message
+        return InboundMessage(
+            phone=str(payload.phone) if payload.phone else None,
+            message_id=payload.messageId,
+            text=text or "",
+            from_me=payload.fromMe,
+            is_group=payload.isGroup,
+            is_newsletter=payload.isNewsletter,
+        )
+
+    def decode_message(raw_body: bytes) -> InboundMessage:
+        """Decodes a webhook body. Raises ValueError when it is not a JSON object."""
+        try:
+            payload = _decoder.decode(raw_body)
+        except msgspec.ValidationError:
+            # Valid JSON with an unexpected shape (e.g. null messageId): take the lenient path.
+            return _decode_json(raw_body)
+        except msgspec.DecodeError as e:
+            raise ValueError("Invalid JSON payload") from e
+        return _from_struct(payload)
+
+    def decode_batch(raw_body: bytes) -> list[InboundMessage]:
+        """Decodes a JSON array of callbacks (or `{"messages": [...]}`). Raises ValueError otherwise."""
+        try:
+            return [_from_struct(payload) for payload in _batch_decoder.decode(raw_body)]
+        except (msgspec.ValidationError, msgspec.DecodeError):
+            return _decode_batch_json(raw_body)
+
+else:
+
+    def decode_message(raw_body: bytes) -> InboundMessage:
+        """Decodes a webhook body. Raises ValueError when it is not a JSON object."""
+        return _decode_json(raw_body)
+
+    def decode_batch(raw_body: bytes) -> list[InboundMessage]:
+        """Decodes a JSON array of callbacks (or `{"messages": [...]}`). Raises ValueError otherwise."""
+        return _decode_batch_json(raw_body)
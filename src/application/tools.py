@@ -11,6 +11,7 @@ from src.application.services.patient_identity import (
 from src.application.services.service_catalog import canonicalize_service_name
 from src.application.services.appointment_status import normalize_status
 from src.infrastructure.vector_store import search_store
+from src.infrastructure.executor import run_blocking
 from src.application.services import appointment_manager
 
 BR_TZ = ZoneInfo("America/Sao_Paulo")
@@ -243,15 +244,28 @@ def _find_patient_appointments(phone: str) -> str:
         return "\n".join(lines)
 
 
+def _search_knowledge_base(query: str) -> str:
+    results = search_store(query, k=2)
+    if not results:
+        query_lower = query.lower()
+        if "valor" in query_lower or "preç" in query_lower or "preco" in query_lower:
+             return "(SYSTEM: Nenhuma informação de preço encontrada na base. Use a ferramenta request_human_attendant IMEDIATAMENTE.)"
+        return "Nenhuma informação relevante encontrada na base de conhecimento. Se a dúvida persistir, encaminhe para um atendente utilizando request_human_attendant."
+    
+    docs = [f"Referência {i+1}: {res.page_content.strip()}" for i, res in enumerate(results)]
+    return "\n\n".join(docs)
+
 # --- Decorated Tools Implementation (Using Core Logic) ---
+# Async facades: the blocking core functions run on the shared thread pool so a slow
+# query or embedding never stalls the event loop.
 
 @function_tool
-def check_availability(date_str: str, service_name: str = "Clínica Geral") -> str:
+async def check_availability(date_str: str, service_name: str = "Clínica Geral") -> str:
     """Check available appointment slots for a given date."""
-    return _check_availability(date_str, service_name)
+    return await run_blocking(_check_availability, date_str, service_name)
 
 @function_tool
-def schedule_appointment(
+async def schedule_appointment(
     name: str,
     phone: str,
     datetime_str: str,
@@ -259,45 +273,37 @@ def schedule_appointment(
     responsible_name: str | None = None,
 ) -> str:
     """Schedule a new appointment for a patient."""
-    return _schedule_appointment(name, phone, datetime_str, service_name, responsible_name)
+    return await run_blocking(_schedule_appointment, name, phone, datetime_str, service_name, responsible_name)
 
 @function_tool
-def confirm_appointment(appointment_id: int) -> str:
+async def confirm_appointment(appointment_id: int) -> str:
     """Confirm an existing appointment."""
-    return _confirm_appointment(appointment_id)
+    return await run_blocking(_confirm_appointment, appointment_id)
 
 @function_tool
-def cancel_appointment(appointment_id: int) -> str:
+async def cancel_appointment(appointment_id: int) -> str:
     """Cancel an existing appointment."""
-    return _cancel_appointment(appointment_id)
+    return await run_blocking(_cancel_appointment, appointment_id)
 
 @function_tool
-def reschedule_appointment(appointment_id: int, new_datetime_str: str) -> str:
+async def reschedule_appointment(appointment_id: int, new_datetime_str: str) -> str:
     """Reschedule an appointment to a new date/time."""
-    return _reschedule_appointment(appointment_id, new_datetime_str)
+    return await run_blocking(_reschedule_appointment, appointment_id, new_datetime_str)
 
 @function_tool
-def get_available_services(query: str = "") -> str:
+async def get_available_services(query: str = "") -> str:
     """Get list of available services. Pass empty string for query."""
-    return _get_available_services()
+    return await run_blocking(_get_available_services)
 
 @function_tool
-def find_patient_appointments(phone: str) -> str:
+async def find_patient_appointments(phone: str) -> str:
     """Find all active appointments for a patient by their phone number. Use this to look up appointment IDs before confirming, cancelling, or rescheduling."""
-    return _find_patient_appointments(phone)
+    return await run_blocking(_find_patient_appointments, phone)
 
 @function_tool
-def search_knowledge_base(query: str) -> str:
+async def search_knowledge_base(query: str) -> str:
     """Search the clinic's knowledge base and FAQs for complex questions about rules, specific procedures, ou preços/valores. Use this IF and ONLY IF the answer is not already in your system prompt."""
-    results = search_store(query, k=2)
-    if not results:
-        query_lower = query.lower()
-        if "valor" in query_lower or "preç" in query_lower or "preco" in query_lower:
-             return "(SYSTEM: Nenhuma informação de preço encontrada na base. Use a ferramenta request_human_attendant IMEDIATAMENTE.)"
-        return "Nenhuma informação relevante encontrada na base de conhecimento. Se a dúvida persistir, encaminhe para um atendente utilizando request_human_attendant."
-    
-    docs = [f"Referência {i+1}: {res.page_content.strip()}" for i, res in enumerate(results)]
-    return "\n\n".join(docs)
+    return await run_blocking(_search_knowledge_base, query)
 
 @function_tool
 def request_human_attendant(reason: str = "") -> str:
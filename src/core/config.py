@@ -19,6 +19,15 @@ def _env_int(name: str, default: int) -> int:
     except ValueError:
         return default
 
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
 _default_cors = "http://localhost:3000,http://127.0.0.1:3000"
 CORS_ALLOWED_ORIGINS = [
     origin.strip()
@@ -33,6 +42,11 @@ ACCESS_TOKEN_EXPIRE_MINUTES = _env_int("ACCESS_TOKEN_EXPIRE_MINUTES", 60)
 WEBHOOK_VALIDATE_SIGNATURE = _env_bool("WEBHOOK_VALIDATE_SIGNATURE", True)
 WEBHOOK_SIGNATURE_HEADER = os.environ.get("WEBHOOK_SIGNATURE_HEADER", "X-Webhook-Signature")
 WEBHOOK_SIGNATURE_SECRET = os.environ.get("WEBHOOK_SIGNATURE_SECRET")
+# Serve POST /webhook/zapi from a raw ASGI handler ahead of the FastAPI router.
+WEBHOOK_FAST_LANE = _env_bool("WEBHOOK_FAST_LANE", False)
+WEBHOOK_BATCH_MAX_MESSAGES = _env_int("WEBHOOK_BATCH_MAX_MESSAGES", 1000)
+# Larger /webhook/zapi/batch bodies are refused with 413 before they are decoded.
+WEBHOOK_BATCH_MAX_BYTES = _env_int("WEBHOOK_BATCH_MAX_BYTES", 4 * 1024 * 1024)
 
 CLINIC_CONFIG = {
     "name": "Espaço Interativo Reabilitare",
@@ -76,11 +90,157 @@ CLINIC_CONFIG = {
 Z_API_CONFIG = {
     "instance_id": os.environ.get("Z_API_INSTANCE_ID"),
     "token": os.environ.get("Z_API_TOKEN"),
-    "client_token": os.environ.get("Z_API_CLIENT_TOKEN")
+    "client_token": os.environ.get("Z_API_CLIENT_TOKEN"),
+    "base_url": os.environ.get("Z_API_BASE_URL", "https://api.z-api.io").rstrip("/"),
+}
+
+# Z-API circuit breaker: `failure_threshold` consecutive 5xx/timeouts open it, sends fail
+# fast (queued messages wait) for `reset_timeout_seconds`, then `half_open_max_calls`
+# probe sends decide whether it closes again.
+Z_API_CIRCUIT_CONFIG = {
+    "failure_threshold": _env_int("ZAPI_CIRCUIT_FAILURE_THRESHOLD", 5),
+    "reset_timeout_seconds": _env_float("ZAPI_CIRCUIT_RESET_SECONDS", 30),
+    "half_open_max_calls": _env_int("ZAPI_CIRCUIT_HALF_OPEN_CALLS", 1),
 }
 
+# One pooled keep-alive client per process for Z-API calls (HTTP/2 when the 'h2'
+# package is installed), opened in the app lifespan and the scheduler loop.
+Z_API_HTTP_CONFIG = {
+    "http2": _env_bool("ZAPI_HTTP2", True),
+    "max_connections": _env_int("ZAPI_MAX_CONNECTIONS", 20),
+    "max_keepalive_connections": _env_int("ZAPI_MAX_KEEPALIVE_CONNECTIONS", 10),
+    "keepalive_expiry_seconds": _env_float("ZAPI_KEEPALIVE_EXPIRY_SECONDS", 30),
+    "timeout_seconds": _env_float("ZAPI_TIMEOUT_SECONDS", 12),
+}
+
+# Where dedup, rate-limit, handoff and session state live: "memory" (single worker),
+# "sqlite" (shared file, STATE_BACKEND_URL is the path) or "redis" (STATE_BACKEND_URL is the redis:// URL).
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_BACKEND_URL = os.environ.get("STATE_BACKEND_URL")
+
 ANTISPAM_CONFIG = {
     "max_messages_per_minute": 10,
     "cooldown_seconds": 2,
     "dedup_window_seconds": 300,
+    "dedup_max_entries": 50000,
+    "state_sweep_seconds": 60,
+}
+
+# Consecutive messages from one phone are merged into a single agent run when they
+# arrive less than `window_seconds` apart. A window of 0 disables coalescing.
+# Applied by the inbound job queue when it leases a phone's pending messages.
+COALESCE_CONFIG = {
+    "window_seconds": _env_float("COALESCE_WINDOW_SECONDS", 1.5),
+    "max_wait_seconds": _env_float("COALESCE_MAX_WAIT_SECONDS", 6.0),
+    "max_messages": _env_int("COALESCE_MAX_MESSAGES", 10),
+}
+
+INBOUND_QUEUE_CONFIG = {
+    "path": os.environ.get("INBOUND_QUEUE_PATH") or os.path.join(DATA_DIR, "inbound_queue.db"),
+    "workers": _env_int("INBOUND_QUEUE_WORKERS", 16),
+    "lease_seconds": _env_float("INBOUND_QUEUE_LEASE_SECONDS", 300),
+    "max_attempts": _env_int("INBOUND_QUEUE_MAX_ATTEMPTS", 3),
+    "retry_base_seconds": _env_float("INBOUND_QUEUE_RETRY_BASE_SECONDS", 5),
+    "poll_interval_seconds": _env_float("INBOUND_QUEUE_POLL_SECONDS", 0.25),
+}
+
+# Durable outbound WhatsApp messages, sent by `workers` async senders in the app and
+# the scheduler. Sends from every process share one token bucket (`rate_per_second`,
+# up to `burst`) kept in the queue file. Failed sends back off with jitter from
+# `retry_base_seconds` up to `retry_max_seconds`; after `max_attempts` (or a 4xx) the
+# message is dead-lettered and its NotificationLog marked failed. Idempotency keys of
+# sent messages are remembered for `key_retention_seconds` to suppress resends.
+OUTBOUND_QUEUE_CONFIG = {
+    "path": os.environ.get("OUTBOUND_QUEUE_PATH") or os.path.join(DATA_DIR, "outbound_queue.db"),
+    "workers": _env_int("OUTBOUND_QUEUE_WORKERS", 4),
+    "rate_per_second": _env_float("ZAPI_SEND_RATE_PER_SECOND", 5),
+    "burst": _env_int("ZAPI_SEND_BURST", 10),
+    "lease_seconds": _env_float("OUTBOUND_QUEUE_LEASE_SECONDS", 60),
+    "max_attempts": _env_int("OUTBOUND_QUEUE_MAX_ATTEMPTS", 6),
+    "retry_base_seconds": _env_float("OUTBOUND_QUEUE_RETRY_BASE_SECONDS", 2),
+    "retry_max_seconds": _env_float("OUTBOUND_QUEUE_RETRY_MAX_SECONDS", 300),
+    "poll_interval_seconds": _env_float("OUTBOUND_QUEUE_POLL_SECONDS", 0.5),
+    "key_retention_seconds": _env_float("OUTBOUND_KEY_RETENTION_SECONDS", 7 * 24 * 3600),
+}
+
+# Per-phone locks and counters in the message handler. Idle phones are released after
+# `idle_seconds`; `snapshot_path` (empty to disable) keeps them, and the in-memory state
+# backend's handoff/session keys, across restarts.
+CONVERSATION_STATE_CONFIG = {
+    "idle_seconds": _env_float("CONVERSATION_IDLE_SECONDS", 3600),
+    "max_entries": _env_int("CONVERSATION_MAX_ENTRIES", 20000),
+    "sweep_seconds": _env_float("CONVERSATION_SWEEP_SECONDS", 60),
+    "snapshot_path": os.environ.get("CONVERSATION_SNAPSHOT_PATH", os.path.join(DATA_DIR, "conversation_state.db")),
+}
+
+# Embedding model for the knowledge base and patient profiles. Loaded on first use (or by
+# the startup warmup). "onnx" runs an int8 ONNX export of the same model, created with
+# scripts/export_onnx_embeddings.py into `onnx_dir`; its vectors stay compatible with
+# collections built by the "huggingface" backend.
+EMBEDDING_CONFIG = {
+    "backend": os.environ.get("EMBEDDING_BACKEND", "huggingface").strip().lower(),
+    "model_name": os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+    "onnx_dir": os.environ.get("EMBEDDING_ONNX_DIR") or os.path.join(DATA_DIR, "models", "all-MiniLM-L6-v2-onnx"),
+    "warmup": _env_bool("EMBEDDING_WARMUP", True),
+}
+
+# Query embeddings keyed by a hash of the normalized text: an in-memory LRU over a
+# SQLite file (empty EMBEDDING_CACHE_PATH keeps it in memory only) holding at most
+# `max_rows` vectors, least recently used dropped first. Invalidated on model change.
+EMBEDDING_CACHE_CONFIG = {
+    "path": os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "embedding_cache.db")),
+    "memory_entries": _env_int("EMBEDDING_CACHE_MEMORY_ENTRIES", 2048),
+    "max_rows": _env_int("EMBEDDING_CACHE_MAX_ROWS", 50000),
+}
+
+# Knowledge-base search. "bm25" ranks with an in-memory BM25 index over the chunks,
+# "dense" with embedding similarity in Chroma, "hybrid" answers from BM25 when its top
+# hit scores at least `min_score` and `min_margin` times the runner-up, and otherwise
+# fuses both rankings (reciprocal rank fusion, `rrf_k`). The index is rebuilt every
+# `refresh_seconds` to pick up chunks ingested by another process.
+RETRIEVAL_CONFIG = {
+    "mode": os.environ.get("RETRIEVAL_MODE", "hybrid").strip().lower(),
+    "k1": _env_float("RETRIEVAL_BM25_K1", 1.5),
+    "b": _env_float("RETRIEVAL_BM25_B", 0.75),
+    "min_score": _env_float("RETRIEVAL_BM25_MIN_SCORE", 3.0),
+    "min_margin": _env_float("RETRIEVAL_BM25_MIN_MARGIN", 1.2),
+    "rrf_k": _env_int("RETRIEVAL_RRF_K", 60),
+    "refresh_seconds": _env_float("RETRIEVAL_INDEX_REFRESH_SECONDS", 300),
+}
+
+# Knowledge-base context injected into the agent's instructions, searched once per
+# message (recognized intents and bare date/time replies skip it). Off by default: the
+# agent looks things up itself through the search_knowledge_base tool.
+RAG_INJECTION_ENABLED = _env_bool("RAG_INJECTION_ENABLED", False)
+
+# Chunks embedded per call when scripts/ingest_knowledge.py adds new or edited chunks.
+INGEST_BATCH_SIZE = _env_int("INGEST_BATCH_SIZE", 64)
+
+# Long-term patient preferences (written by the learning loop), keyed by phone. A new
+# preference whose words overlap a stored one by `duplicate_threshold` (Jaccard) is
+# dropped; only the newest `max_per_phone` are kept.
+PREFERENCE_STORE_CONFIG = {
+    "path": os.environ.get("PREFERENCE_DB_PATH", os.path.join(DATA_DIR, "patient_preferences.db")),
+    "max_per_phone": _env_int("PREFERENCES_MAX_PER_PHONE", 10),
+    "duplicate_threshold": _env_float("PREFERENCES_DUPLICATE_THRESHOLD", 0.8),
+}
+
+# Per-phone cache of the long-term memory profile injected into each agent run.
+# Entries are dropped when a preference is added in this process; preferences written
+# by another process (the learning loop script) show up once `ttl_seconds` expires.
+PROFILE_CACHE_CONFIG = {
+    "ttl_seconds": _env_float("PROFILE_CACHE_TTL_SECONDS", 900),
+    "max_entries": _env_int("PROFILE_CACHE_MAX_ENTRIES", 5000),
+}
+
+# Threads for blocking DB, Chroma and embedding calls made from async code.
+BLOCKING_POOL_WORKERS = _env_int("BLOCKING_POOL_WORKERS", 8)
+
+# Caps concurrent LLM calls across all conversations. Extra calls wait in a fair
+# per-phone queue; beyond `max_waiting` (or after `wait_timeout_seconds`) they are
+# shed and the patient gets RATE_LIMIT_REPLY right away.
+AGENT_ADMISSION_CONFIG = {
+    "max_concurrency": _env_int("AGENT_MAX_CONCURRENCY", 4),
+    "max_waiting": _env_int("AGENT_MAX_WAITING", 8),
+    "wait_timeout_seconds": _env_float("AGENT_ADMISSION_TIMEOUT_SECONDS", 30),
 }
@@ -35,7 +35,7 @@ class NotificationLog(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     appointment_id: int = Field(foreign_key="appointment.id")
     notification_type: str  # "24h", "3h"
-    status: str  # "sent", "failed"
+    status: str  # "queued", "retrying", "in_doubt", "sent", "failed"
     error_message: Optional[str] = None
     attempt_count: int = Field(default=1)
     sent_at: datetime = Field(default_factory=datetime.now)
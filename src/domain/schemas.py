@@ -22,3 +22,7 @@ class AppointmentUpdate(SQLModel):
     service: str | None = None
     professional: str | None = None
     status: str | None = None
+
+class OutboundReconcile(BaseModel):
+    idempotency_key: str
+    delivered: bool
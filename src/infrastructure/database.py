@@ -1,4 +1,6 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from src.core.config import DATA_DIR
 import os
 import sqlite3
@@ -12,6 +14,18 @@ DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{DATABASE_FILE}")
 
 engine = create_engine(DATABASE_URL, echo=False)
 
+
+def _async_database_url(url: str) -> str:
+    """Same SQLite database through aiosqlite."""
+    scheme, sep, rest = url.partition("://")
+    return f"{'sqlite+aiosqlite' if scheme == 'sqlite' else scheme}{sep}{rest}"
+
+
+# Used by async request handlers so dashboard queries don't block the event loop.
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 def _get_columns(cursor, table_name: str) -> list[str]:
     cursor.execute(f"PRAGMA table_info({table_name})")
     return [row[1] for row in cursor.fetchall()]
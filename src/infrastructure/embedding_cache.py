@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time as _time
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("PostClinics.EmbeddingCache")
+
+
+def normalize_query(text: str) -> str:
+    # The model is uncased and its tokenizer ignores runs of whitespace, so these
+    # variants embed identically.
+    return " ".join((text or "").split()).lower()
+
+
+def _key_hash(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Query vectors keyed by a SHA-256 of the normalized text (patient messages are not
+    stored): an in-memory LRU in front of a SQLite file. Rows belong to one
+    `model_version`; rows from any other version are deleted when the file is opened, so
+    a model change invalidates the cache. The file keeps the `max_rows` most recently
+    used vectors. An empty `path` keeps the cache in memory only. Thread-safe.
+    """
+
+    # Puts between two max_rows prunes.
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str | None, memory_entries: int, model_version: str, max_rows: int = 50000):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.model_version = model_version
+        self.max_rows = max_rows
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.pruned = 0
+        self._puts = 0
+
+    def _connection(self) -> sqlite3.Connection | None:
+        if self._conn is None and self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(query_embedding)")}
+            if "text_key" in columns:
+                # Files written before keys were hashed hold the raw query text.
+                conn.execute("DROP TABLE query_embedding")
+                logger.info("[EMBED_CACHE] Dropped the text-keyed cache table")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_embedding (
+                    key_hash TEXT PRIMARY KEY,
+                    model_version TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    used_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_query_embedding_used ON query_embedding (used_at)")
+            dropped = conn.execute(
+                "DELETE FROM query_embedding WHERE model_version != ?", (self.model_version,)
+            ).rowcount
+            if dropped:
+                logger.info("[EMBED_CACHE] Dropped %s vector(s) from a previous model", dropped)
+            self._conn = conn
+            self._prune(conn)
+        return self._conn
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        removed = conn.execute(
+            "DELETE FROM query_embedding WHERE key_hash IN ("
+            "SELECT key_hash FROM query_embedding ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        ).rowcount
+        self.pruned += removed
+        return removed
+
+    def prune(self) -> int:
+        """Drops the least recently used vectors beyond `max_rows`; returns how many."""
+        with self._lock:
+            conn = self._connection()
+            return self._prune(conn) if conn is not None else 0
+
+    def memory_size(self) -> int:
+        with self._lock:
+            return len(self._memory)
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> list[float] | None:
+        key = _key_hash(key)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT vector FROM query_embedding WHERE key_hash = ? AND model_version = ?",
+                (key, self.model_version),
+            ).fetchone() if conn is not None else None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE query_embedding SET used_at = ? WHERE key_hash = ?", (_time.time(), key))
+            vector = array("f", row[0]).tolist()
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+
+    def put(self, key: str, vector: list[float]):
+        key = _key_hash(key)
+        with self._lock:
+            self._remember(key, vector)
+            conn = self._connection()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embedding (key_hash, model_version, vector, used_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, self.model_version, array("f", vector).tobytes(), _time.time()),
+                )
+                self._puts += 1
+                if self._puts % self.PRUNE_EVERY == 0:
+                    self._prune(conn)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM query_embedding")
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedEmbeddings(Embeddings):
+    """Serves `embed_query` from an EmbeddingCache; documents (ingestion) go straight to the model."""
+
+    def __init__(self, model: Embeddings, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+        self.embed_seconds = 0.0
+
+    def embed_query(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            started = _time.perf_counter()
+            vector = self.model.embed_query(text)
+            self.embed_seconds += _time.perf_counter() - started
+            self.cache.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.embed_documents(texts)
+
+    def stats(self) -> dict:
+        cache = self.cache
+        hits = cache.memory_hits + cache.disk_hits
+        lookups = hits + cache.misses
+        avg_embed = self.embed_seconds / cache.misses if cache.misses else 0.0
+        return {
+            "model_version": cache.model_version,
+            "memory_entries": cache.memory_size(),
+            "memory_hits": cache.memory_hits,
+            "disk_hits": cache.disk_hits,
+            "misses": cache.misses,
+            "pruned": cache.pruned,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "embed_seconds_saved": round(hits * avg_embed, 3),
+        }
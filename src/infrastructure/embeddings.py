@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+import time as _time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("PostClinics.Embeddings")
+
+ONNX_MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers limit
+
+
+def find_onnx_model(model_dir: str) -> str | None:
+    for name in ONNX_MODEL_FILES:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    The sentence-transformers model exported to ONNX and run with onnxruntime. Mean pooling
+    over the attention mask followed by L2 normalization, as in the sentence-transformers
+    pipeline, so vectors match the HuggingFace backend's (cosine ~0.99 for the int8 export).
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = find_onnx_model(model_dir)
+        if model_path is None:
+            raise FileNotFoundError(
+                f"No ONNX model in {model_dir}; run scripts/export_onnx_embeddings.py first"
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self._tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        import numpy as np
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + self.batch_size])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self._session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+            mask = feeds["attention_mask"][..., None].astype(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text])[0]
+
+
+def create_embeddings(config: dict) -> Embeddings:
+    if config["backend"] == "onnx":
+        return OnnxEmbeddings(config["onnx_dir"])
+    # Imported here: pulls in sentence-transformers and torch.
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=config["model_name"])
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Builds the configured backend on first use, so importing the vector store (and
+    everything that imports it) does not load torch or the model. `warmup` loads it
+    ahead of the first request.
+    """
+
+    def __init__(self, config: dict, factory=create_embeddings):
+        self.config = config
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._backend: Embeddings | None = None
+        self.load_seconds: float | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._backend is not None
+
+    @property
+    def model_version(self) -> str:
+        """Identifies the vectors this backend produces, without loading it."""
+        version = f"{self.config['backend']}:{self.config['model_name']}"
+        if self.config["backend"] == "onnx":
+            model_path = find_onnx_model(self.config["onnx_dir"])
+            if model_path is not None:
+                stat = os.stat(model_path)
+                version += f":{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+        return version
+
+    def _get(self) -> Embeddings:
+        backend = self._backend
+        if backend is None:
+            with self._lock:
+                if self._backend is None:
+                    started = _time.perf_counter()
+                    self._backend = self._factory(self.config)
+                    self.load_seconds = _time.perf_counter() - started
+                    logger.info(
+                        "[EMBEDDINGS] Loaded %s backend in %.2fs", self.config["backend"], self.load_seconds
+                    )
+                backend = self._backend
+        return backend
+
+    def warmup(self):
+        self._get().embed_query("warmup")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._get().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._get().embed_query(text)
@@ -0,0 +1,47 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.config import BLOCKING_POOL_WORKERS
+
+logger = logging.getLogger("PostClinics.Executor")
+
+_executor: ThreadPoolExecutor | None = None
+_in_flight = 0
+_completed = 0
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_WORKERS, thread_name_prefix="postclinics-blocking")
+    return _executor
+
+
+async def run_blocking(func, /, *args, **kwargs):
+    """
+    Runs a synchronous DB, Chroma or embedding call on the bounded blocking pool so the
+    event loop keeps serving webhooks. Context variables are carried into the thread.
+    """
+    global _in_flight, _completed
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    _in_flight += 1
+    try:
+        return await loop.run_in_executor(get_executor(), call)
+    finally:
+        _in_flight -= 1
+        _completed += 1
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def stats() -> dict:
+    return {"max_workers": BLOCKING_POOL_WORKERS, "in_flight": _in_flight, "completed": _completed}
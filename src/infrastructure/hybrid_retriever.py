@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+import time as _time
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from src.infrastructure.text_tokens import tokenize
+
+logger = logging.getLogger("PostClinics.Retrieval")
+
+RETRIEVAL_MODES = ("bm25", "dense", "hybrid")
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents, with postings so a query only touches matching chunks."""
+
+    __slots__ = ("documents", "k1", "b", "_postings", "_idf")
+
+    def __init__(self, documents: list[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        term_counts = [Counter(tokenize(doc.page_content)) for doc in documents]
+        lengths = [sum(counts.values()) for counts in term_counts]
+        avg_len = (sum(lengths) / len(lengths)) if lengths else 0.0
+        postings: dict[str, list[tuple[int, float]]] = {}
+        for idx, counts in enumerate(term_counts):
+            # Length normalization is folded in here so scoring is a multiply-add per posting.
+            norm = k1 * (1 - b + b * lengths[idx] / avg_len) if avg_len else k1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((idx, tf * (k1 + 1) / (tf + norm)))
+        total = len(documents)
+        self._idf = {
+            term: math.log((total - len(hits) + 0.5) / (len(hits) + 0.5) + 1) for term, hits in postings.items()
+        }
+        self._postings = postings
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, k: int) -> list[tuple[float, Document]]:
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for idx, weight in self._postings[term]:
+                scores[idx] = scores.get(idx, 0.0) + idf * weight
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.documents[idx]) for idx, score in best]
+
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int, rrf_k: int = 60) -> list[Document]:
+    """Merges ranked lists by sum of 1 / (rrf_k + rank); chunks are matched by their text."""
+    scores: dict[str, float] = {}
+    by_text: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (rrf_k + rank + 1)
+            by_text.setdefault(doc.page_content, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [by_text[text] for text in ordered]
+
+
+class HybridRetriever:
+    """
+    Knowledge-base search for one collection. "bm25" ranks with an in-memory BM25 index,
+    "dense" with Chroma similarity search, and "hybrid" answers from BM25 when its top hit
+    is confident (score >= `min_score` and `min_margin` times the runner-up) and otherwise
+    fuses BM25 and dense rankings with reciprocal rank fusion.
+
+    The index is built from the collection's stored chunks (no embeddings needed) on first
+    use and rebuilt after `refresh_seconds` or `invalidate()`, so chunks ingested by another
+    process show up without a restart.
+    """
+
+    def __init__(self, get_store, mode: str = "hybrid", k1: float = 1.5, b: float = 0.75,
+                 min_score: float = 3.0, min_margin: float = 1.2, rrf_k: int = 60,
+                 refresh_seconds: float = 300):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown RETRIEVAL_MODE '{mode}'. Use {', '.join(RETRIEVAL_MODES)}.")
+        self._get_store = get_store
+        self.mode = mode
+        self.k1 = k1
+        self.b = b
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.rrf_k = rrf_k
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._index: BM25Index | None = None
+        self._built_at = 0.0
+        self.lexical_answers = 0
+        self.dense_searches = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def index(self) -> BM25Index:
+        index = self._index
+        if index is None or _time.monotonic() - self._built_at >= self.refresh_seconds:
+            with self._lock:
+                if self._index is index:
+                    data = self._get_store().get(include=["documents", "metadatas"])
+                    documents = [
+                        Document(page_content=text, metadata=metadata or {})
+                        for text, metadata in zip(data.get("documents") or [], data.get("metadatas") or [])
+                        if text
+                    ]
+                    self._index = BM25Index(documents, k1=self.k1, b=self.b)
+                    self._built_at = _time.monotonic()
+                    logger.debug("[RETRIEVAL] BM25 index built over %s chunks", len(documents))
+                index = self._index
+        return index
+
+    def _dense(self, query: str, k: int) -> list[Document]:
+        self.dense_searches += 1
+        return self._get_store().similarity_search(query, k=k)
+
+    def _confident(self, hits: list[tuple[float, Document]]) -> bool:
+        if not hits or hits[0][0] < self.min_score:
+            return False
+        return len(hits) < 2 or hits[0][0] >= self.min_margin * hits[1][0]
+
+    def search(self, query: str, k: int = 3) -> list[Document]:
+        if self.mode == "dense":
+            return self._dense(query, k)
+        hits = self.index().search(query, max(k, 2))
+        if self.mode == "bm25" or self._confident(hits):
+            self.lexical_answers += 1
+            return [doc for _, doc in hits[:k]]
+        dense = self._dense(query, k)
+        return reciprocal_rank_fusion([[doc for _, doc in hits], dense], k, self.rrf_k)
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "mode": self.mode,
+            "indexed_chunks": len(index) if index is not None else None,
+            "lexical_answers": self.lexical_answers,
+            "dense_searches": self.dense_searches,
+        }
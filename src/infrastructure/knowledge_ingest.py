@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+from src.infrastructure.vector_store import chroma_registry, get_retriever
+
+logger = logging.getLogger("PostClinics.Ingest")
+
+SOURCE_EXTENSIONS = (".md", ".txt")
+
+
+@dataclass
+class IngestResult:
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+def find_sources(paths: list[str]) -> list[str]:
+    """Expands directories (recursively) into their .md/.txt files; files are taken as given."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, files in os.walk(path):
+                sources.extend(os.path.join(root, name) for name in files if name.endswith(SOURCE_EXTENSIONS))
+        elif os.path.exists(path):
+            sources.append(path)
+        else:
+            raise FileNotFoundError(f"Knowledge source not found: {path}")
+    return sorted({os.path.abspath(source) for source in sources})
+
+
+def split_source(source: str, text: str, chunk_size: int = 500, chunk_overlap: int = 50) -> list[Document]:
+    # Imported here: the splitters package pulls in transformers, which an unchanged
+    # re-run never needs.
+    from langchain_text_splitters import MarkdownTextSplitter
+
+    splitter = MarkdownTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    # `source` matches the TextLoader-based ingestion, so its chunks get replaced.
+    metadata = {"source": source, "source_hash": _sha256(text)}
+    return splitter.split_documents([Document(page_content=text, metadata=metadata)])
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc: Document) -> str:
+    return _sha256(f"{doc.metadata.get('source', '')}\0{doc.page_content}")[:32]
+
+
+def _is_under(source: str | None, dirs: list[str]) -> bool:
+    if not source:
+        return False
+    source = os.path.abspath(source)
+    return any(source.startswith(os.path.join(os.path.abspath(d), "")) for d in dirs)
+
+
+def sync_sources(
+    sources: list[str],
+    collection_name: str = "clinic_knowledge",
+    batch_size: int = 64,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    prune_dirs: list[str] | None = None,
+) -> IngestResult:
+    """
+    Makes the chunks stored for `sources` match the files. Files whose hash matches the
+    stored chunks are skipped without splitting. For changed files, chunk IDs are content
+    hashes: kept chunks only get their metadata refreshed, new or edited ones are embedded
+    in batches of `batch_size`, and ones no longer in the file are deleted. Chunks of files
+    under `prune_dirs` that are not in `sources` (deleted or renamed) are deleted too;
+    chunks from other sources are left alone.
+    """
+    store = chroma_registry.store(collection_name)
+    existing = store.get(include=["metadatas"])
+    stored: dict[str, dict[str, dict]] = {}
+    for doc_id, metadata in zip(existing["ids"], existing["metadatas"]):
+        metadata = metadata or {}
+        stored.setdefault(metadata.get("source"), {})[doc_id] = metadata
+
+    result = IngestResult()
+    for source in sources:
+        with open(source, encoding="utf-8") as f:
+            text = f.read()
+        current = stored.get(source, {})
+        if current and {m.get("source_hash") for m in current.values()} == {_sha256(text)}:
+            result.unchanged += len(current)
+            continue
+
+        wanted: dict[str, Document] = {}
+        for doc in split_source(source, text, chunk_size, chunk_overlap):
+            wanted.setdefault(chunk_id(doc), doc)
+        kept = [doc_id for doc_id in wanted if doc_id in current]
+        new_ids = [doc_id for doc_id in wanted if doc_id not in current]
+        stale = sorted(current.keys() - wanted.keys())
+
+        if kept:
+            # Same text, so the stored vectors stay; only the file hash changes.
+            chroma_registry.update_metadata(collection_name, kept, [wanted[doc_id].metadata for doc_id in kept])
+        for start in range(0, len(new_ids), batch_size):
+            batch = new_ids[start:start + batch_size]
+            store.add_documents([wanted[doc_id] for doc_id in batch], ids=batch)
+            logger.info("[INGEST] %s: embedded %s/%s new chunks", source, start + len(batch), len(new_ids))
+        if stale:
+            store.delete(ids=stale)
+        result.unchanged += len(kept)
+        result.added += len(new_ids)
+        result.removed += len(stale)
+
+    orphaned = [
+        doc_id
+        for source, chunks in stored.items()
+        if source not in sources and _is_under(source, prune_dirs or [])
+        for doc_id in chunks
+    ]
+    if orphaned:
+        store.delete(ids=orphaned)
+        logger.info("[INGEST] Deleted %s chunk(s) of removed source files", len(orphaned))
+        result.removed += len(orphaned)
+
+    if result.added or result.removed:
+        get_retriever(collection_name).invalidate()
+    return result
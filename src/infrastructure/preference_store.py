@@ -0,0 +1,123 @@
+import logging
+import os
+import sqlite3
+import threading
+import time as _time
+
+from src.infrastructure.text_tokens import tokenize
+
+logger = logging.getLogger("PostClinics.Preferences")
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+class PreferenceStore:
+    """
+    Long-term patient preferences keyed by phone, in a SQLite file in WAL mode.
+    A preference whose word set overlaps an existing one for the same phone by at least
+    `duplicate_threshold` (Jaccard) is dropped, and only the newest `max_per_phone`
+    preferences are kept. Thread-safe.
+    """
+
+    def __init__(self, path: str, max_per_phone: int = 10, duplicate_threshold: float = 0.8):
+        self.path = path
+        self.max_per_phone = max_per_phone
+        self.duplicate_threshold = duplicate_threshold
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS patient_preference (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone TEXT NOT NULL,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_patient_preference_phone ON patient_preference (phone, id);
+            """
+        )
+        self.added = 0
+        self.duplicates = 0
+
+    def add(self, phone: str, text: str) -> bool:
+        """Stores `text` for `phone`; returns False if it duplicates a stored preference."""
+        text = (text or "").strip()
+        if not text:
+            return False
+        words = frozenset(tokenize(text))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT text FROM patient_preference WHERE phone = ?", (phone,)
+                ).fetchall()
+                if any(_similarity(words, frozenset(tokenize(row[0]))) >= self.duplicate_threshold for row in rows):
+                    self._conn.execute("COMMIT")
+                    self.duplicates += 1
+                    return False
+                self._conn.execute(
+                    "INSERT INTO patient_preference (phone, text, created_at) VALUES (?, ?, ?)",
+                    (phone, text, _time.time()),
+                )
+                self._conn.execute(
+                    """
+                    DELETE FROM patient_preference WHERE phone = ? AND id NOT IN (
+                        SELECT id FROM patient_preference WHERE phone = ? ORDER BY id DESC LIMIT ?
+                    )
+                    """,
+                    (phone, phone, self.max_per_phone),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.added += 1
+            return True
+
+    def list(self, phone: str) -> list[str]:
+        """Preferences for `phone`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text FROM patient_preference WHERE phone = ? ORDER BY id", (phone,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            phones, rows = self._conn.execute(
+                "SELECT COUNT(DISTINCT phone), COUNT(*) FROM patient_preference"
+            ).fetchone()
+        return {"phones": phones, "preferences": rows, "added": self.added, "duplicates": self.duplicates}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_from_collection(store, preferences: PreferenceStore) -> tuple[int, int]:
+    """
+    Copies preferences from a Chroma collection whose documents carry a `phone` metadata
+    (the old patient_profiles layout). Safe to re-run: copies are dropped as duplicates.
+    Returns (migrated, skipped).
+
+    The old layout recorded no timestamps, so preferences are added in the order Chroma
+    returns them: which of two near-duplicates is kept, and which survive the
+    `max_per_phone` cap, is arbitrary.
+    """
+    data = store.get(include=["documents", "metadatas"])
+    migrated = skipped = 0
+    for text, metadata in zip(data.get("documents") or [], data.get("metadatas") or []):
+        phone = (metadata or {}).get("phone")
+        if phone and preferences.add(str(phone), text):
+            migrated += 1
+        else:
+            skipped += 1
+    logger.info("[PREFERENCES] Migrated %s preferences, skipped %s", migrated, skipped)
+    return migrated, skipped
@@ -0,0 +1,64 @@
+import threading
+import time as _time
+from collections import OrderedDict
+
+
+class ProfileCache:
+    """
+    Per-phone TTL cache for rendered patient profiles, in least-recently-used order.
+    Empty profiles are cached too, since most phones have none. Thread-safe: lookups
+    run on the blocking pool.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, phone: str, now: float | None = None) -> str | None:
+        now = _time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[phone]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(phone)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, phone: str, profile: str, now: float | None = None):
+        now = _time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[phone] = (profile, now + self.ttl_seconds)
+            self._entries.move_to_end(phone)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, phone: str):
+        with self._lock:
+            if self._entries.pop(phone, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.invalidations = self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
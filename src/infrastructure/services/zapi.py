@@ -1,14 +1,154 @@
 import httpx
 import logging
 import asyncio
-from src.core.config import Z_API_CONFIG
+import time as _time
+from src.core.config import Z_API_CIRCUIT_CONFIG, Z_API_CONFIG, Z_API_HTTP_CONFIG
 
 logger = logging.getLogger("PostClinics.ZApi")
 
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling Z-API while it is failing. `failure_threshold` consecutive failures
+    (5xx, 429, timeouts, connection errors) open the circuit and calls are rejected at once;
+    after `reset_timeout_seconds` it goes half-open and lets up to `half_open_max_calls`
+    probes through. A successful probe closes it, a failed one opens it again.
+    Single event loop, so no locking.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout_seconds: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.changed_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.transitions: dict[str, int] = {}
+
+    def _transition(self, state: str, now: float):
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        log = logger.info if state == CLOSED else logger.warning
+        log("[ZAPI] Circuit %s (consecutive failures: %s)", key, self.consecutive_failures)
+        self.state = state
+        self._probes = 0
+        self.changed_at = now
+
+    def retry_after(self, now: float | None = None) -> float:
+        """Seconds until a call would be let through; 0 when closed or ready to probe."""
+        if self.state != OPEN:
+            return 0.0
+        now = _time.monotonic() if now is None else now
+        return max(0.0, self.changed_at + self.reset_timeout_seconds - now)
+
+    def allow(self, now: float | None = None) -> bool:
+        now = _time.monotonic() if now is None else now
+        if self.state == OPEN and self.retry_after(now) == 0:
+            self._transition(HALF_OPEN, now)
+        elif self.state == HALF_OPEN and now >= self.changed_at + self.reset_timeout_seconds:
+            # A probe that never reported back (cancelled, unexpected error) frees its slot.
+            self._probes = 0
+            self.changed_at = now
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self, now: float | None = None):
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED, _time.monotonic() if now is None else now)
+
+    def record_failure(self, now: float | None = None):
+        now = _time.monotonic() if now is None else now
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self._transition(OPEN, now)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
+
+
+circuit_breaker = CircuitBreaker(**Z_API_CIRCUIT_CONFIG)
+
+# Failures after the request was written; connect errors and pool timeouts are safe to retry.
+_AMBIGUOUS_ERRORS = (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    config = Z_API_HTTP_CONFIG
+    http2 = config["http2"] and _http2_available()
+    if config["http2"] and not http2:
+        logger.warning("ZAPI_HTTP2 is on but the 'h2' package is missing; using HTTP/1.1.")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive_connections"],
+            keepalive_expiry=config["keepalive_expiry_seconds"],
+        ),
+        timeout=config["timeout_seconds"],
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    The process-wide pooled client. Connections belong to the event loop that opened
+    them, so a loop other than the one the client was started in (a one-off script
+    calling asyncio.run) gets a fresh client.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = _build_client()
+        _client_loop = loop
+    return _client
+
+
+async def start_client() -> httpx.AsyncClient:
+    return get_client()
+
+
+async def close_client():
+    global _client, _client_loop
+    client, _client, _client_loop = _client, None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
 async def send_message(phone: str, message: str, max_retries: int = 3):
     """
-    Sends a message via Z-API with automatic retry logic.
-    Returns: dict with {success, status_code, error_message}
+    Sends a message via Z-API, retrying 5xx and connection errors up to `max_retries`
+    attempts back to back. Backoff between sends belongs to the outbound queue, which
+    calls this with max_retries=1.
+    Returns: dict with {success, status_code, error_message}; `in_doubt` is set, without
+    retrying, when the request was sent but the answer was lost.
     """
     instance_id = Z_API_CONFIG.get("instance_id")
     token = Z_API_CONFIG.get("token")
@@ -19,7 +159,7 @@ async def send_message(phone: str, message: str, max_retries: int = 3):
         logger.error(error)
         return {"success": False, "status_code": 0, "error_message": error}
         
-    url = f"https://api.z-api.io/instances/{instance_id}/token/{token}/send-text"
+    url = f"{Z_API_CONFIG['base_url']}/instances/{instance_id}/token/{token}/send-text"
     
     headers = {
         "Client-Token": client_token,
@@ -32,34 +172,52 @@ async def send_message(phone: str, message: str, max_retries: int = 3):
     }
     
     attempts = 0
-    backoff = 2 # seconds
+    last_error = None
     
     while attempts < max_retries:
         attempts += 1
+        if not circuit_breaker.allow():
+            # Fail fast instead of sleeping through retries; the outbound queue parks the message.
+            error = f"Z-API circuit open; retry in {circuit_breaker.retry_after():.0f}s"
+            logger.warning(f"{error} (phone={phone})")
+            return {"success": False, "status_code": 503, "error_message": error, "circuit_open": True}
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, headers=headers, json=payload, timeout=12)
-                
+            response = await get_client().post(url, headers=headers, json=payload)
+
             if response.status_code == 200:
-                logger.info(f"Message sent to {phone} (Attempt {attempts}): {response.json()}")
+                circuit_breaker.record_success()
+                logger.info(f"Message sent to {phone} (Attempt {attempts}): {response.text[:200]}")
                 return {"success": True, "status_code": 200, "error_message": None}
             
             # If 4xx, it's a client error (invalid phone, etc.) - don't retry
             if 400 <= response.status_code < 500:
+                if response.status_code == 429:
+                    # Throttled: back off like on a server error.
+                    circuit_breaker.record_failure()
+                else:
+                    # Z-API answered, so it is up.
+                    circuit_breaker.record_success()
                 error = f"Z-API Client Error {response.status_code}: {response.text}"
                 logger.error(error)
                 return {"success": False, "status_code": response.status_code, "error_message": error}
                 
             # If 5xx, it's a server error - retry
-            logger.warning(f"Z-API Server Error {response.status_code} (Attempt {attempts}/{max_retries}). Retrying in {backoff}s...")
+            circuit_breaker.record_failure()
+            last_error = f"Z-API Server Error {response.status_code}"
+            logger.warning(f"Z-API Server Error {response.status_code} (Attempt {attempts}/{max_retries})")
             
+        except _AMBIGUOUS_ERRORS as e:
+            # The request went out but no answer came back: Z-API may have delivered it,
+            # so a retry could message the patient twice.
+            circuit_breaker.record_failure()
+            error = f"Z-API Connectivity Error (delivery unknown): {e!r}"
+            logger.warning(f"{error} (phone={phone}, attempt {attempts})")
+            return {"success": False, "status_code": 504, "error_message": error, "in_doubt": True}
         except (httpx.RequestError, asyncio.TimeoutError) as e:
-            logger.warning(f"Z-API Connectivity Error (Attempt {attempts}/{max_retries}): {str(e)}. Retrying in {backoff}s...")
-            
-        if attempts < max_retries:
-            await asyncio.sleep(backoff)
-            backoff *= 2 # Exponential backoff
-            
-    error_msg = f"Failed to send message after {max_retries} attempts."
+            circuit_breaker.record_failure()
+            last_error = f"Z-API Connectivity Error: {e}"
+            logger.warning(f"Z-API Connectivity Error (Attempt {attempts}/{max_retries}): {str(e)}")
+
+    error_msg = f"Failed to send message after {max_retries} attempts: {last_error}"
     logger.error(error_msg)
     return {"success": False, "status_code": 500, "error_message": error_msg}
@@ -0,0 +1,321 @@
+"""
+Local stand-in for Z-API's send-text endpoint, for tests and load benchmarks.
+
+`MockZApi` is a raw ASGI app. Run it in-process (httpx.ASGITransport, or uvicorn in a
+thread via `serve_in_thread`) or as a subprocess (`start_subprocess`, or
+`python -m src.infrastructure.services.zapi_mock --port 8999 --error-rate 0.2`).
+It records every request it receives. Responses can be slowed down by a latency
+distribution and made to fail at a given rate, and the mock rate-limits like the
+real provider. Over HTTP, the recorded requests are served at GET /_mock/received
+and cleared with POST /_mock/reset.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time as _time
+import uuid
+from collections.abc import Callable, Iterator
+
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+_SEND_TEXT_PATH = re.compile(r"^/instances/(?P<instance>[^/]+)/token/(?P<token>[^/]+)/send-text$")
+
+LatencySampler = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str | float | None) -> LatencySampler:
+    """
+    Latency distribution in seconds, from a spec such as "0.02", "fixed:0.02",
+    "uniform:0.005,0.05", "exponential:0.02" (mean) or "lognormal:0.02,0.8" (median,
+    sigma; long tail). None or "0" means no delay.
+    """
+    if spec is None or isinstance(spec, (int, float)):
+        delay = float(spec or 0)
+        return lambda rng: delay
+    kind, _, args = spec.partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    try:
+        values = [float(v) for v in args.split(",")]
+        if kind == "fixed" and len(values) == 1:
+            return lambda rng: values[0]
+        if kind == "uniform" and len(values) == 2:
+            return lambda rng: rng.uniform(values[0], values[1])
+        if kind == "exponential" and len(values) == 1:
+            return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+        if kind == "lognormal" and len(values) == 2:
+            return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    except (ValueError, ZeroDivisionError):
+        pass
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class MockZApi:
+    """
+    ASGI app answering POST /instances/{id}/token/{token}/send-text like Z-API.
+
+    Each send waits for a delay drawn from `latency`. A request over the token bucket
+    (`rate_limit_per_second`, up to `burst`) gets a 429. Otherwise it fails with
+    `error_status` at `error_rate`, or, at `hang_rate`, is accepted but answered only
+    after `hang_seconds`, so the client times out not knowing it was delivered.
+    `fail_next()` scripts the next responses for deterministic tests. Every request is
+    appended to `received`.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: str | float | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        hang_rate: float = 0.0,
+        hang_seconds: float = 30.0,
+        rate_limit_per_second: float | None = None,
+        burst: int = 10,
+        client_token: str | None = None,
+        seed: int | None = None,
+    ):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.rate_limit_per_second = rate_limit_per_second
+        self.burst = burst
+        self.client_token = client_token
+        self._rng = random.Random(seed)
+        self._scripted: list[int] = []
+        self._tokens = float(burst)
+        self._tokens_at = _time.monotonic()
+        self.received: list[dict] = []
+
+    def fail_next(self, count: int = 1, status: int = 500):
+        """Answers the next `count` sends with `status` (0 hangs), ahead of the random rates."""
+        self._scripted.extend([status] * count)
+
+    def reset(self):
+        self.received.clear()
+        self._scripted.clear()
+        self._tokens = float(self.burst)
+        self._tokens_at = _time.monotonic()
+
+    def delivered(self) -> list[dict]:
+        """Requests Z-API would have delivered to the patient, hung ones included."""
+        return [r for r in self.received if r["status"] in (200, 0)]
+
+    def stats(self) -> dict:
+        statuses: dict[str, int] = {}
+        for r in self.received:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+        delivered = [(r["phone"], r["message"]) for r in self.delivered()]
+        return {
+            "received": len(self.received),
+            "delivered": len(delivered),
+            "duplicates": len(delivered) - len(set(delivered)),
+            "statuses": statuses,
+        }
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit_per_second:
+            return True
+        now = _time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._tokens_at) * self.rate_limit_per_second)
+        self._tokens_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _choose_status(self) -> int:
+        if self._scripted:
+            return self._scripted.pop(0)
+        if not self._take_token():
+            return 429
+        roll = self._rng.random()
+        if roll < self.error_rate:
+            return self.error_status
+        if roll < self.error_rate + self.hang_rate:
+            return 0
+        return 200
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        body = await self._read_body(receive)
+        path, method = scope["path"], scope["method"]
+        if path == "/_mock/received" and method == "GET":
+            await self._respond(send, 200, {"received": self.received, "stats": self.stats()})
+            return
+        if path == "/_mock/reset" and method == "POST":
+            self.reset()
+            await self._respond(send, 200, {"status": "reset"})
+            return
+        match = _SEND_TEXT_PATH.match(path)
+        if match is None or method != "POST":
+            await self._respond(send, 404, {"error": "Not found"})
+            return
+        await self._send_text(scope, match["instance"], body, send)
+
+    async def _send_text(self, scope, instance_id: str, body: bytes, send):
+        started = _time.monotonic()
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+        record = {
+            "instance_id": instance_id,
+            "phone": payload.get("phone"),
+            "message": payload.get("message"),
+            "received_at": _time.time(),
+            "status": None,
+        }
+        self.received.append(record)
+
+        if self.client_token is not None and headers.get("client-token") != self.client_token:
+            record["status"] = 401
+            await self._respond(send, 401, {"error": "Client-Token invalid"})
+            return
+        if not record["phone"] or not record["message"]:
+            record["status"] = 400
+            await self._respond(send, 400, {"error": "phone and message are required"})
+            return
+
+        record["status"] = status = self._choose_status()
+        await asyncio.sleep(max(0.0, self.latency(self._rng)))
+        if status == 0:
+            await asyncio.sleep(self.hang_seconds)
+            status = 200
+        record["latency_seconds"] = round(_time.monotonic() - started, 6)
+        if status == 200:
+            await self._respond(send, 200, {"zaapId": uuid.uuid4().hex, "messageId": uuid.uuid4().hex})
+        elif status == 429:
+            await self._respond(send, 429, {"error": "Too many requests"}, [(b"retry-after", b"1")])
+        else:
+            await self._respond(send, status, {"error": f"Mock error {status}"})
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _respond(send, status: int, result: dict, extra_headers: list | None = None):
+        payload = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": _JSON_HEADERS + [(b"content-length", str(len(payload)).encode())] + (extra_headers or []),
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float):
+    deadline = _time.monotonic() + timeout
+    while _time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return
+        _time.sleep(0.05)
+    raise TimeoutError(f"Mock Z-API did not start on port {port} within {timeout}s")
+
+
+@contextlib.contextmanager
+def serve_in_thread(app: MockZApi, port: int | None = None, **uvicorn_options) -> Iterator[str]:
+    """Serves `app` with uvicorn on 127.0.0.1 in a daemon thread; yields its base URL."""
+    import uvicorn
+
+    port = port or free_port()
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off", ws="none", **uvicorn_options
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        _wait_for_port(port, timeout=10)
+        scheme = "https" if uvicorn_options.get("ssl_certfile") else "http"
+        yield f"{scheme}://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@contextlib.contextmanager
+def start_subprocess(port: int | None = None, **options) -> Iterator[str]:
+    """
+    Runs the mock as `python -m src.infrastructure.services.zapi_mock` with `options`
+    as flags (error_rate=0.1 -> --error-rate 0.1); yields its base URL.
+    """
+    port = port or free_port()
+    argv = [sys.executable, "-m", "src.infrastructure.services.zapi_mock", "--port", str(port)]
+    for name, value in options.items():
+        if value is not None:
+            argv += [f"--{name.replace('_', '-')}", str(value)]
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    process = subprocess.Popen(argv, cwd=root)
+    try:
+        _wait_for_port(port, timeout=15)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv: list[str] | None = None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock Z-API send-text server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", default=None, help='e.g. "lognormal:0.02,0.8"')
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--rate-limit-per-second", type=float, default=None)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--client-token", default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    app = MockZApi(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        rate_limit_per_second=args.rate_limit_per_second,
+        burst=args.burst,
+        client_token=args.client_token,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", lifespan="off", ws="none")
+
+
+if __name__ == "__main__":
+    main()
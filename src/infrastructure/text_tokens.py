@@ -0,0 +1,25 @@
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"\w+")
+# Function words that carry no signal in clinic FAQ questions.
+_STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das no na nos nas em ao aos por para pra com sem "
+    "e ou que se me te lhe eu voce voces ele ela eles elas meu minha seu sua qual quais quando "
+    "como onde tem ter ha e esta estou sao vai vou pode posso gostaria queria quero sobre "
+    "mais muito ja nao sim isso este essa esse".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, accent-free word tokens without stopwords; a trailing plural "s" is dropped."""
+    folded = unicodedata.normalize("NFKD", (text or "").lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    tokens = []
+    for token in _TOKEN_RE.findall(folded):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
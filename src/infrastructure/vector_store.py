@@ -1,8 +1,20 @@
 import os
+import threading
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 import chromadb
-from src.core.config import DATA_DIR
+from src.core.config import (
+    DATA_DIR,
+    EMBEDDING_CACHE_CONFIG,
+    EMBEDDING_CONFIG,
+    PREFERENCE_STORE_CONFIG,
+    PROFILE_CACHE_CONFIG,
+    RETRIEVAL_CONFIG,
+)
+from src.infrastructure.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.infrastructure.embeddings import LazyEmbeddings
+from src.infrastructure.hybrid_retriever import HybridRetriever
+from src.infrastructure.preference_store import PreferenceStore
+from src.infrastructure.profile_cache import ProfileCache
 
 # Ensure data directory exists
 if not os.path.exists(DATA_DIR):
@@ -10,38 +22,104 @@ if not os.path.exists(DATA_DIR):
 
 CHROMA_DB_PATH = os.path.join(DATA_DIR, "chroma_db")
 
-_embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+_model = LazyEmbeddings(EMBEDDING_CONFIG)
+# Patient questions repeat a lot; their query vectors are cached across restarts.
+query_embeddings = CachedEmbeddings(_model, EmbeddingCache(model_version=_model.model_version, **EMBEDDING_CACHE_CONFIG))
+
+profile_cache = ProfileCache(**PROFILE_CACHE_CONFIG)
+preference_store = PreferenceStore(**PREFERENCE_STORE_CONFIG)
+
+class ChromaRegistry:
+    """
+    Opens the persistent Chroma client once per process and keeps one `Chroma` wrapper
+    per collection. Thread-safe: stores are requested from the blocking pool.
+    """
+
+    def __init__(self, path: str, embedding_function=None):
+        self.path = path
+        self.embedding_function = embedding_function if embedding_function is not None else query_embeddings
+        self._lock = threading.Lock()
+        self._client = None
+        self._stores: dict[str, Chroma] = {}
+
+    def store(self, collection_name: str) -> Chroma:
+        store = self._stores.get(collection_name)
+        if store is not None:
+            return store
+        with self._lock:
+            store = self._stores.get(collection_name)
+            if store is None:
+                if self._client is None:
+                    self._client = chromadb.PersistentClient(path=self.path)
+                store = Chroma(
+                    client=self._client,
+                    collection_name=collection_name,
+                    embedding_function=self.embedding_function,
+                )
+                self._stores[collection_name] = store
+            return store
+
+    def update_metadata(self, collection_name: str, ids: list[str], metadatas: list[dict]):
+        """Replaces the metadata of stored chunks, keeping their texts and vectors."""
+        # The langchain wrapper can only update by re-embedding (update_documents).
+        self.store(collection_name)
+        with self._lock:
+            collection = self._client.get_collection(collection_name)
+        collection.update(ids=ids, metadatas=metadatas)
+
+    def close(self):
+        with self._lock:
+            self._stores.clear()
+            if self._client is not None:
+                self._client.clear_system_cache()
+                self._client = None
+
+
+chroma_registry = ChromaRegistry(CHROMA_DB_PATH)
+
+def warmup_embeddings():
+    """Loads the embedding model ahead of the first search."""
+    _model.warmup()
 
 def get_vector_store(collection_name: str = "clinic_knowledge"):
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    vector_store = Chroma(
-        client=client,
-        collection_name=collection_name,
-        embedding_function=_embeddings,
-    )
-    return vector_store
+    return chroma_registry.store(collection_name)
+
+_retrievers: dict[str, HybridRetriever] = {}
+_retrievers_lock = threading.Lock()
+
+def get_retriever(collection_name: str = "clinic_knowledge") -> HybridRetriever:
+    retriever = _retrievers.get(collection_name)
+    if retriever is None:
+        with _retrievers_lock:
+            retriever = _retrievers.setdefault(
+                collection_name,
+                HybridRetriever(lambda: get_vector_store(collection_name), **RETRIEVAL_CONFIG),
+            )
+    return retriever
 
 def add_documents_to_store(docs, collection_name: str = "clinic_knowledge"):
     store = get_vector_store(collection_name)
     store.add_documents(docs)
+    get_retriever(collection_name).invalidate()
     return store
 
 def search_store(query: str, k: int = 3, collection_name: str = "clinic_knowledge"):
-    store = get_vector_store(collection_name)
-    results = store.similarity_search(query, k=k)
-    return results
+    return get_retriever(collection_name).search(query, k=k)
 
-def add_patient_preference(phone: str, text: str):
-    from langchain_core.documents import Document
-    store = get_vector_store("patient_profiles")
-    doc = Document(page_content=text, metadata={"phone": phone})
-    store.add_documents([doc])
+def add_patient_preference(phone: str, text: str) -> bool:
+    added = preference_store.add(phone, text)
+    if added:
+        profile_cache.invalidate(phone)
+    return added
 
 def get_patient_profile(phone: str) -> str:
-    store = get_vector_store("patient_profiles")
-    results = store.similarity_search("patient preferences", k=10, filter={"phone": phone})
-    if not results:
-        return ""
-    
-    prefs = [res.page_content for res in results]
-    return "Preferências do Paciente:\n" + "\n".join(f"- {p}" for p in prefs)
+    cached = profile_cache.get(phone)
+    if cached is not None:
+        return cached
+
+    prefs = preference_store.list(phone)
+    profile = ""
+    if prefs:
+        profile = "Preferências do Paciente:\n" + "\n".join(f"- {p}" for p in prefs)
+    profile_cache.put(phone, profile)
+    return profile
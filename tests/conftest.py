@@ -52,3 +52,47 @@ def auth_token(client):
 def auth_headers(auth_token):
     """Authorization headers for authenticated requests."""
     return {"Authorization": f"Bearer {auth_token}"}
+
+
+def _pointing_zapi_at(base_url: str, build_client=None):
+    """Patches Z_API_CONFIG to `base_url`, with a fresh client and circuit breaker."""
+    from contextlib import ExitStack
+    from unittest.mock import patch
+    from src.infrastructure.services import zapi
+
+    stack = ExitStack()
+    stack.enter_context(patch.dict(zapi.Z_API_CONFIG, {
+        "instance_id": "mock-instance", "token": "mock-token", "client_token": "mock-client-token",
+        "base_url": base_url,
+    }))
+    stack.enter_context(patch.object(zapi, "_client", None))
+    stack.enter_context(patch.object(zapi, "_client_loop", None))
+    stack.enter_context(patch.object(zapi, "circuit_breaker", zapi.CircuitBreaker(**zapi.Z_API_CIRCUIT_CONFIG)))
+    if build_client is not None:
+        stack.enter_context(patch.object(zapi, "_build_client", build_client))
+    return stack
+
+
+@pytest.fixture()
+def mock_zapi():
+    """In-process MockZApi behind httpx.ASGITransport (no sockets, no client timeouts)."""
+    import httpx
+    from src.infrastructure.services.zapi_mock import MockZApi
+
+    app = MockZApi(client_token="mock-client-token", seed=0)
+
+    def build():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+
+    with _pointing_zapi_at("http://zapi.mock", build):
+        yield app
+
+
+@pytest.fixture()
+def mock_zapi_server():
+    """MockZApi served over real HTTP by uvicorn in a thread, for timeouts and pooling."""
+    from src.infrastructure.services.zapi_mock import MockZApi, serve_in_thread
+
+    app = MockZApi(client_token="mock-client-token", seed=0)
+    with serve_in_thread(app) as base_url, _pointing_zapi_at(base_url):
+        yield app
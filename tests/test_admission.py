@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.application.services import message_handler
+from src.application.services.admission import AdmissionController, AgentOverloaded
+
+
+def test_concurrency_cap_and_round_robin_between_phones():
+    async def _run():
+        admission = AdmissionController(max_concurrency=1, max_waiting=10, wait_timeout_seconds=5)
+        order = []
+        release_first = asyncio.Event()
+
+        async def call(phone, tag, hold=None):
+            async with admission.admit(phone):
+                order.append(tag)
+                if hold is not None:
+                    await hold.wait()
+
+        first = asyncio.create_task(call("A", "a0", release_first))
+        await asyncio.sleep(0)
+        # Phone A queues two calls before B queues one; B must not wait behind both.
+        waiters = [
+            asyncio.create_task(call("A", "a1")),
+            asyncio.create_task(call("A", "a2")),
+            asyncio.create_task(call("B", "b1")),
+        ]
+        await asyncio.sleep(0)
+        assert admission.in_flight == 1
+        assert admission.waiting == 3
+
+        release_first.set()
+        await asyncio.gather(first, *waiters)
+        assert order == ["a0", "a1", "b1", "a2"]
+        assert admission.stats()["in_flight"] == 0
+        assert admission.stats()["admitted"] == 4
+
+    asyncio.run(_run())
+
+
+def test_sheds_when_waiting_queue_is_full_or_wait_times_out():
+    async def _run():
+        admission = AdmissionController(max_concurrency=1, max_waiting=1, wait_timeout_seconds=0.05)
+        await admission.acquire("A")
+        waiter = asyncio.create_task(admission.acquire("B"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AgentOverloaded):
+            await admission.acquire("C")
+        with pytest.raises(AgentOverloaded):
+            await waiter
+
+        admission.release()
+        stats = admission.stats()
+        assert stats["in_flight"] == 0
+        assert stats["waiting"] == 0
+        assert stats["shed_queue_full"] == 1
+        assert stats["shed_timeout"] == 1
+
+    asyncio.run(_run())
+
+
+def test_saturated_agent_replies_immediately_without_llm_call():
+    async def _run():
+        phone = "5511900000099"
+        message_handler.state_backend.clear()
+        saturated = AdmissionController(max_concurrency=0, max_waiting=0, wait_timeout_seconds=1)
+        send = AsyncMock(return_value=True)
+        runner = AsyncMock()
+        with patch.object(message_handler, "agent_admission", saturated), \
+             patch.object(message_handler, "send_message", send), \
+             patch.object(message_handler.Runner, "run", runner), \
+             patch.object(message_handler, "_try_fast_path", AsyncMock(return_value=False)):
+            await message_handler.process_webhook_payload(phone, "msg-1", "quero agendar uma consulta")
+
+        runner.assert_not_called()
+        send.assert_awaited_once_with(phone, message_handler.RATE_LIMIT_REPLY, idempotency_key="msg-1:reply")
+        assert message_handler._has_active_handoff(phone)
+        message_handler.state_backend.clear()
+
+    asyncio.run(_run())
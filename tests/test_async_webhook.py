@@ -28,9 +28,9 @@ def test_webhook_latency_and_debounce():
         config.ANTISPAM_CONFIG["max_messages_per_minute"] = 9999
         config.ANTISPAM_CONFIG["cooldown_seconds"] = 0
         from src.application.services import message_handler
-        message_handler._phone_out_of_scope_attempts.clear()
-        webhooks._phone_timestamps.clear()
-        webhooks._seen_messages.clear()
+        message_handler.conversation_state.clear()
+        webhooks.state_backend.clear()
+        webhooks.inbound_queue.clear()
         message_handler._phone_handoff_until.clear()
 
         with patch("src.application.services.message_handler.Runner.run", new_callable=AsyncMock) as mock_runner:
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api.routes import webhooks
+from src.application.services.batch_ingest import ingest_batch
+from src.application.services.inbound_queue import InboundJobQueue
+from src.application.services.state_backend import InMemoryStateBackend
+from src.application.services.zapi_payload import InboundMessage
+from src.core import config, security
+
+CONFIG = {
+    "max_messages_per_minute": 2,
+    "cooldown_seconds": 5,
+    "dedup_window_seconds": 300,
+    "dedup_max_entries": 1000,
+}
+
+
+def _queue(path):
+    return InboundJobQueue(
+        str(path),
+        lease_seconds=60,
+        max_attempts=2,
+        retry_base_seconds=0,
+        coalesce_window_seconds=0,
+        coalesce_max_wait_seconds=5,
+        coalesce_max_messages=10,
+    )
+
+
+def test_batch_dedups_caps_per_phone_and_groups_by_phone(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    backend = InMemoryStateBackend(CONFIG)
+    backend.is_duplicate_message("already-seen")
+    messages = [
+        InboundMessage("5511900000040", "a1", "oi"),
+        InboundMessage("5511900000041", "b1", "bom dia"),
+        InboundMessage("5511900000040", "a2", "queria marcar"),
+        InboundMessage("5511900000040", "a3", "amanhã"),
+        InboundMessage("5511900000041", "b1", "bom dia"),
+        InboundMessage("5511900000041", "already-seen", "repetida"),
+        InboundMessage("5511900000042", "c1", "eu mesma", from_me=True),
+        InboundMessage(None, "d1", "sem telefone"),
+    ]
+
+    result = ingest_batch(messages, queue=queue, backend=backend, max_per_phone=2)
+
+    assert result["received"] == 8
+    assert result["queued"] == 3
+    assert result["phones"] == 2
+    assert result["ignored"] == {
+        "filtered_source": 1,
+        "missing_data": 1,
+        "duplicate_message": 2,
+        "rate_limited": 1,
+    }
+    # Back-to-back redeliveries are not dropped by the cooldown.
+    first = queue.lease()
+    assert (first.phone, first.message_ids, first.text) == ("5511900000040", ["a1", "a2"], "oi\nqueria marcar")
+    second = queue.lease()
+    assert (second.phone, second.message_id) == ("5511900000041", "b1")
+    queue.close()
+
+
+def test_batch_endpoint_accepts_messages_under_one_signature(monkeypatch):
+    monkeypatch.setattr(security, "WEBHOOK_VALIDATE_SIGNATURE", True)
+    monkeypatch.setattr(security, "WEBHOOK_SIGNATURE_SECRET", "batch-secret")
+    monkeypatch.setitem(config.ANTISPAM_CONFIG, "max_messages_per_minute", 10)
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+
+    body = json.dumps({"messages": [
+        {"phone": "5511900000043", "messageId": "batch-1", "text": {"message": "oi"}},
+        {"phone": "5511900000043", "messageId": "batch-2", "text": {"message": "tudo bem?"}},
+        {"phone": "5511900000044", "messageId": "batch-3", "status": "READ"},
+    ]}).encode("utf-8")
+    signature = "sha256=" + security.generate_signature(body)
+
+    client = TestClient(app)
+    response = client.post(
+        "/webhook/zapi/batch", content=body, headers={config.WEBHOOK_SIGNATURE_HEADER: signature}
+    )
+    unsigned = client.post("/webhook/zapi/batch", content=body)
+
+    assert response.status_code == 200
+    assert response.json()["queued"] == 2
+    assert response.json()["ignored"] == {"missing_data": 1}
+    assert unsigned.status_code == 401
+    assert webhooks.inbound_queue.stats()["depth"] == 2
+
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+
+
+def test_messages_over_the_cap_are_not_marked_seen(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    backend = InMemoryStateBackend({**CONFIG, "max_messages_per_minute": 10})
+    messages = [InboundMessage("5511900000045", f"cap-{i}", f"mensagem {i}") for i in range(4)]
+
+    first = ingest_batch(messages, queue=queue, backend=backend, max_per_phone=2)
+    again = ingest_batch(messages, queue=queue, backend=backend, max_per_phone=2)
+
+    assert (first["queued"], first["ignored"]) == (2, {"rate_limited": 2})
+    assert (again["queued"], again["ignored"]) == (2, {"duplicate_message": 2})
+    assert backend.is_duplicate_message("cap-3") is True
+    queue.close()
+
+
+def test_batch_endpoint_refuses_oversized_bodies_before_decoding(monkeypatch):
+    monkeypatch.setattr(security, "WEBHOOK_VALIDATE_SIGNATURE", False)
+    monkeypatch.setattr(webhooks, "WEBHOOK_BATCH_MAX_BYTES", 64)
+    monkeypatch.setattr(webhooks, "decode_batch", lambda body: pytest.fail("decoded an oversized body"))
+
+    client = TestClient(app)
+    body = json.dumps([{"phone": "5511900000046", "messageId": f"big-{i}", "text": {"message": "oi"}} for i in range(5)])
+    declared = client.post("/webhook/zapi/batch", content=body)
+    chunked = client.post("/webhook/zapi/batch", content=iter([body[:40].encode(), body[40:].encode()]))
+
+    assert declared.status_code == chunked.status_code == 413
@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from src.infrastructure import vector_store
+from src.infrastructure.vector_store import ChromaRegistry
+
+
+def test_client_opens_once_and_collection_handles_are_reused(tmp_path):
+    registry = ChromaRegistry(str(tmp_path))
+    with patch.object(vector_store.chromadb, "PersistentClient") as client_cls, \
+         patch.object(vector_store, "Chroma", side_effect=lambda **kw: MagicMock(name=kw["collection_name"])) as chroma_cls:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            stores = list(pool.map(lambda i: registry.store(["clinic_knowledge", "patient_profiles"][i % 2]), range(64)))
+
+        assert client_cls.call_count == 1
+        assert chroma_cls.call_count == 2
+        assert len({id(s) for s in stores}) == 2
+
+        registry.close()
+        client_cls.return_value.clear_system_cache.assert_called_once()
+        registry.store("clinic_knowledge")
+        assert client_cls.call_count == 2
@@ -0,0 +1,65 @@
+import asyncio
+
+from src.application.services import message_handler
+from src.application.services.conversation_state import ConversationState
+from src.application.services.state_backend import InMemoryStateBackend
+
+BACKEND_CONFIG = {
+    "max_messages_per_minute": 10,
+    "cooldown_seconds": 0,
+    "dedup_window_seconds": 300,
+    "dedup_max_entries": 100,
+}
+
+
+def test_idle_conversations_are_released_but_held_ones_survive():
+    async def _run():
+        state = ConversationState(idle_seconds=10, max_entries=100)
+        state.record_out_of_scope("5511900000060")
+        state._touch("5511900000060", now=0.0)
+
+        async with state.hold("5511900000061"):
+            state._entries["5511900000061"].last_seen = 0.0
+            assert state.evict_idle(now=20.0) == 1
+            assert "5511900000061" in state._entries
+
+        assert state.out_of_scope_attempts("5511900000060") == 0
+        assert state.stats() == {"tracked_phones": 1, "held": 0, "evicted": 1}
+
+    asyncio.run(_run())
+
+
+def test_oldest_conversations_are_dropped_over_capacity():
+    state = ConversationState(idle_seconds=3600, max_entries=2)
+    for i, phone in enumerate(["a", "b", "c"]):
+        state._touch(phone, now=float(i))
+
+    assert list(state._entries) == ["b", "c"]
+    assert state.evicted == 1
+
+
+def test_snapshot_and_restore_keep_counters_and_memory_backend_keys(tmp_path):
+    path = str(tmp_path / "conversation_state.db")
+    backend = InMemoryStateBackend(BACKEND_CONFIG)
+    backend.set("session:5511900000062", "1700000000", ttl_seconds=1800)
+    backend.set("handoff:5511900000063", "1", ttl_seconds=-1)
+    state = ConversationState(idle_seconds=3600, max_entries=100)
+    state.record_out_of_scope("5511900000062")
+    state.snapshot(path, backend)
+
+    restored_backend = InMemoryStateBackend(BACKEND_CONFIG)
+    restored = ConversationState(idle_seconds=3600, max_entries=100)
+    assert restored.restore(path, restored_backend) == 2
+
+    assert restored.out_of_scope_attempts("5511900000062") == 1
+    assert restored_backend.get("session:5511900000062") == "1700000000"
+    assert restored_backend.get("handoff:5511900000063") is None
+
+
+def test_handoff_expires_after_ttl(monkeypatch):
+    backend = InMemoryStateBackend(BACKEND_CONFIG)
+    monkeypatch.setattr(message_handler, "state_backend", backend)
+    monkeypatch.setattr(message_handler, "HANDOFF_TTL_SECONDS", -1)
+
+    message_handler._activate_handoff("5511900000064")
+    assert not message_handler._has_active_handoff("5511900000064")
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlmodel import Session, delete, select
+
+from src.api.main import app
+from src.core.security import verify_token
+from src.domain.models import Appointment, Patient
+from src.infrastructure.database import async_engine, create_db_and_tables, engine
+
+# Timing under load is measured by scripts/bench_dashboard_load.py; this test checks
+# the deterministic part: the dashboard routes never touch the blocking engine.
+
+LOAD_PHONE_PREFIX = "55119777"
+SEEDED_APPOINTMENTS = 120
+DASHBOARD_CLIENTS = 8
+
+
+def _seed():
+    with Session(engine) as session:
+        start = datetime.now() + timedelta(days=30)
+        for i in range(SEEDED_APPOINTMENTS):
+            phone = f"{LOAD_PHONE_PREFIX}{i:04d}"
+            patient = Patient(name=f"Load {i}", phone=phone, contact_phone=f"55118{i:04d}" if i % 2 else None)
+            session.add(patient)
+            session.flush()
+            session.add(Appointment(patient_id=patient.id, datetime=start + timedelta(hours=i), service="Clínica Geral", status="scheduled"))
+        session.commit()
+
+
+def _cleanup():
+    with Session(engine) as session:
+        ids = session.exec(select(Patient.id).where(Patient.phone.startswith(LOAD_PHONE_PREFIX))).all()
+        session.exec(delete(Appointment).where(Appointment.patient_id.in_(ids)))
+        session.exec(delete(Patient).where(Patient.id.in_(ids)))
+        session.commit()
+
+
+def test_dashboard_routes_only_use_the_async_engine():
+    create_db_and_tables()
+    _cleanup()
+    _seed()
+    app.dependency_overrides[verify_token] = lambda: None
+    statements = {"blocking": 0, "async": 0}
+
+    def _count(kind):
+        def listener(*_args):
+            statements[kind] += 1
+        return listener
+
+    blocking_listener, async_listener = _count("blocking"), _count("async")
+    event.listen(engine, "before_cursor_execute", blocking_listener)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", async_listener)
+
+    async def _run():
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            listings = await asyncio.gather(*(client.get("/api/appointments") for _ in range(DASHBOARD_CLIENTS)))
+            created = await client.post("/api/appointments", json={
+                "patient_name": "Load Created", "patient_phone": f"{LOAD_PHONE_PREFIX}9999",
+                "datetime": (datetime.now() + timedelta(days=60)).replace(microsecond=0).isoformat(),
+            })
+            deleted = await client.delete(f"/api/appointments/{created.json()['id']}")
+        await async_engine.dispose()
+        return listings, created, deleted
+
+    try:
+        listings, created, deleted = asyncio.run(_run())
+    finally:
+        event.remove(engine, "before_cursor_execute", blocking_listener)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", async_listener)
+        app.dependency_overrides.pop(verify_token, None)
+        _cleanup()
+
+    assert all(r.status_code == 200 for r in listings)
+    assert (created.status_code, deleted.status_code) == (200, 200)
+    assert statements["blocking"] == 0
+    assert statements["async"] >= DASHBOARD_CLIENTS + 2
+
+    rows = {a["patient_name"]: a for a in listings[0].json()["appointments"]}
+    # The contact phone wins over the patient's own phone when set.
+    assert rows["Load 1"]["patient_phone"] == "551180001"
+    assert rows["Load 2"]["patient_phone"] == f"{LOAD_PHONE_PREFIX}0002"
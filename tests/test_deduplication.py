@@ -0,0 +1,34 @@
+from src.application.services.deduplication import MessageDeduplicator
+
+
+def test_duplicate_inside_window_is_detected():
+    dedup = MessageDeduplicator(window_seconds=300, max_entries=100)
+
+    assert dedup.check_and_add("msg-1", now=0.0) is False
+    assert dedup.check_and_add("msg-1", now=10.0) is True
+    assert dedup.stats()["hits"] == 1
+    assert dedup.stats()["misses"] == 1
+
+
+def test_message_is_accepted_again_after_window_expires():
+    dedup = MessageDeduplicator(window_seconds=300, max_entries=100)
+
+    dedup.check_and_add("msg-1", now=0.0)
+    dedup.check_and_add("msg-2", now=100.0)
+
+    assert dedup.check_and_add("msg-1", now=300.0) is False
+    assert "msg-2" in dedup
+    assert dedup.stats()["evictions"] == 1
+
+
+def test_hard_cap_evicts_oldest_entry_first():
+    dedup = MessageDeduplicator(window_seconds=300, max_entries=3)
+
+    for i in range(5):
+        dedup.check_and_add(f"msg-{i}", now=float(i))
+
+    assert len(dedup) == 3
+    assert "msg-0" not in dedup
+    assert "msg-1" not in dedup
+    assert "msg-4" in dedup
+    assert dedup.stats()["evictions"] == 2
@@ -0,0 +1,88 @@
+import itertools
+import sqlite3
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.infrastructure import embedding_cache
+from src.infrastructure.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+def _model():
+    model = MagicMock()
+    model.embed_query.side_effect = lambda text: [float(len(text)), 0.5, -0.25]
+    return model
+
+
+def test_repeated_questions_hit_memory_regardless_of_case_and_spacing(tmp_path):
+    model = _model()
+    embeddings = CachedEmbeddings(model, EmbeddingCache(str(tmp_path / "cache.db"), 16, "hf:v1"))
+
+    first = embeddings.embed_query("Aceita  convênio?")
+    assert embeddings.embed_query("aceita convênio? ") == first
+    assert model.embed_query.call_count == 1
+
+    stats = embeddings.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 0, 1)
+    assert stats["hit_ratio"] == 0.5
+    assert stats["embed_seconds_saved"] >= 0
+
+
+def test_vectors_survive_a_restart_and_are_dropped_when_the_model_changes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path, 16, "hf:v1")
+    CachedEmbeddings(_model(), cache).embed_query("qual o endereço?")
+    cache.close()
+
+    model = _model()
+    restarted = CachedEmbeddings(model, EmbeddingCache(path, 16, "hf:v1"))
+    assert restarted.embed_query("qual o endereço?") == pytest.approx([16.0, 0.5, -0.25])
+    model.embed_query.assert_not_called()
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.cache.close()
+
+    model = _model()
+    upgraded = CachedEmbeddings(model, EmbeddingCache(path, 16, "onnx:v2"))
+    upgraded.embed_query("qual o endereço?")
+    model.embed_query.assert_called_once()
+    upgraded.cache.close()
+
+
+def test_memory_layer_is_bounded_and_documents_bypass_the_cache():
+    model = _model()
+    embeddings = CachedEmbeddings(model, EmbeddingCache("", 2, "hf:v1"))
+    for text in ("a", "b", "c", "a"):
+        embeddings.embed_query(text)
+
+    assert model.embed_query.call_count == 4
+    assert embeddings.stats()["memory_entries"] == 2
+
+    embeddings.embed_documents(["a", "b"])
+    model.embed_documents.assert_called_once_with(["a", "b"])
+
+
+def test_rows_are_keyed_by_hash_and_pruned_to_max_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    clock = itertools.count(1)
+    with patch.object(embedding_cache, "_time", SimpleNamespace(time=lambda: float(next(clock)))):
+        cache = EmbeddingCache(path, 1, "hf:v1", max_rows=3)
+        for text in ("primeira", "segunda", "terceira", "quarta"):
+            cache.put(text, [1.0, 2.0])
+        assert cache.get("primeira") == [1.0, 2.0]  # disk hit, now the most recently used
+        assert cache.prune() == 1
+        assert cache.memory_size() == 1
+        cache.close()
+
+    conn = sqlite3.connect(path)
+    assert [row[1] for row in conn.execute("PRAGMA table_info(query_embedding)")] == [
+        "key_hash", "model_version", "vector", "used_at"
+    ]
+    assert conn.execute("SELECT COUNT(*) FROM query_embedding").fetchone()[0] == 3
+    conn.close()
+    assert not any(b"primeira" in f.read_bytes() for f in tmp_path.iterdir())
+
+    reopened = EmbeddingCache(path, 16, "hf:v1", max_rows=3)
+    assert reopened.get("segunda") is None
+    assert reopened.get("primeira") == reopened.get("quarta") == [1.0, 2.0]
+    reopened.close()
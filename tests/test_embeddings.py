@@ -0,0 +1,81 @@
+import math
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.infrastructure.embeddings import LazyEmbeddings, OnnxEmbeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = {"backend": "huggingface", "model_name": "all-MiniLM-L6-v2", "onnx_dir": "", "warmup": True}
+
+
+def test_backend_is_built_once_on_first_use():
+    backend = MagicMock()
+    backend.embed_query.return_value = [1.0, 0.0]
+    factory = MagicMock(return_value=backend)
+    embeddings = LazyEmbeddings(CONFIG, factory=factory)
+
+    assert not embeddings.loaded
+    factory.assert_not_called()
+
+    embeddings.warmup()
+    assert embeddings.embed_query("aceita convênio?") == [1.0, 0.0]
+    embeddings.embed_documents(["a", "b"])
+    factory.assert_called_once_with(CONFIG)
+    assert embeddings.loaded and embeddings.load_seconds is not None
+
+
+def test_importing_the_vector_store_does_not_load_torch():
+    # Fresh interpreter: this test process may already have the model loaded.
+    code = (
+        "import sys; import src.infrastructure.vector_store as vs; "
+        "assert not vs._model.loaded; "
+        "assert 'torch' not in sys.modules and 'sentence_transformers' not in sys.modules"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+
+
+def _write_tokenizer(path):
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    vocab = {"[PAD]": 0, "[UNK]": 1, "aceita": 2, "convênio": 3, "qual": 4, "endereço": 5}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(path / "tokenizer.json"))
+
+
+def test_onnx_backend_mean_pools_over_the_attention_mask_and_normalizes(tmp_path):
+    pytest.importorskip("onnxruntime")
+    _write_tokenizer(tmp_path)
+    (tmp_path / "model_quantized.onnx").write_bytes(b"")
+
+    class _Session:
+        def get_inputs(self):
+            return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+        def run(self, _outputs, feeds):
+            # Token vector = [id, 1]; padding rows carry a large value that must be ignored.
+            ids = feeds["input_ids"].astype(np.float32)
+            hidden = np.stack([ids, np.ones_like(ids)], axis=-1)
+            hidden[feeds["attention_mask"] == 0] = 100.0
+            return [hidden]
+
+    with patch("onnxruntime.InferenceSession", return_value=_Session()):
+        embeddings = OnnxEmbeddings(str(tmp_path))
+
+    short, longer = embeddings.embed_documents(["aceita", "qual endereço"])
+    assert short == pytest.approx([2 / math.sqrt(5), 1 / math.sqrt(5)])
+    assert longer == pytest.approx([4.5 / math.sqrt(21.25), 1 / math.sqrt(21.25)])
+    assert embeddings.embed_query("aceita") == pytest.approx(short)
+
+
+def test_onnx_backend_requires_an_export(tmp_path):
+    pytest.importorskip("onnxruntime")
+    with pytest.raises(FileNotFoundError, match="export_onnx_embeddings"):
+        OnnxEmbeddings(str(tmp_path))
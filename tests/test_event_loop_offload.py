@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from src.api.routes import webhooks
+from src.application.services import message_handler
+from src.application.services.inbound_queue import InboundJobQueue, InboundWorkerPool
+from src.infrastructure.executor import run_blocking
+
+MAX_LOOP_LAG_SECONDS = 0.05
+SLOW_CALL_SECONDS = 0.2
+
+
+class _LagMonitor:
+    """Ticks every few milliseconds and records how late the loop woke it up."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _tick(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, time.perf_counter() - started - self.interval)
+
+    async def __aenter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc):
+        # Let a tick that was stuck behind a blocking call report before stopping.
+        await asyncio.sleep(self.interval * 2)
+        self._task.cancel()
+
+
+def _slow(result):
+    def call(*args, **kwargs):
+        time.sleep(SLOW_CALL_SECONDS)
+        return result
+    return call
+
+
+def test_agent_pipeline_keeps_event_loop_responsive_during_blocking_calls():
+    class _Result:
+        def __init__(self, final_output):
+            self.final_output = final_output
+
+    async def _run():
+        phone = "5511900000070"
+        message_handler.state_backend.clear()
+        message_handler.conversation_state.clear()
+        runner = AsyncMock(side_effect=[
+            _Result('<function=check_availability>{"date_str": "2026-03-10"}</function>'),
+            _Result("Temos horários às 10h e 14h."),
+        ])
+        send = AsyncMock(return_value=True)
+        with patch("src.infrastructure.vector_store.get_patient_profile", _slow("Prefere manhã")), \
+             patch.dict(message_handler.TOOL_MAP, {"check_availability": _slow("10:00, 14:00")}), \
+             patch.object(message_handler.Runner, "run", runner), \
+             patch.object(message_handler, "send_message", send), \
+             patch.object(message_handler, "_try_fast_path", AsyncMock(return_value=False)):
+            async with _LagMonitor() as monitor:
+                started = time.perf_counter()
+                await message_handler.process_webhook_payload(phone, "msg-offload-1", "quero agendar uma consulta")
+                elapsed = time.perf_counter() - started
+
+        assert elapsed >= 2 * SLOW_CALL_SECONDS
+        assert monitor.max_lag < MAX_LOOP_LAG_SECONDS
+        send.assert_awaited_once_with(phone, "Temos horários às 10h e 14h.", idempotency_key="msg-offload-1:reply")
+
+    asyncio.run(_run())
+
+
+def test_inbound_workers_keep_event_loop_responsive_while_sqlite_waits_on_locks(tmp_path):
+    queue = InboundJobQueue(
+        str(tmp_path / "inbound.db"), lease_seconds=60, max_attempts=3, retry_base_seconds=0,
+        coalesce_window_seconds=0, coalesce_max_wait_seconds=0, coalesce_max_messages=10,
+    )
+    queue.enqueue("5511900000072", "msg-offload-2", "oi")
+    handled = []
+
+    def _waiting_on_lock(method):
+        def call(*args, **kwargs):
+            time.sleep(SLOW_CALL_SECONDS)
+            return method(*args, **kwargs)
+        return call
+
+    async def handler(phone, message_id, text, final_attempt):
+        handled.append(message_id)
+
+    async def _run():
+        pool = InboundWorkerPool(queue, handler, workers=2, poll_interval_seconds=0.01)
+        with patch.object(queue, "lease", _waiting_on_lock(queue.lease)), \
+             patch.object(queue, "ack", _waiting_on_lock(queue.ack)):
+            async with _LagMonitor() as monitor:
+                pool.start()
+                for _ in range(100):
+                    if queue.stats()["completed"]:
+                        break
+                    await asyncio.sleep(0.02)
+                await pool.stop()
+        return monitor.max_lag
+
+    max_lag = asyncio.run(_run())
+    assert handled == ["msg-offload-2"]
+    assert max_lag < MAX_LOOP_LAG_SECONDS
+    queue.close()
+
+
+def test_metrics_scrape_keeps_event_loop_responsive_while_stores_wait_on_locks():
+    async def _run():
+        with patch.object(webhooks.inbound_queue, "stats", _slow({"depth": 0})), \
+             patch.object(webhooks.outbound_queue, "stats", _slow({"depth": 0})), \
+             patch.object(webhooks.state_backend, "stats", _slow({"backend": "sqlite"})), \
+             patch.object(webhooks, "get_retriever", lambda: SimpleNamespace(stats=lambda: {})):
+            async with _LagMonitor() as monitor:
+                metrics = await webhooks.webhook_metrics()
+        return metrics, monitor.max_lag
+
+    metrics, max_lag = asyncio.run(_run())
+    assert metrics["queue"] == {"depth": 0}
+    assert metrics["state"] == {"backend": "sqlite"}
+    assert max_lag < MAX_LOOP_LAG_SECONDS
+
+
+def test_run_blocking_carries_context_variables_into_the_pool():
+    request_phone = contextvars.ContextVar("request_phone")
+
+    async def _run():
+        request_phone.set("5511900000071")
+        return await run_blocking(request_phone.get)
+
+    assert asyncio.run(_run()) == "5511900000071"
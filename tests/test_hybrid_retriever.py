@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.documents import Document
+
+from src.infrastructure.hybrid_retriever import BM25Index, HybridRetriever, reciprocal_rank_fusion
+from src.infrastructure.text_tokens import tokenize
+
+CHUNKS = [
+    "Atendemos os convênios Unimed, Amil e Bradesco Saúde.",
+    "A clínica fica na Rua das Flores, 120, no centro.",
+    "Funcionamos de segunda a sexta das 8h às 19h e aos sábados das 8h às 12h.",
+    "O retorno infantil é gratuito em até 45 dias após a consulta.",
+]
+
+
+def _store():
+    store = MagicMock()
+    store.get.return_value = {"documents": CHUNKS, "metadatas": [{"i": i} for i in range(len(CHUNKS))]}
+    store.similarity_search.return_value = [Document(page_content=CHUNKS[1])]
+    return store
+
+
+def test_tokens_are_accent_folded_without_stopwords_or_plurals():
+    assert tokenize("Vocês aceitam CONVÊNIOS?") == ["aceitam", "convenio"]
+
+
+def test_bm25_ranks_the_matching_chunk_first():
+    index = BM25Index([Document(page_content=text) for text in CHUNKS])
+    hits = index.search("Qual a regra do retorno infantil?", k=2)
+    assert hits[0][1].page_content == CHUNKS[3]
+    assert index.search("estacionamento", k=2) == []
+
+
+def test_confident_lexical_match_skips_dense_search():
+    store = _store()
+    retriever = HybridRetriever(lambda: store, mode="hybrid", min_score=2.0)
+
+    results = retriever.search("aceita convênio unimed?", k=2)
+
+    assert results[0].page_content == CHUNKS[0]
+    store.similarity_search.assert_not_called()
+    assert retriever.stats()["lexical_answers"] == 1
+
+
+def test_weak_lexical_match_falls_back_to_fused_dense_search():
+    store = _store()
+    retriever = HybridRetriever(lambda: store, mode="hybrid", min_score=2.0)
+
+    results = retriever.search("onde vocês ficam?", k=2)
+
+    store.similarity_search.assert_called_once_with("onde vocês ficam?", k=2)
+    assert results[0].page_content == CHUNKS[1]
+    assert retriever.stats()["dense_searches"] == 1
+
+
+def test_dense_mode_and_index_invalidation():
+    store = _store()
+    dense = HybridRetriever(lambda: store, mode="dense")
+    assert dense.search("aceita convênio?", k=1)[0].page_content == CHUNKS[1]
+    store.get.assert_not_called()
+
+    lexical = HybridRetriever(lambda: store, mode="bm25")
+    lexical.search("retorno", k=1)
+    lexical.search("sábado", k=1)
+    assert store.get.call_count == 1
+    lexical.invalidate()
+    lexical.search("retorno", k=1)
+    assert store.get.call_count == 2
+
+    with pytest.raises(ValueError, match="RETRIEVAL_MODE"):
+        HybridRetriever(lambda: store, mode="semantic")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = (Document(page_content=text) for text in "abc")
+    assert reciprocal_rank_fusion([[a, b], [b, c]], k=2) == [b, a]
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import openai
+
+from src.application.services import message_handler
+from src.application.services.inbound_queue import InboundJobQueue, InboundWorkerPool
+
+
+def _queue(path, **overrides):
+    options = {
+        "lease_seconds": 60,
+        "max_attempts": 2,
+        "retry_base_seconds": 0,
+        "coalesce_window_seconds": 0,
+        "coalesce_max_wait_seconds": 5,
+        "coalesce_max_messages": 10,
+    }
+    options.update(overrides)
+    return InboundJobQueue(str(path), **options)
+
+
+def test_lease_merges_pending_messages_of_one_phone(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    queue.enqueue("5511900000030", "m1", "oi")
+    queue.enqueue("5511900000031", "m2", "bom dia")
+    queue.enqueue("5511900000030", "m3", "queria marcar")
+
+    batch = queue.lease()
+    assert batch.phone == "5511900000030"
+    assert batch.message_ids == ["m1", "m3"]
+    assert batch.message_id == "m1"
+    assert batch.text == "oi\nqueria marcar"
+    assert queue.stats()["messages_merged"] == 1
+
+
+def test_phone_is_not_leased_twice_while_a_batch_is_in_flight(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    queue.enqueue("5511900000032", "m1", "quero remarcar")
+    first = queue.lease()
+    queue.enqueue("5511900000032", "m2", "para sexta")
+
+    assert queue.lease() is None
+    queue.ack(first)
+    assert queue.lease().message_id == "m2"
+
+
+def test_phone_waits_for_quiet_window_before_lease(tmp_path):
+    queue = _queue(tmp_path / "queue.db", coalesce_window_seconds=0.2)
+    queue.enqueue("5511900000033", "m1", "oi")
+
+    assert queue.lease() is None
+    time.sleep(0.25)
+    assert queue.lease().message_id == "m1"
+
+
+def test_failed_batch_is_retried_then_dead_lettered(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    queue.enqueue("5511900000034", "m1", "oi")
+
+    queue.nack(queue.lease(), "boom")
+    batch = queue.lease()
+    assert batch.attempts == 2
+    queue.nack(batch, "boom again")
+
+    stats = queue.stats()
+    assert queue.lease() is None
+    assert stats["dead"] == 1
+    assert stats["retried"] == 1
+
+
+def test_jobs_survive_restart_and_expired_leases_are_reclaimed(tmp_path):
+    path = tmp_path / "queue.db"
+    crashed = _queue(path, lease_seconds=0)
+    crashed.enqueue("5511900000035", "m1", "quero cancelar")
+    assert crashed.lease() is not None
+    crashed.close()
+
+    restarted = _queue(path)
+    assert restarted.stats()["expired_leases"] == 1
+    assert restarted.reclaim_expired_leases() == 1
+    assert restarted.lease().message_id == "m1"
+
+
+def test_batch_leased_again_with_an_extra_message_keeps_its_reply_key(tmp_path):
+    queue = _queue(tmp_path / "queue.db", lease_seconds=0)
+    queue.enqueue("5511900000038", "m1", "oi")
+    queue.enqueue("5511900000038", "m2", "quero remarcar")
+    first = queue.lease()
+
+    # The worker died mid-reply; the patient kept typing before the lease was reclaimed.
+    queue.enqueue("5511900000038", "m3", "para sexta")
+    assert queue.reclaim_expired_leases() == 2
+    second = queue.lease()
+
+    assert second.message_ids == ["m1", "m2", "m3"]
+    assert second.message_id == first.message_id == "m1"
+
+
+def test_worker_pool_processes_and_acks_jobs(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    handled = []
+
+    async def _handler(phone, message_id, text, final_attempt):
+        handled.append((phone, message_id, text))
+
+    async def _run():
+        pool = InboundWorkerPool(queue, _handler, workers=2, poll_interval_seconds=0.01)
+        pool.start()
+        queue.enqueue("5511900000036", "m1", "oi")
+        pool.notify()
+        await asyncio.sleep(0.1)
+        await pool.stop()
+
+    asyncio.run(_run())
+    assert handled == [("5511900000036", "m1", "oi")]
+    assert queue.stats()["depth"] == 0
+    assert queue.stats()["completed"] == 1
+
+
+def test_transient_agent_error_is_retried_by_the_pool_before_replying(tmp_path):
+    queue = _queue(tmp_path / "queue.db")
+    phone = "5511900000037"
+    outage = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+    runner = AsyncMock(side_effect=[outage, SimpleNamespace(final_output="Claro, posso ajudar.")])
+    send = AsyncMock(return_value={"queued": True})
+
+    async def _run():
+        pool = InboundWorkerPool(queue, message_handler.process_webhook_payload, workers=1, poll_interval_seconds=0.01)
+        pool.start()
+        queue.enqueue(phone, "m1", "quero agendar")
+        pool.notify()
+        for _ in range(200):
+            if queue.stats()["completed"]:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+    message_handler.state_backend.clear()
+    with patch.object(message_handler.Runner, "run", runner), \
+         patch.object(message_handler, "send_message", send), \
+         patch.object(message_handler, "_try_fast_path", AsyncMock(return_value=False)):
+        asyncio.run(_run())
+
+    assert runner.await_count == 2
+    send.assert_awaited_once_with(phone, "Claro, posso ajudar.", idempotency_key="m1:reply")
+    stats = queue.stats()
+    assert stats["retried"] == 1
+    assert stats["completed"] == 1
+    assert stats["dead"] == 0
+    assert not message_handler._has_active_handoff(phone)
+    message_handler.state_backend.clear()
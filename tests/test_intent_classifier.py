@@ -0,0 +1,178 @@
+import importlib.util
+import random
+import re
+
+import pytest
+
+from src.application.services.intent_classifier import LEXICON_TERMS, classify, classify_routing
+from src.application.services.message_handler import clean_agent_reply
+
+# --- Reference: the per-pattern cascade the classifier replaces ---
+LEGACY_INTENT_PATTERNS = {
+    "confirmar": r'\b(sim|confirmo|confirmar|confirmado|confirmei|confirma|ok)\b|✅',
+    "reagendar": r'\b(reagendar|remarcar|mudar|trocar|reagenda|transferir|adiar)\b|🔄',
+    "cancelar": r'\b(cancelar|cancela|desmarcar|cancelo|desmarco|nao vou|não vou)\b|❌|(?<![a-zA-Z])x(?![a-zA-Z])',
+    "falar_atendente": r'\b(atendente|humano|pessoa|chata|ruim|falar com alguem|valor da consulta|preço)\b'
+}
+LEGACY_INTENT_PHRASES = {
+    "confirmar": "Quero confirmar minha consulta",
+    "reagendar": "Quero reagendar minha consulta",
+    "cancelar": "Quero cancelar minha consulta",
+    "falar_atendente": "Quero falar com um atendente",
+}
+SCOPE_PATTERN = re.compile(
+    r"\b(agendar|agendamento|marcar|consulta|hor[aá]rio|servi[cç]o|reagendar|cancelar|confirmar|desmarcar)\b"
+)
+DATE_SELECTION_PATTERN = re.compile(r"^(dia\s*)?\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\s*$", re.IGNORECASE)
+TIME_SELECTION_PATTERN = re.compile(r"^(a[sà]s?\s*)?\d{1,2}(:|h)\d{2}\s*$", re.IGNORECASE)
+GREETING_PATTERN = re.compile(r"^(oi|ol[áa]|bom dia|boa tarde|boa noite)\b")
+HUMAN_REQUEST_PATTERN = re.compile(r"\b(atendente|humano|pessoa|recepcionista)\b")
+FINANCIAL_PATTERN = re.compile(r"\b(valor|pre[cç]o|financeiro|pagamento|cobran[cç]a|or[cç]amento)\b")
+COMPLAINT_PATTERN = re.compile(r"\b(reclama[cç][aã]o|reclamar|insatisfeit|ruim|péssimo|horr[ií]vel)\b")
+URGENCY_PATTERN = re.compile(r"\b(urg[êe]ncia|urgente|emerg[êe]ncia|dor forte|sangramento)\b")
+
+
+def legacy_preprocess_intent(text):
+    normalized = text.strip().lower().replace("\ufe0f", "").replace("\u200d", "")
+    for intent, pattern in LEGACY_INTENT_PATTERNS.items():
+        if re.search(pattern, normalized):
+            return LEGACY_INTENT_PHRASES[intent]
+    return text
+
+
+def legacy_detect_handoff_reason(text):
+    normalized = (text or "").strip().lower()
+    if HUMAN_REQUEST_PATTERN.search(normalized):
+        return "Pedido explícito de atendente."
+    if URGENCY_PATTERN.search(normalized):
+        return "Mensagem com indício de urgência."
+    if FINANCIAL_PATTERN.search(normalized):
+        return "Dúvida financeira ou de preço."
+    if COMPLAINT_PATTERN.search(normalized):
+        return "Reclamação/insatisfação."
+    return None
+
+
+def legacy_is_in_supported_scope(text):
+    normalized = (text or "").strip().lower()
+    if GREETING_PATTERN.search(normalized):
+        return True
+    if DATE_SELECTION_PATTERN.match(normalized) or TIME_SELECTION_PATTERN.match(normalized):
+        return True
+    return bool(SCOPE_PATTERN.search(normalized))
+
+
+def legacy_route(text):
+    agent_text = legacy_preprocess_intent(text)
+    return agent_text, legacy_detect_handoff_reason(agent_text), legacy_is_in_supported_scope(agent_text)
+
+
+def legacy_clean_reply(reply_text):
+    reply_text = re.sub(r'<thought>.*?</thought>', '', reply_text, flags=re.DOTALL)
+    reply_text = re.sub(r'\[TOOL_CALL\]|\[SYSTEM\]|\[FUNCTION\]', '', reply_text)
+    reply_text = re.sub(r'Telefone do paciente:\s*\S+', '', reply_text)
+    reply_text = re.sub(r'<function=.*?>.*?</function>', '', reply_text, flags=re.DOTALL)
+    reply_text = re.sub(r'^\(SYSTEM:.*?\)$', '', reply_text, flags=re.DOTALL)
+    return reply_text.strip()
+
+
+# Messages from scripts/test_intents.py and the webhook tests.
+FIXTURE_MESSAGES = [
+    "Sim", "ok", "reagendar", "cancela", "x", "❌", "Ahhh pra lá cora chata", "Quero falar com um humano",
+    "Qual o valor da consulta?", "bom dia", "quero marcar uma limpeza", "Quero confirmar minha consulta",
+    "Boa tarde", "Me manda uma foto", "Quero agendar uma consulta", "dia 5/3", "15:15",
+    "Quero verificar minha consulta de amanhã", "Qual o preço da consulta?", "Vocês vendem escova?",
+    "Também queria saber sobre produtos.",
+]
+EXTRA_MESSAGES = [
+    "✅️", "👍", "2x", "xampu", "X", "não vou poder ir", "Nao vou", "valor da consultas", "olá, tudo bem?",
+    "Olá", "oi sumida", "boi", "às 14h30", "as 9h00", "dia 12/10/2025", "12-10", "tenho dor forte no dente",
+    "URGENTE!!", "estou insatisfeita", "insatisfeit", "péssimo atendimento", "quero um orçamento",
+    "horario disponível?", "qual horário tem?", "posso mudar o serviço?", "preco", "oi\u200dx", "   ",
+    "recepcionista por favor", "emergência", "sangramento na gengiva", "Boa noite! Queria desmarcar",
+]
+
+
+def _corpus(size, seed=7):
+    rng = random.Random(seed)
+    words = [t for terms in LEXICON_TERMS.values() for t in terms] + [
+        "quero", "minha", "amanhã", "por favor", "obrigado", "dente", "2x", "oi", "12/03", "15h30", "?", "!",
+        "\ufe0f", "\u200d", "Olá", "SIM", "Preço", "consultas", "valor da", "boa", "tarde", "escova",
+    ]
+    messages = list(FIXTURE_MESSAGES + EXTRA_MESSAGES)
+    while len(messages) < size:
+        picked = [rng.choice(words) for _ in range(rng.randint(1, 8))]
+        messages.append(rng.choice([" ", "  ", ", "]).join(picked))
+    return messages[:size]
+
+
+FILLER_WORDS = (
+    "eu queria saber se vocês tem disponibilidade para semana que vem meu filho precisa de um "
+    "retorno com a doutora obrigado pela atenção bom tarde amanhã depois do almoço pode ser "
+    "na quinta ou sexta de manhã desculpa a demora respondi agora estou no trabalho tudo certo "
+    "entendi perfeito qualquer coisa aviso aqui mesmo"
+).split()
+
+
+def _natural_corpus(size, seed=11):
+    """Mostly ordinary words with an occasional keyword, like real patient messages."""
+    rng = random.Random(seed)
+    keywords = [t for terms in LEXICON_TERMS.values() for t in terms]
+    messages = []
+    for _ in range(size):
+        picked = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(3, 16))]
+        if rng.random() < 0.3:
+            picked.insert(rng.randrange(len(picked) + 1), rng.choice(keywords))
+        messages.append(" ".join(picked).capitalize() + rng.choice(["", ".", "?", "!"]))
+    return messages
+
+
+@pytest.mark.parametrize("message", FIXTURE_MESSAGES + EXTRA_MESSAGES)
+def test_fixture_messages_route_like_the_pattern_cascade(message):
+    decision = classify(message)
+    assert (decision.text, decision.handoff_reason, decision.in_scope) == legacy_route(message)
+
+
+def test_random_corpus_routes_like_the_pattern_cascade():
+    for message in _corpus(20_000) + _natural_corpus(5_000):
+        decision = classify(message)
+        assert (decision.text, decision.handoff_reason, decision.in_scope) == legacy_route(message), message
+        routing = classify_routing(message)
+        assert routing.handoff_reason == legacy_detect_handoff_reason(message), message
+        assert routing.in_scope == legacy_is_in_supported_scope(message), message
+
+
+@pytest.mark.parametrize("reply", [
+    "Claro! Sua consulta está confirmada.",
+    "<thought>checar agenda</thought>Tenho horário às 14h.",
+    "[SYSTEM] Agendado. Telefone do paciente: 5511999999999 até logo",
+    '<function=check_availability>{"date": "2026-01-01"}</function> Um momento.',
+    "(SYSTEM: tool output)\n",
+    "(SYSTEM: a) e (SYSTEM: b)",
+    "Texto com [TOOL_CALL] e [FUNCTION] no meio",
+])
+def test_reply_cleanup_matches_sequential_substitutions(reply):
+    assert clean_agent_reply(reply) == legacy_clean_reply(reply)
+
+
+benchmark_installed = pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None, reason="pytest-benchmark not installed"
+)
+BENCH_CORPUS_SIZE = 100_000
+
+
+@pytest.fixture(scope="module")
+def bench_corpus():
+    return _natural_corpus(BENCH_CORPUS_SIZE)
+
+
+@benchmark_installed
+def test_benchmark_pattern_cascade(benchmark, bench_corpus):
+    benchmark.group = "route 100k messages"
+    benchmark.pedantic(lambda: [legacy_route(m) for m in bench_corpus], rounds=3, iterations=1)
+
+
+@benchmark_installed
+def test_benchmark_single_pass_classifier(benchmark, bench_corpus):
+    benchmark.group = "route 100k messages"
+    benchmark.pedantic(lambda: [classify(m) for m in bench_corpus], rounds=3, iterations=1)
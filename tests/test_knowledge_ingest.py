@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.infrastructure import knowledge_ingest
+from src.infrastructure.knowledge_ingest import find_sources, sync_sources
+from src.infrastructure.vector_store import ChromaRegistry
+
+
+class _CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def store(tmp_path):
+    embeddings = _CountingEmbeddings()
+    registry = ChromaRegistry(str(tmp_path / "chroma"), embedding_function=embeddings)
+    with patch.object(knowledge_ingest, "chroma_registry", registry):
+        yield registry.store("clinic_knowledge"), embeddings
+    registry.close()
+
+
+def _write(path, sections):
+    path.write_text("\n\n".join(f"## {title}\n{body}" for title, body in sections), encoding="utf-8")
+
+
+def test_reruns_skip_unchanged_chunks_and_drop_removed_ones(tmp_path, store):
+    chroma, embeddings = store
+    docs = tmp_path / "kb"
+    (docs / "sub").mkdir(parents=True)
+    faq = docs / "FAQ.md"
+    sections = [(f"Pergunta {i}", f"Resposta número {i}. " * 20) for i in range(6)]
+    _write(faq, sections)
+    (docs / "sub" / "horario.txt").write_text("Funcionamos das 8h às 19h.", encoding="utf-8")
+    (docs / "ignore.json").write_text("{}", encoding="utf-8")
+
+    sources = find_sources([str(docs)])
+    assert [s.rsplit("/", 1)[-1] for s in sources] == ["FAQ.md", "horario.txt"]
+
+    first = sync_sources(sources, "clinic_knowledge", batch_size=2)
+    total = len(chroma.get()["ids"])
+    assert first.added == total and first.removed == 0
+    assert max(embeddings.batches) <= 2
+
+    embeddings.batches.clear()
+    with patch.object(knowledge_ingest, "split_source", side_effect=AssertionError("re-split")):
+        again = sync_sources(sources, "clinic_knowledge", batch_size=2)
+    assert (again.added, again.removed, again.unchanged) == (0, 0, total)
+    assert embeddings.batches == []
+
+    _write(faq, sections[:4] + [("Pergunta 5", "Resposta nova.")])
+    edited = sync_sources(sources, "clinic_knowledge", batch_size=2)
+    assert edited.added == 1 and edited.removed >= 2
+    assert embeddings.batches == [1]
+    assert len(chroma.get()["ids"]) == total + edited.added - edited.removed
+
+    unchanged = sync_sources(sources, "clinic_knowledge", batch_size=2)
+    assert unchanged.added == unchanged.removed == 0
+
+
+def test_chunks_of_deleted_files_are_pruned_only_under_the_given_dirs(tmp_path, store):
+    chroma, _ = store
+    docs = tmp_path / "kb"
+    docs.mkdir()
+    (docs / "precos.md").write_text("## Preços\nConsulta R$ 200.", encoding="utf-8")
+    (docs / "convenios.md").write_text("## Convênios\nAceitamos Amil.", encoding="utf-8")
+    elsewhere = tmp_path / "avulso.md"
+    elsewhere.write_text("## Estacionamento\nTemos vagas.", encoding="utf-8")
+    sync_sources(find_sources([str(docs), str(elsewhere)]), "clinic_knowledge", prune_dirs=[str(docs)])
+
+    (docs / "precos.md").unlink()
+    result = sync_sources(find_sources([str(docs)]), "clinic_knowledge", prune_dirs=[str(docs)])
+
+    remaining = {m["source"].rsplit("/", 1)[-1] for m in chroma.get(include=["metadatas"])["metadatas"]}
+    assert remaining == {"convenios.md", "avulso.md"}
+    assert (result.added, result.removed) == (0, 1)
+
+
+def test_edited_files_keep_unchanged_chunks_with_the_new_hash(tmp_path, store):
+    chroma, embeddings = store
+    faq = tmp_path / "FAQ.md"
+    _write(faq, [("Horário", "Das 8h às 19h."), ("Endereço", "Rua A, 10.")])
+    sync_sources([str(faq)], "clinic_knowledge", chunk_size=30, chunk_overlap=0)
+    _write(faq, [("Horário", "Das 8h às 19h."), ("Endereço", "Rua B, 20.")])
+    embeddings.batches.clear()
+
+    result = sync_sources([str(faq)], "clinic_knowledge", chunk_size=30, chunk_overlap=0)
+
+    hashes = {m["source_hash"] for m in chroma.get(include=["metadatas"])["metadatas"]}
+    assert hashes == {knowledge_ingest._sha256(faq.read_text(encoding="utf-8"))}
+    assert (result.unchanged, result.added, result.removed) == (1, 1, 1)
+    assert embeddings.batches == [1]
+
+
+def test_missing_source_is_reported():
+    with pytest.raises(FileNotFoundError, match="not found"):
+        find_sources(["/nonexistent/FAQ.md"])
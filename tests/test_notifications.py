@@ -49,8 +49,8 @@ def test_scheduler_threshold_logic():
             session.refresh(appt_24h)
             session.refresh(appt_3h)
 
-        # Mock send_message to return success
-        mock_res = {"success": True, "status_code": 200, "error_message": None}
+        # Mock send_message to accept the reminder into the outbound queue
+        mock_res = {"success": True, "status_code": 202, "error_message": None, "queued": True, "outbound_id": 1}
         with patch("src.application.scheduler.send_message", new_callable=AsyncMock) as mock_send:
             mock_send.return_value = mock_res
             
@@ -69,8 +69,9 @@ def test_scheduler_threshold_logic():
             
             logs = session.exec(select(NotificationLog)).all()
             assert len(logs) == 2
-            assert any(l.notification_type == "24h" and l.status == "sent" for l in logs)
-            assert any(l.notification_type == "3h" and l.status == "sent" for l in logs)
+            # Delivery (sent/retrying/failed) is recorded later by the outbound senders.
+            assert any(l.notification_type == "24h" and l.status == "queued" for l in logs)
+            assert any(l.notification_type == "3h" and l.status == "queued" for l in logs)
 
     asyncio.run(_run())
 
@@ -94,7 +95,7 @@ def test_late_booking_protection():
             session.refresh(appt)
 
         with patch("src.application.scheduler.send_message", new_callable=AsyncMock) as mock_send:
-            mock_send.return_value = {"success": True, "status_code": 200, "error_message": None}
+            mock_send.return_value = {"success": True, "status_code": 202, "error_message": None, "queued": True, "outbound_id": 1}
             
             await check_and_send_reminders()
             
@@ -112,36 +113,94 @@ def test_late_booking_protection():
     asyncio.run(_run())
 
 
-def test_notification_failure_logging():
-    """Test that Z-API failures are logged but flags are not set to True."""
+def test_notification_failure_logging(tmp_path):
+    """Test that a Z-API rejection reaches the reminder's log through the outbound senders."""
+    from src.application import scheduler
+    from src.application.services import outbound_queue as outbound
+
+    queue = outbound.OutboundMessageQueue(
+        str(tmp_path / "outbound.db"), rate_per_second=1000, burst=1000, lease_seconds=60,
+        max_attempts=3, retry_base_seconds=0.01, retry_max_seconds=0.05,
+    )
+    with Session(engine) as session:
+        patient = Patient(name="Fail Patient", phone="5511000000001")
+        session.add(patient)
+        session.commit()
+
+        appt = Appointment(
+            patient_id=patient.id,
+            datetime=_now_br_naive() + timedelta(hours=24),
+            service="Clínica Geral",
+            status="confirmed"
+        )
+        session.add(appt)
+        session.commit()
+        session.refresh(appt)
+
+    mock_fail = AsyncMock(return_value={"success": False, "status_code": 400, "error_message": "Invalid number"})
+
     async def _run():
-        with Session(engine) as session:
-            patient = Patient(name="Fail Patient", phone="5511000000001")
-            session.add(patient)
-            session.commit()
-            
-            appt = Appointment(
-                patient_id=patient.id,
-                datetime=_now_br_naive() + timedelta(hours=24),
-                service="Clínica Geral",
-                status="confirmed"
-            )
-            session.add(appt)
-            session.commit()
-            session.refresh(appt)
+        await check_and_send_reminders()
+        sender = outbound.OutboundSender(
+            queue, mock_fail, workers=1, poll_interval_seconds=0.01, on_status=outbound.update_notification_log,
+        )
+        sender.start()
+        for _ in range(200):
+            if queue.stats()["dead"]:
+                break
+            await asyncio.sleep(0.01)
+        await sender.stop()
 
-        mock_fail = {"success": False, "status_code": 400, "error_message": "Invalid number"}
-        with patch("src.application.scheduler.send_message", new_callable=AsyncMock) as mock_send:
-            mock_send.return_value = mock_fail
-            
-            await check_and_send_reminders()
-            
+    with patch.object(scheduler, "outbound_queue", queue), patch.object(outbound, "outbound_queue", queue):
+        asyncio.run(_run())
+
+    with Session(engine) as session:
+        a = session.get(Appointment, appt.id)
+        assert a.notified_24h is True # Queued once; delivery is the senders' job from here
+
+        log = session.exec(select(NotificationLog).where(NotificationLog.appointment_id == appt.id)).first()
+        assert log.status == "failed"
+        assert "Invalid number" in log.error_message
+    mock_fail.assert_awaited_once()
+    queue.close()
+
+
+def test_restart_before_flag_commit_does_not_resend_reminder(tmp_path):
+    """A reminder already queued under its idempotency key is not queued twice."""
+    from src.application import scheduler
+    from src.application.services import outbound_queue as outbound
+
+    queue = outbound.OutboundMessageQueue(
+        str(tmp_path / "outbound.db"), rate_per_second=1000, burst=1000, lease_seconds=60,
+        max_attempts=3, retry_base_seconds=0.01, retry_max_seconds=0.05,
+    )
+    with Session(engine) as session:
+        patient = Patient(name="Restart Patient", phone="5511988887777")
+        session.add(patient)
+        session.commit()
+        appt = Appointment(
+            patient_id=patient.id, datetime=_now_br_naive() + timedelta(hours=23),
+            service="Clínica Geral", status="scheduled",
+        )
+        session.add(appt)
+        session.commit()
+        appt_id = appt.id
+
+    with patch.object(scheduler, "outbound_queue", queue), patch.object(outbound, "outbound_queue", queue):
+        asyncio.run(check_and_send_reminders())
+        # Crash after queueing, before notified_24h was committed.
         with Session(engine) as session:
-            a = session.get(Appointment, appt.id)
-            assert a.notified_24h is False # Remains False to retry later if it was 5xx, or just stay False if 4xx
-            
-            log = session.exec(select(NotificationLog).where(NotificationLog.appointment_id == appt.id)).first()
-            assert log.status == "failed"
-            assert log.error_message == "Invalid number"
+            stored = session.get(Appointment, appt_id)
+            stored.notified_24h = False
+            session.add(stored)
+            session.commit()
+        asyncio.run(check_and_send_reminders())
 
-    asyncio.run(_run())
+    with Session(engine) as session:
+        assert session.get(Appointment, appt_id).notified_24h is True
+        logs = session.exec(select(NotificationLog).where(NotificationLog.appointment_id == appt_id)).all()
+    assert len(logs) == 1
+    assert queue.stats()["enqueued"] == 1
+    message, _ = queue.lease()
+    assert message.idempotency_key == scheduler.reminder_key(appt, "24h")
+    queue.close()
@@ -0,0 +1,261 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from sqlmodel import Session
+
+from src.application.services import outbound_queue as outbound
+from src.application.services.outbound_queue import OutboundMessageQueue, OutboundSender
+from src.domain.models import Appointment, NotificationLog, Patient
+from src.infrastructure.database import engine
+
+
+def _queue(tmp_path, **overrides):
+    config = dict(
+        rate_per_second=1000, burst=1000, lease_seconds=60, max_attempts=3,
+        retry_base_seconds=0.01, retry_max_seconds=0.05,
+    )
+    config.update(overrides)
+    return OutboundMessageQueue(str(tmp_path / "outbound.db"), **config)
+
+
+def test_messages_of_one_phone_go_out_strictly_in_order(tmp_path):
+    queue = _queue(tmp_path)
+    first = queue.enqueue("5511900000001", "primeira")
+    queue.enqueue("5511900000001", "segunda")
+    other = queue.enqueue("5511900000002", "outro paciente")
+
+    leased, _ = queue.lease()
+    assert leased.id == first
+    blocked, _ = queue.lease()
+    assert blocked.id == other
+    assert queue.lease() == (None, 0.0)
+
+    assert queue.nack(leased, "Z-API Server Error 503") == outbound.RETRYING
+    assert queue.lease() == (None, 0.0)
+    asyncio.run(asyncio.sleep(0.03))
+    retried, _ = queue.lease()
+    assert (retried.id, retried.attempts) == (first, 2)
+    queue.ack(retried)
+    assert queue.lease()[0].text == "segunda"
+    queue.close()
+
+
+def test_send_budget_is_shared_through_the_queue_file(tmp_path):
+    queue = _queue(tmp_path, rate_per_second=1, burst=2)
+    other_process = _queue(tmp_path, rate_per_second=1, burst=2)
+    for i in range(3):
+        queue.enqueue(f"55119000000{i:02d}", "lembrete")
+
+    assert queue.lease()[0] is not None
+    assert other_process.lease()[0] is not None
+    message, wait = queue.lease()
+    assert message is None and 0 < wait <= 1
+    assert queue.stats()["rate_limited"] == 1
+    queue.close()
+    other_process.close()
+
+
+def test_permanent_and_exhausted_failures_are_dead_lettered(tmp_path):
+    queue = _queue(tmp_path, max_attempts=1)
+    queue.enqueue("5511900000001", "número inválido", notification_log_id=7)
+    queue.enqueue("5511900000002", "instável")
+
+    invalid, _ = queue.lease()
+    assert queue.nack(invalid, "Z-API Client Error 400", permanent=True) == outbound.FAILED
+    flaky, _ = queue.lease()
+    assert queue.nack(flaky, "Z-API Server Error 500") == outbound.FAILED
+
+    dead = queue.dead_letters()
+    assert {d["phone"] for d in dead} == {"5511900000001", "5511900000002"}
+    assert next(d for d in dead if d["phone"] == "5511900000001")["notification_log_id"] == 7
+    stats = queue.stats()
+    assert (stats["depth"], stats["dead"], stats["dead_lettered"]) == (0, 2, 2)
+    queue.close()
+
+
+def test_sender_retries_off_the_hot_path_and_reports_each_outcome(tmp_path):
+    queue = _queue(tmp_path)
+    send = AsyncMock(side_effect=[
+        {"success": False, "status_code": 500, "error_message": "Z-API Server Error 500"},
+        {"success": True, "status_code": 200, "error_message": None},
+        {"success": False, "status_code": 400, "error_message": "Z-API Client Error 400"},
+    ])
+    outcomes = []
+
+    async def on_status(message, status, error):
+        outcomes.append((message.text, status, message.attempts))
+
+    async def _run():
+        sender = OutboundSender(queue, send, workers=2, poll_interval_seconds=0.01, on_status=on_status)
+        sender.start()
+        queue.enqueue("5511900000001", "Olá")
+        queue.enqueue("5511900000001", "Tudo bem?")
+        sender.notify()
+        for _ in range(200):
+            if len(outcomes) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await sender.stop()
+
+    asyncio.run(_run())
+    assert outcomes == [("Olá", "retrying", 1), ("Olá", "sent", 2), ("Tudo bem?", "failed", 1)]
+    assert [call.args for call in send.await_args_list] == [
+        ("5511900000001", "Olá"), ("5511900000001", "Olá"), ("5511900000001", "Tudo bem?"),
+    ]
+    queue.close()
+
+
+def test_delivery_outcome_is_written_to_the_notification_log():
+    with Session(engine) as session:
+        patient = Patient(name="Outbound Patient", phone="5511900000077")
+        session.add(patient)
+        session.commit()
+        appointment = Appointment(
+            patient_id=patient.id, datetime=datetime(2030, 1, 1, 9), service="Clínica Geral", status="scheduled",
+        )
+        session.add(appointment)
+        session.commit()
+        log = NotificationLog(appointment_id=appointment.id, notification_type="24h", status="queued")
+        session.add(log)
+        session.commit()
+        ids = (patient.id, appointment.id, log.id)
+
+    message = outbound.OutboundMessage(1, "5511900000077", "lembrete", ids[2], attempts=2)
+    asyncio.run(outbound.update_notification_log(message, outbound.SENT, None))
+    with Session(engine) as session:
+        stored = session.get(NotificationLog, ids[2])
+        assert (stored.status, stored.attempt_count) == ("sent", 2)
+
+    asyncio.run(outbound.update_notification_log(message, outbound.FAILED, "Z-API Client Error 400"))
+    with Session(engine) as session:
+        stored = session.get(NotificationLog, ids[2])
+        assert stored.status == "failed"
+        assert stored.error_message.startswith("Dead-lettered after 2 attempt(s)")
+        session.delete(stored)
+        session.delete(session.get(Appointment, ids[1]))
+        session.delete(session.get(Patient, ids[0]))
+        session.commit()
+
+
+def test_idempotency_key_suppresses_resends_until_dead_lettered(tmp_path):
+    queue = _queue(tmp_path, max_attempts=1)
+    first = queue.enqueue("5511900000001", "lembrete", idempotency_key="42:202601010900:24h")
+    assert queue.enqueue("5511900000001", "lembrete", idempotency_key="42:202601010900:24h") is None
+
+    message, _ = queue.lease()
+    assert (message.id, message.idempotency_key) == (first, "42:202601010900:24h")
+    assert queue.key_status("42:202601010900:24h") == outbound.SENDING
+    queue.ack(message)
+    assert queue.key_status("42:202601010900:24h") == outbound.SENT
+    assert queue.enqueue("5511900000001", "lembrete", idempotency_key="42:202601010900:24h") is None
+
+    queue.enqueue("5511900000002", "inválido", idempotency_key="43:202601010900:24h")
+    queue.nack(queue.lease()[0], "Z-API Client Error 400", permanent=True)
+    assert queue.key_status("43:202601010900:24h") == outbound.FAILED
+    assert queue.enqueue("5511900000002", "corrigido", idempotency_key="43:202601010900:24h") is not None
+    assert queue.stats()["suppressed"] == 2
+    queue.close()
+
+
+def test_send_interrupted_mid_flight_is_held_for_reconciliation(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0)
+    queue.enqueue("5511900000001", "resposta", idempotency_key="msg-1:reply")
+    queue.enqueue("5511900000001", "próxima", idempotency_key="msg-2:reply")
+    queue.enqueue("5511900000003", "sem chave")
+    crashed = [queue.lease()[0], queue.lease()[0]]
+    assert {m.text for m in crashed} == {"resposta", "sem chave"}
+
+    assert queue.reclaim_expired_leases() == 2
+    assert [d["idempotency_key"] for d in queue.in_doubt()] == ["msg-1:reply"]
+    assert queue.stats()["in_doubt"] == 1
+    # The unkeyed message is retried; the phone's next message is not held back.
+    assert {queue.lease()[0].text, queue.lease()[0].text} == {"sem chave", "próxima"}
+
+    assert queue.reconcile("msg-2:reply", delivered=True) is None
+    settled = queue.reconcile("msg-1:reply", delivered=True)
+    assert settled.text == "resposta" and queue.key_status("msg-1:reply") == outbound.SENT
+    assert queue.in_doubt() == []
+    queue.close()
+
+
+def test_requeued_in_doubt_send_follows_replies_that_overtook_it(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0, key_retention_seconds=0)
+    queue.enqueue("5511900000001", "primeira", idempotency_key="msg-1:reply")
+    queue.enqueue("5511900000001", "segunda", idempotency_key="msg-2:reply")
+    queue.lease()
+    queue.reclaim_expired_leases()
+    # The phone is not stalled behind the held send.
+    queue.ack(queue.lease()[0])
+    queue.enqueue("5511900000001", "terceira", idempotency_key="msg-3:reply")
+
+    # Pruning never drops a key that is still in doubt, however old.
+    assert queue.prune_keys() == 1
+    assert queue.key_status("msg-1:reply") == outbound.IN_DOUBT
+    assert queue.enqueue("5511900000001", "primeira", idempotency_key="msg-1:reply") is None
+
+    # Ordering is given up for the requeued send: it goes out after "segunda",
+    # which was already delivered, but still ahead of the queued "terceira".
+    queue.reconcile("msg-1:reply", delivered=False)
+    assert queue.lease()[0].text == "primeira"
+    assert queue.lease() == (None, 0.0)
+    queue.close()
+
+
+def test_sender_holds_a_keyed_send_whose_answer_was_lost(tmp_path):
+    queue = _queue(tmp_path)
+    send = AsyncMock(return_value={
+        "success": False, "status_code": 504, "error_message": "ReadTimeout", "in_doubt": True,
+    })
+    outcomes = []
+
+    async def on_status(message, status, error):
+        outcomes.append((message.text, status))
+
+    async def _run():
+        sender = OutboundSender(queue, send, workers=1, poll_interval_seconds=0.01, on_status=on_status)
+        sender.start()
+        queue.enqueue("5511900000001", "resposta", idempotency_key="msg-1:reply")
+        sender.notify()
+        for _ in range(200):
+            if outcomes:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        await sender.stop()
+
+    asyncio.run(_run())
+    assert outcomes == [("resposta", outbound.IN_DOUBT)]
+    assert send.await_count == 1
+    assert queue.reconcile("msg-1:reply", delivered=False).attempts == 0
+    retried = queue.lease()[0]
+    assert (retried.text, retried.attempts) == ("resposta", 1)
+    queue.close()
+
+
+def test_sender_holds_a_keyed_send_that_raises_and_retries_an_unkeyed_one(tmp_path):
+    queue = _queue(tmp_path)
+    send = AsyncMock(side_effect=ValueError("response body is not JSON"))
+    outcomes = []
+
+    async def on_status(message, status, error):
+        outcomes.append((message.text, status))
+
+    async def _run():
+        sender = OutboundSender(queue, send, workers=1, poll_interval_seconds=0.01, on_status=on_status)
+        sender.start()
+        queue.enqueue("5511900000001", "resposta", idempotency_key="msg-1:reply")
+        queue.enqueue("5511900000002", "sem chave")
+        sender.notify()
+        for _ in range(200):
+            if len(outcomes) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await sender.stop()
+
+    asyncio.run(_run())
+    assert [status for text, status in outcomes if text == "resposta"] == [outbound.IN_DOUBT]
+    assert ("sem chave", outbound.RETRYING) in outcomes
+    assert [call.args[1] for call in send.await_args_list].count("resposta") == 1
+    assert [d["idempotency_key"] for d in queue.in_doubt()] == ["msg-1:reply"]
+    queue.close()
@@ -0,0 +1,34 @@
+from unittest.mock import MagicMock
+
+from src.infrastructure.preference_store import PreferenceStore, migrate_from_collection
+
+
+def test_near_duplicates_are_dropped_and_each_phone_is_capped(tmp_path):
+    store = PreferenceStore(str(tmp_path / "prefs.db"), max_per_phone=3, duplicate_threshold=0.8)
+
+    assert store.add("5511900000001", "Prefere horários pela manhã.")
+    assert not store.add("5511900000001", "prefere horario pela manha")
+    assert store.add("5511900000002", "Prefere horários pela manhã.")
+    for text in ("Prefere a Dra. Ana", "Tem alergia a dipirona", "Avaliou o atendimento com nota 5"):
+        assert store.add("5511900000001", text)
+
+    assert store.list("5511900000001") == [
+        "Prefere a Dra. Ana", "Tem alergia a dipirona", "Avaliou o atendimento com nota 5",
+    ]
+    assert store.list("5511900000003") == []
+    assert store.stats() == {"phones": 2, "preferences": 4, "added": 5, "duplicates": 1}
+    store.close()
+
+
+def test_collection_migration_is_idempotent(tmp_path):
+    collection = MagicMock()
+    collection.get.return_value = {
+        "documents": ["Prefere sábado", "Prefere sábado", "Sem telefone", "Paga no Pix"],
+        "metadatas": [{"phone": "5511900000001"}, {"phone": "5511900000001"}, {}, {"phone": 5511900000002}],
+    }
+    store = PreferenceStore(str(tmp_path / "prefs.db"))
+
+    assert migrate_from_collection(collection, store) == (2, 2)
+    assert migrate_from_collection(collection, store) == (0, 4)
+    assert store.list("5511900000002") == ["Paga no Pix"]
+    store.close()
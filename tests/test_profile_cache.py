@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock, patch
+
+from src.infrastructure import vector_store
+from src.infrastructure.preference_store import PreferenceStore
+from src.infrastructure.profile_cache import ProfileCache
+
+
+def test_entries_expire_and_oldest_are_evicted():
+    cache = ProfileCache(ttl_seconds=10, max_entries=2)
+    cache.put("a", "perfil a", now=0.0)
+    cache.put("b", "", now=0.0)
+
+    assert cache.get("a", now=5.0) == "perfil a"
+    assert cache.get("b", now=5.0) == ""
+    assert cache.get("a", now=10.0) is None
+
+    cache.put("c", "perfil c", now=11.0)
+    cache.put("d", "perfil d", now=11.0)
+    assert cache.get("b", now=11.0) is None
+    assert cache.stats() == {
+        "entries": 2, "hits": 2, "misses": 2, "hit_rate": 0.5, "invalidations": 0, "evictions": 1,
+    }
+
+
+def test_repeated_turns_skip_the_preference_store_until_a_preference_is_added(tmp_path):
+    store = MagicMock(wraps=PreferenceStore(str(tmp_path / "prefs.db")))
+    store.add("5511900000080", "Prefere horários pela manhã")
+    vector_store.profile_cache.clear()
+
+    with patch.object(vector_store, "preference_store", store):
+        first = vector_store.get_patient_profile("5511900000080")
+        assert vector_store.get_patient_profile("5511900000080") == first
+        assert store.list.call_count == 1
+
+        vector_store.add_patient_preference("5511900000080", "Prefere a Dra. Ana")
+        second = vector_store.get_patient_profile("5511900000080")
+        assert store.list.call_count == 2
+
+    assert first == "Preferências do Paciente:\n- Prefere horários pela manhã"
+    assert second.endswith("- Prefere a Dra. Ana")
+    stats = vector_store.profile_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+    vector_store.profile_cache.clear()
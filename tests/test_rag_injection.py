@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.application import agent as agent_module
+from src.application.services import context_injection, message_handler
+from src.application.services.context_injection import RagRunContext
+
+
+def test_instructions_search_once_per_run_across_model_turns():
+    async def _run():
+        search = MagicMock(return_value="- Aceitamos o convênio Amil.")
+        run_context = RagRunContext("vocês aceitam amil?")
+        with patch.object(context_injection, "get_dynamic_context_for_query", search):
+            prompts = [
+                await agent_module._build_instructions(SimpleNamespace(context=run_context), agent_module.agent)
+                for _ in range(8)
+            ]
+
+        search.assert_called_once_with("vocês aceitam amil?")
+        assert all("Aceitamos o convênio Amil." in prompt for prompt in prompts)
+        assert (run_context.searches, run_context.avoided_searches) == (1, 7)
+
+    asyncio.run(_run())
+
+
+class _Result:
+    final_output = "Certo."
+
+
+def _process(text, enabled=True, fail=False):
+    contexts = []
+
+    async def fake_run(agent, *, input, session, max_turns, context):
+        contexts.append(context)
+        await agent_module._build_instructions(SimpleNamespace(context=context), agent)
+        if fail:
+            raise RuntimeError("model unavailable")
+        return _Result()
+
+    async def _run():
+        message_handler.state_backend.clear()
+        message_handler.conversation_state.clear()
+        with patch.object(message_handler.Runner, "run", fake_run), \
+             patch.object(message_handler, "RAG_INJECTION_ENABLED", enabled), \
+             patch.object(message_handler, "send_message", AsyncMock(return_value=True)), \
+             patch.object(message_handler, "_try_fast_path", AsyncMock(return_value=False)), \
+             patch("src.infrastructure.vector_store.get_patient_profile", return_value=""), \
+             patch.object(context_injection, "search_store", return_value=[]) as search:
+            await message_handler.process_webhook_payload("5511900000090", f"msg-rag-{text}", text)
+        return contexts[0], search.call_count
+
+    return asyncio.run(_run())
+
+
+def test_recognized_intents_and_date_time_replies_skip_the_search():
+    for text in ("sim", "14:30", "dia 12/03"):
+        run_context, searches = _process(text)
+        assert run_context.skip and searches == 0, text
+
+    run_context, searches = _process("quero agendar uma consulta de ortodontia")
+    assert not run_context.skip and searches == 1
+
+
+def test_injection_is_off_unless_enabled():
+    run_context, searches = _process("quero agendar uma consulta de ortodontia", enabled=False)
+    assert run_context.skip and searches == 0
+
+
+def test_a_failed_run_is_still_recorded():
+    before = context_injection.rag_stats()
+    run_context, searches = _process("vocês aceitam amil?", fail=True)
+    after = context_injection.rag_stats()
+    assert searches == 1
+    assert after["runs"] == before["runs"] + 1
+    assert after["searches"] == before["searches"] + 1
@@ -0,0 +1,38 @@
+from src.application.services.rate_limiter import COOLDOWN, RATE_LIMITED, PhoneRateLimiter
+
+
+def _limiter(max_per_minute: int = 3, cooldown: float = 2):
+    return PhoneRateLimiter({"max_messages_per_minute": max_per_minute, "cooldown_seconds": cooldown})
+
+
+def test_cooldown_blocks_messages_too_close_together():
+    limiter = _limiter()
+
+    assert limiter.check("5511900000001", now=0.0) is None
+    assert limiter.check("5511900000001", now=1.0) == COOLDOWN
+    assert limiter.check("5511900000001", now=2.5) is None
+
+
+def test_bucket_limits_messages_per_minute_and_refills():
+    limiter = _limiter(max_per_minute=3, cooldown=0)
+
+    for i in range(3):
+        assert limiter.check("5511900000002", now=float(i)) is None
+    assert limiter.check("5511900000002", now=3.0) == RATE_LIMITED
+    # One token comes back every 20s at 3 msgs/min.
+    assert limiter.check("5511900000002", now=22.0) is None
+
+    stats = limiter.stats()
+    assert stats["throttled_rate_limit"] == 1
+    assert stats["throttled"] == 1
+
+
+def test_idle_phones_are_evicted():
+    limiter = _limiter()
+    limiter.check("5511900000003", now=0.0)
+    limiter.check("5511900000004", now=50.0)
+
+    assert limiter.evict_idle(now=61.0) == 1
+    stats = limiter.stats()
+    assert stats["tracked_phones"] == 1
+    assert stats["evicted"] == 1
@@ -142,7 +142,7 @@ def test_calendar_sync_is_idempotent_for_reminders():
             session.commit()
             session.refresh(appt)
 
-        mock_res = {"success": True, "status_code": 200, "error_message": None}
+        mock_res = {"success": True, "status_code": 202, "error_message": None, "queued": True, "outbound_id": 1}
         with patch("src.application.scheduler.send_message", new_callable=AsyncMock) as mock_send:
             mock_send.return_value = mock_res
             await check_and_send_reminders()
@@ -156,6 +156,7 @@ def test_calendar_sync_is_idempotent_for_reminders():
             assert appt_after.notified_24h is True
             logs = session.exec(select(NotificationLog)).all()
             assert len(logs) == 1
+            assert logs[0].status == "queued"
 
     asyncio.run(_run())
 
@@ -25,8 +25,7 @@ def clean_db_and_webhook_state():
         session.commit()
 
     webhooks._phone_out_of_scope_attempts.clear()
-    webhooks._phone_timestamps.clear()
-    webhooks._seen_messages.clear()
+    webhooks.state_backend.clear()
     webhooks._phone_handoff_until.clear()
     yield
 
@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from src.application.services.rate_limiter import COOLDOWN, RATE_LIMITED
+from src.application.services.state_backend import (
+    InMemoryStateBackend,
+    RedisStateBackend,
+    SQLiteStateBackend,
+    StateBackend,
+)
+
+CONFIG = {
+    "max_messages_per_minute": 3,
+    "cooldown_seconds": 0,
+    "dedup_window_seconds": 300,
+    "dedup_max_entries": 1000,
+}
+
+
+def _fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # the rate limit is a Lua script
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_backend(request, tmp_path):
+    created = []
+
+    def _make(config=CONFIG):
+        if request.param == "memory":
+            instance = InMemoryStateBackend(config)
+        elif request.param == "redis":
+            instance = RedisStateBackend(config, client=_fake_redis())
+        else:
+            instance = SQLiteStateBackend(config, str(tmp_path / f"state{len(created)}.db"))
+        created.append(instance)
+        return instance
+
+    yield _make
+    for instance in created:
+        instance.close()
+
+
+@pytest.fixture
+def backend(make_backend):
+    return make_backend()
+
+
+def test_message_id_is_claimed_once(backend):
+    assert backend.is_duplicate_message("msg-1") is False
+    assert backend.is_duplicate_message("msg-1") is True
+    assert backend.is_duplicate_message("msg-2") is False
+
+
+def test_batch_dedup_marks_repeats_and_known_ids(backend):
+    backend.is_duplicate_message("seen")
+    assert backend.are_duplicate_messages(["a", "seen", "b", "a"]) == [False, True, False, True]
+    assert backend.stats()["dedup"]["hits"] == 2
+
+
+def test_rate_limit_counts_per_phone(backend):
+    for _ in range(3):
+        assert backend.check_rate_limit("5511900000010") is None
+    assert backend.check_rate_limit("5511900000010") == RATE_LIMITED
+    assert backend.check_rate_limit("5511900000011") is None
+
+
+def test_cooldown_applies_between_messages(make_backend):
+    backend = make_backend({**CONFIG, "cooldown_seconds": 60})
+    assert backend.check_rate_limit("5511900000012") is None
+    assert backend.check_rate_limit("5511900000012") == COOLDOWN
+
+
+def test_values_expire_with_ttl(backend):
+    backend.set("handoff:5511900000013", "1")
+    backend.set("session:5511900000013", "123", ttl_seconds=-1)
+
+    assert backend.get("handoff:5511900000013") == "1"
+    assert backend.get("session:5511900000013") is None
+
+    backend.delete("handoff:5511900000013")
+    assert backend.get("handoff:5511900000013") is None
+
+
+def test_sqlite_backend_claims_each_message_once_across_workers(tmp_path):
+    path = str(tmp_path / "shared.db")
+    workers = [SQLiteStateBackend(CONFIG, path) for _ in range(4)]
+    claimed = []
+    claimed_lock = threading.Lock()
+
+    def _deliver(worker):
+        for i in range(200):
+            if not worker.is_duplicate_message(f"retry-{i}"):
+                with claimed_lock:
+                    claimed.append(i)
+
+    threads = [threading.Thread(target=_deliver, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == list(range(200))
+    for worker in workers:
+        worker.close()
+
+
+def test_backends_must_implement_the_storage_operations():
+    class Partial(StateBackend):
+        def is_duplicate_message(self, message_id):
+            return False
+
+    with pytest.raises(TypeError):
+        Partial(CONFIG)
+
+
+def test_redis_backend_shares_state_across_workers_and_clears_only_its_prefix():
+    client = _fake_redis()
+    workers = [RedisStateBackend(CONFIG, client=client) for _ in range(2)]
+    other_app = RedisStateBackend(CONFIG, prefix="other:", client=client)
+    other_app.set("handoff:5511900000014", "1")
+
+    assert workers[0].is_duplicate_message("msg-shared") is False
+    assert workers[1].are_duplicate_messages(["msg-shared", "msg-new"]) == [True, False]
+    assert [worker.check_rate_limit("5511900000014") for worker in workers * 2] == [None, None, None, RATE_LIMITED]
+
+    workers[1].set("session:5511900000014", "abc", ttl_seconds=60)
+    assert workers[0].get("session:5511900000014") == "abc"
+    assert 0 < client.pttl("postclinics:kv:session:5511900000014") <= 60000
+
+    workers[0].clear()
+    assert workers[1].get("session:5511900000014") is None
+    assert workers[1].is_duplicate_message("msg-shared") is False
+    assert other_app.get("handoff:5511900000014") == "1"
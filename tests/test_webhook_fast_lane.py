@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from src.api.routes import webhooks
+from src.api.webhook_fast_lane import ZapiWebhookFastLane
+from src.application.services import zapi_payload
+from src.core import config, security
+
+
+PAYLOADS = [
+    {"phone": "5511999990001", "messageId": "fl-1", "text": {"message": "Quero agendar"}, "fromMe": False},
+    {"phone": "5511999990002", "messageId": "fl-2", "text": "texto simples", "isGroup": False},
+    {"phone": 5511999990003, "messageId": "fl-3", "text": {"message": "telefone numerico"}},
+    {"phone": "5511999990004", "messageId": None, "text": {"message": "sem id"}},
+    {"phone": "5511999990005", "text": {"message": "id ausente"}, "isNewsletter": True},
+    {"messageId": "fl-6", "status": "READ", "type": "MessageStatusCallback"},
+]
+
+
+def _fields(message):
+    return {slot: getattr(message, slot) for slot in zapi_payload.InboundMessage.__slots__}
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_fast_decoder_matches_json_fallback(payload):
+    raw = json.dumps(payload).encode("utf-8")
+    assert _fields(zapi_payload.decode_message(raw)) == _fields(zapi_payload._decode_json(raw))
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        zapi_payload.decode_message(b"{not json")
+    with pytest.raises(ValueError):
+        zapi_payload.decode_message(b"[1, 2]")
+
+
+def test_only_top_level_flags_mark_own_group_and_newsletter_messages(monkeypatch):
+    monkeypatch.setattr(security, "WEBHOOK_VALIDATE_SIGNATURE", False)
+    monkeypatch.setitem(config.ANTISPAM_CONFIG, "cooldown_seconds", 0)
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+    own = {"phone": "5511999990007", "messageId": "fl-7", "fromMe": True, "text": {"message": "oi"}}
+    # A patient quoting one of our replies: the quoted message carries its own fromMe.
+    quoting = {
+        "phone": "5511999990008", "messageId": "fl-8", "fromMe": False, "text": {"message": "pode ser"},
+        "quotedMessage": {"fromMe": True, "text": {"message": "Podemos remarcar?"}},
+    }
+    spoof = {"phone": "5511999990009", "messageId": "fl-9", "text": '{"fromMe": true}'}
+
+    results = [webhooks.ingest_webhook({}, json.dumps(p).encode()) for p in (own, quoting, spoof)]
+
+    assert results == [
+        {"status": "ignored", "reason": "filtered_source"},
+        {"status": "queued"},
+        {"status": "queued"},
+    ]
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+
+
+def test_fast_lane_acks_webhook_and_passes_other_routes_through(monkeypatch):
+    monkeypatch.setattr(security, "WEBHOOK_VALIDATE_SIGNATURE", False)
+    monkeypatch.setitem(config.ANTISPAM_CONFIG, "cooldown_seconds", 0)
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+    passthrough_paths = []
+
+    async def downstream(scope, receive, send):
+        passthrough_paths.append(scope["path"])
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _run():
+        transport = ASGITransport(app=ZapiWebhookFastLane(downstream))
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            queued = await client.post("/webhook/zapi", content=json.dumps(PAYLOADS[0]))
+            duplicate = await client.post("/webhook/zapi", content=json.dumps(PAYLOADS[0]))
+            status = await client.post("/webhook/zapi", content=json.dumps(PAYLOADS[-1]))
+            invalid = await client.post("/webhook/zapi", content=b'{"text": ')
+            other = await client.get("/api/health")
+        return queued, duplicate, status, invalid, other
+
+    queued, duplicate, status, invalid, other = asyncio.run(_run())
+
+    assert queued.json() == {"status": "queued"}
+    assert duplicate.json() == {"status": "ignored", "reason": "duplicate_message"}
+    assert status.json() == {"status": "ignored", "reason": "missing_data"}
+    assert invalid.status_code == 400
+    assert other.status_code == 204
+    assert passthrough_paths == ["/api/health"]
+    assert webhooks.inbound_queue.stats()["depth"] == 1
+
+    webhooks.state_backend.clear()
+    webhooks.inbound_queue.clear()
+
+
+def test_fast_lane_rejects_bad_signature(monkeypatch):
+    monkeypatch.setattr(security, "WEBHOOK_VALIDATE_SIGNATURE", True)
+    monkeypatch.setattr(security, "WEBHOOK_SIGNATURE_SECRET", "fast-lane-secret")
+
+    async def _run():
+        transport = ASGITransport(app=ZapiWebhookFastLane(None))
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/webhook/zapi",
+                content=json.dumps(PAYLOADS[0]),
+                headers={config.WEBHOOK_SIGNATURE_HEADER: "sha256=deadbeef"},
+            )
+
+    response = asyncio.run(_run())
+    assert response.status_code == 401
@@ -16,8 +16,7 @@ class _FakeRunnerResult:
 
 def _reset_webhook_runtime_state():
     webhooks._phone_out_of_scope_attempts.clear()
-    webhooks._phone_timestamps.clear()
-    webhooks._seen_messages.clear()
+    webhooks.state_backend.clear()
     webhooks._phone_locks.clear()
     webhooks._phone_handoff_until.clear()
 
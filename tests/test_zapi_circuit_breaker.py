@@ -0,0 +1,112 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+from src.application.services.outbound_queue import OutboundMessageQueue, OutboundSender
+from src.infrastructure.services import zapi
+from src.infrastructure.services.zapi import CircuitBreaker
+
+CREDENTIALS = {"instance_id": "inst", "token": "tok", "client_token": "ct", "base_url": "https://zapi.test"}
+
+
+def test_consecutive_failures_open_the_circuit_until_a_probe_succeeds():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout_seconds=30)
+    for _ in range(2):
+        breaker.record_failure(now=0)
+    breaker.record_success(now=0)
+    for _ in range(3):
+        breaker.record_failure(now=1)
+    assert breaker.state == zapi.OPEN
+    assert not breaker.allow(now=10)
+    assert breaker.retry_after(now=10) == 21
+
+    assert breaker.allow(now=31)
+    assert breaker.state == zapi.HALF_OPEN
+    assert not breaker.allow(now=31), "only one probe at a time"
+    breaker.record_success(now=32)
+
+    assert breaker.state == zapi.CLOSED
+    assert breaker.stats()["transitions"] == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+    assert breaker.rejected == 2
+
+
+def test_a_failed_probe_reopens_for_a_full_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=30)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=30)
+    breaker.record_failure(now=31)
+    assert breaker.state == zapi.OPEN
+    assert breaker.retry_after(now=31) == 30
+
+
+def test_open_circuit_fails_fast_without_touching_the_network():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(502)
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch.dict(zapi.Z_API_CONFIG, CREDENTIALS), patch.object(zapi, "circuit_breaker", breaker), \
+         patch.object(zapi, "get_client", return_value=client):
+        first = asyncio.run(zapi.send_message("5511900000001", "Olá", max_retries=3))
+        second = asyncio.run(zapi.send_message("5511900000002", "Olá"))
+
+    assert len(requests) == 2
+    assert first["circuit_open"] and first["status_code"] == 503
+    assert second["circuit_open"] and "retry in 60s" in second["error_message"]
+
+
+def test_rate_limited_answers_count_against_the_circuit_but_other_4xx_do_not():
+    statuses = iter([400, 429, 429])
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(next(statuses))))
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60)
+    with patch.dict(zapi.Z_API_CONFIG, CREDENTIALS), patch.object(zapi, "circuit_breaker", breaker), \
+         patch.object(zapi, "get_client", return_value=client):
+        results = [asyncio.run(zapi.send_message("5511900000001", "Olá")) for _ in range(3)]
+
+    assert [r["status_code"] for r in results] == [400, 429, 429]
+    assert breaker.state == zapi.OPEN
+
+
+def test_sender_parks_messages_while_open_without_spending_attempts(tmp_path):
+    queue = OutboundMessageQueue(
+        str(tmp_path / "outbound.db"), rate_per_second=1000, burst=1000, lease_seconds=60,
+        max_attempts=1, retry_base_seconds=0.01, retry_max_seconds=0.05,
+    )
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0.05)
+    outcomes = []
+
+    async def send(phone, text):
+        if breaker.consecutive_failures == 0 and breaker.state == zapi.CLOSED:
+            # Another sender just tripped the circuit.
+            breaker.record_failure()
+        if not breaker.allow():
+            return {"success": False, "status_code": 503, "error_message": "circuit open", "circuit_open": True}
+        breaker.record_success()
+        return {"success": True, "status_code": 200, "error_message": None}
+
+    async def on_status(message, status, error):
+        outcomes.append((message.text, status, message.attempts))
+
+    async def _run():
+        sender = OutboundSender(
+            queue, send, workers=1, poll_interval_seconds=0.01, on_status=on_status, retry_after=breaker.retry_after,
+        )
+        sender.start()
+        queue.enqueue("5511900000001", "lembrete")
+        sender.notify()
+        for _ in range(200):
+            if outcomes:
+                break
+            await asyncio.sleep(0.01)
+        await sender.stop()
+
+    asyncio.run(_run())
+    assert outcomes == [("lembrete", "sent", 1)]
+    assert breaker.state == zapi.CLOSED
+    stats = queue.stats()
+    assert (stats["deferred"], stats["dead_lettered"]) == (1, 0)
+    queue.close()
@@ -0,0 +1,86 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+from src.infrastructure.services import zapi
+
+CREDENTIALS = {"instance_id": "inst", "token": "tok", "client_token": "ct", "base_url": "https://zapi.test"}
+
+
+def _counting_builder(requests: list):
+    built = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"zaapId": "z", "messageId": "m"})
+
+    def build():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        built.append(client)
+        return client
+
+    return build, built
+
+
+def test_sends_share_one_pooled_client_until_closed():
+    requests = []
+    build, built = _counting_builder(requests)
+
+    async def _run():
+        await zapi.start_client()
+        results = await asyncio.gather(*(zapi.send_message(f"551190000{i:04d}", "Olá") for i in range(5)))
+        await zapi.close_client()
+        return results
+
+    with patch.dict(zapi.Z_API_CONFIG, CREDENTIALS), patch.object(zapi, "_build_client", build):
+        results = asyncio.run(_run())
+
+    assert all(result["success"] for result in results)
+    assert len(built) == 1 and built[0].is_closed
+    assert str(requests[0].url) == "https://zapi.test/instances/inst/token/tok/send-text"
+    assert requests[0].headers["Client-Token"] == "ct"
+
+
+def test_a_new_event_loop_gets_its_own_client():
+    build, built = _counting_builder([])
+
+    with patch.dict(zapi.Z_API_CONFIG, CREDENTIALS), patch.object(zapi, "_build_client", build):
+        asyncio.run(zapi.send_message("5511900000001", "Olá"))
+        asyncio.run(zapi.send_message("5511900000001", "Olá de novo"))
+        asyncio.run(zapi.close_client())
+
+    assert len(built) == 2
+
+
+def test_http2_falls_back_when_h2_is_missing():
+    with patch.object(zapi, "_http2_available", return_value=False), \
+         patch.object(zapi.httpx, "AsyncClient") as client_cls:
+        zapi._build_client()
+    assert client_cls.call_args.kwargs["http2"] is False
+    assert client_cls.call_args.kwargs["limits"].max_connections == zapi.Z_API_HTTP_CONFIG["max_connections"]
+
+
+def test_lost_response_is_reported_in_doubt_instead_of_retried():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch.dict(zapi.Z_API_CONFIG, CREDENTIALS), patch.object(zapi, "get_client", return_value=client), \
+         patch.object(zapi, "circuit_breaker", zapi.CircuitBreaker(failure_threshold=5, reset_timeout_seconds=30)):
+        result = asyncio.run(zapi.send_message("5511900000001", "Olá", max_retries=3))
+
+    assert len(requests) == 1
+    assert result["in_doubt"] and not result["success"]
+
+
+def test_accepted_send_with_a_non_json_body_still_succeeds():
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="OK")))
+    with patch.dict(zapi.Z_API_CONFIG, CREDENTIALS), patch.object(zapi, "get_client", return_value=client), \
+         patch.object(zapi, "circuit_breaker", zapi.CircuitBreaker(failure_threshold=5, reset_timeout_seconds=30)):
+        result = asyncio.run(zapi.send_message("5511900000001", "Olá"))
+
+    assert result == {"success": True, "status_code": 200, "error_message": None}
@@ -0,0 +1,106 @@
+import asyncio
+import random
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from src.application.services import outbound_queue as outbound
+from src.application.services.outbound_queue import OutboundMessageQueue, OutboundSender
+from src.infrastructure.services import zapi
+from src.infrastructure.services.zapi_mock import parse_latency, start_subprocess
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency(None)(rng) == 0
+    assert parse_latency("0.02")(rng) == parse_latency("fixed:0.02")(rng) == 0.02
+    assert 0.01 <= parse_latency("uniform:0.01,0.05")(rng) <= 0.05
+    samples = sorted(parse_latency("lognormal:0.02,0.8")(rng) for _ in range(2000))
+    assert samples[1000] == pytest.approx(0.02, rel=0.15)
+    assert samples[1980] > 3 * samples[1000]
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1,2")
+
+
+def test_sends_are_recorded_and_checked_like_zapi(mock_zapi):
+    result = asyncio.run(zapi.send_message("5511900000001", "Olá"))
+    assert result["success"]
+    assert [(r["phone"], r["message"], r["status"]) for r in mock_zapi.received] == [("5511900000001", "Olá", 200)]
+
+    with patch.dict(zapi.Z_API_CONFIG, {"client_token": "wrong"}):
+        rejected = asyncio.run(zapi.send_message("5511900000001", "Olá"))
+    assert rejected["status_code"] == 401
+
+
+def test_5xx_storm_is_retried_until_it_clears(mock_zapi):
+    mock_zapi.fail_next(2, 503)
+    result = asyncio.run(zapi.send_message("5511900000001", "Olá", max_retries=3))
+    assert result["success"]
+    assert [r["status"] for r in mock_zapi.received] == [503, 503, 200]
+
+
+def test_rate_limit_answers_429(mock_zapi):
+    mock_zapi.rate_limit_per_second, mock_zapi.burst = 0.001, 2
+    mock_zapi.reset()
+
+    async def _run():
+        return [await zapi.send_message(f"551190000000{i}", "Olá") for i in range(3)]
+
+    results = asyncio.run(_run())
+    assert [r["status_code"] for r in results] == [200, 200, 429]
+    assert not outbound.is_permanent_failure(results[2])
+
+
+def test_hung_send_times_out_in_doubt_over_real_http(mock_zapi_server):
+    mock_zapi_server.fail_next(1, 0)
+    mock_zapi_server.hang_seconds = 0.5
+    with patch.dict(zapi.Z_API_HTTP_CONFIG, {"timeout_seconds": 0.1}):
+        result = asyncio.run(zapi.send_message("5511900000001", "Olá", max_retries=3))
+    assert result["in_doubt"]
+    assert len(mock_zapi_server.received) == 1 and len(mock_zapi_server.delivered()) == 1
+
+
+def test_outbound_queue_delivers_each_message_once_through_errors(mock_zapi, tmp_path):
+    mock_zapi.error_rate = 0.3
+    queue = OutboundMessageQueue(
+        str(tmp_path / "outbound.db"), rate_per_second=1000, burst=1000, lease_seconds=60,
+        max_attempts=20, retry_base_seconds=0.001, retry_max_seconds=0.005,
+    )
+    breaker = zapi.CircuitBreaker(failure_threshold=100, reset_timeout_seconds=0.01)
+
+    async def _run():
+        sender = OutboundSender(
+            queue, outbound._send_once, workers=4, poll_interval_seconds=0.005, retry_after=breaker.retry_after,
+        )
+        sender.start()
+        for i in range(30):
+            queue.enqueue(f"5511900000{i % 5:03d}", f"mensagem {i}", idempotency_key=f"msg-{i}:reply")
+        sender.notify()
+        for _ in range(400):
+            if queue.stats()["sent"] == 30:
+                break
+            await asyncio.sleep(0.01)
+        await sender.stop()
+
+    with patch.object(zapi, "circuit_breaker", breaker):
+        asyncio.run(_run())
+    stats = mock_zapi.stats()
+    assert (stats["delivered"], stats["duplicates"]) == (30, 0)
+    assert stats["statuses"]["500"] > 0
+    for i in range(5):
+        texts = [r["message"] for r in mock_zapi.delivered() if r["phone"] == f"5511900000{i:03d}"]
+        assert texts == [f"mensagem {n}" for n in range(i, 30, 5)]
+    queue.close()
+
+
+def test_runs_as_a_subprocess():
+    with start_subprocess(client_token="ct", error_rate=0) as base_url:
+        response = httpx.post(
+            f"{base_url}/instances/i/token/t/send-text",
+            headers={"Client-Token": "ct"},
+            json={"phone": "5511900000001", "message": "Olá"},
+        )
+        recorded = httpx.get(f"{base_url}/_mock/received").json()
+    assert response.status_code == 200 and "messageId" in response.json()
+    assert recorded["stats"]["delivered"] == 1